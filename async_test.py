@@ -0,0 +1,165 @@
+"""
+Tests for the asyncio clients, kept apart from test.py because they need
+syntax older Pythons can't compile. test.py loads them on Python 3.6+.
+"""
+import asyncio
+import datetime
+import io
+import json
+import unittest
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from congress.utils import NotFound
+
+from test_helpers import (API_KEY, FakeHttp, PaginationFixtures, SingleFlightFixtures,
+                          StreamFixtures, VoteRangeFixtures)
+
+
+def run(coro):
+    "Run a coroutine to completion on a new event loop, like asyncio.run in 3.7+"
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class FakeAsyncSession(object):
+    "Stand-in for aiohttp.ClientSession, backed by a FakeHttp"
+
+    closed = False
+
+    def __init__(self, http):
+        self.http = http
+
+    def get(self, url, headers=None):
+        http = self.http
+
+        class Context(object):
+            async def __aenter__(self):
+                self.resp, self.content = http.request(url, headers)
+                return self
+
+            async def __aexit__(self, *exc_info):
+                pass
+
+            async def read(self):
+                return self.content
+
+        return Context()
+
+    async def close(self):
+        self.closed = True
+
+
+class AsyncTest(unittest.TestCase):
+
+    def setUp(self):
+        base = "https://api.propublica.org/congress/v1/"
+        self.http = FakeHttp({
+            base + "members/P000197.json": {'status': 'OK', 'results': [{'id': 'P000197'}]},
+            base + "115/bills/hr21.json": {'status': 'OK', 'results': [{'bill_id': 'hr21-115'}]},
+        })
+
+    def test_async_subclients(self):
+        from congress.aio import AsyncCongress
+
+        async def main():
+            async with AsyncCongress(API_KEY, session=FakeAsyncSession(self.http)) as congress:
+                return await asyncio.gather(
+                    congress.members.get('P000197'),
+                    congress.bills.get('hr21', 115))
+
+        pelosi, hr21 = run(main())
+        self.assertEqual(pelosi['id'], 'P000197')
+        self.assertEqual(hr21['bill_id'], 'hr21-115')
+
+    def test_async_not_found(self):
+        from congress.aio import AsyncCongress
+
+        congress = AsyncCongress(API_KEY, session=FakeAsyncSession(self.http))
+        with self.assertRaises(NotFound):
+            run(congress.members.get('notamember'))
+
+
+class AsyncPaginationTest(PaginationFixtures, unittest.TestCase):
+
+    def test_async_iter_recent(self):
+        from congress.aio import AsyncCongress
+
+        async def main():
+            congress = AsyncCongress(API_KEY, session=FakeAsyncSession(self.http))
+            return [b async for b in congress.bills.iter_recent('house', 115, prefetch=True)]
+
+        self.assertEqual(len(run(main())), 45)
+
+
+class AsyncVoteRangeTest(VoteRangeFixtures, unittest.TestCase):
+
+    def test_async_iter_range(self):
+        from congress.aio import AsyncCongress
+
+        async def main():
+            congress = AsyncCongress(API_KEY, session=FakeAsyncSession(self.http))
+            votes = congress.votes.iter_range('house', datetime.date(2017, 1, 15), datetime.date(2017, 3, 5))
+            return [v['roll_call'] async for v in votes]
+
+        self.assertEqual(run(main()), [1, 2, 3, 4])
+
+
+class AsyncSingleFlightTest(SingleFlightFixtures, unittest.TestCase):
+
+    def test_async_coalesce(self):
+        from congress.aio import AsyncCongress, AsyncSingleFlight
+
+        self.http.release.set()
+
+        async def main():
+            congress = AsyncCongress(API_KEY, session=FakeAsyncSession(self.http),
+                                     singleflight=AsyncSingleFlight())
+            return await asyncio.gather(*[congress.members.get('P000197') for i in range(5)])
+
+        results = run(main())
+        self.assertEqual(len(self.http.requests), 1)
+        self.assertEqual(len(set(id(r) for r in results)), 5)
+
+
+@unittest.skipUnless(aiohttp, 'needs aiohttp')
+class AsyncStreamTest(StreamFixtures, unittest.TestCase):
+
+    def test_async_stream(self):
+        from congress.aio import AsyncCongress
+        from congress.testing import StandInServer
+
+        async def main(base_uri):
+            async with AsyncCongress(API_KEY, base_uri=base_uri) as congress:
+                positions = [p async for p in congress.votes.iter_positions('house', 1, 1, 115)]
+                try:
+                    [m async for m in congress.members.iter_chamber('senate', 115)]
+                except NotFound:
+                    return positions
+                self.fail('NotFound not raised')
+
+        with StandInServer(self.cassette) as server:
+            positions = run(main(server.base_uri))
+        self.assertEqual(len(positions), 300)
+
+
+class AsyncExportTest(unittest.TestCase):
+
+    def test_export_async(self):
+        from congress.aio import export_async
+        from congress.export import NDJSONWriter
+
+        async def records():
+            for i in range(5):
+                yield {'id': i, 'name': {'first': 'Member %d' % i}}
+
+        out = io.StringIO()
+        count = run(export_async(records(), NDJSONWriter(out), batch_size=2))
+        self.assertEqual(count, 5)
+        self.assertEqual(json.loads(out.getvalue().splitlines()[4]), {'id': 4, 'name_first': 'Member 4'})
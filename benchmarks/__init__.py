@@ -0,0 +1,8 @@
+"""
+Benchmarks for this library's own overhead. Run each from the repository root,
+e.g. ``python -m benchmarks.decode``, or all of them as one JSON report with
+``python -m benchmarks``.
+
+``benchmarks.fetch`` needs no network or API key: it runs against a local
+``congress.testing.StandInServer``.
+"""
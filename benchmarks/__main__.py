@@ -0,0 +1,50 @@
+"""
+Run every benchmark and write one JSON document, for comparing runs::
+
+    python -m benchmarks --quick > before.json
+
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+
+import congress
+
+from . import decode, fetch, startup
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='fewer repeats, for a smoke test')
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='seconds the stand-in server waits before each response')
+    args = parser.parse_args(argv)
+
+    repeat = 3 if args.quick else 20
+    requests = 20 if args.quick else 200
+
+    report = {
+        'meta': {
+            'version': congress.__version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'json_backend': congress.utils.get_json_backend()[0],
+            'timestamp': datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z',
+            'latency': args.latency,
+        },
+        'results': (
+            startup.run(repeat)
+            + decode.run(repeat)
+            + fetch.run(requests, rollcalls=requests // 2, latency=args.latency)
+        ),
+    }
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Compare the old decode path, ``json.loads(u(body))``, with ``utils.loads``
+on each installed JSON backend, for large member-list and roll-call payloads.
+
+Reports CPU time per response and peak memory allocated while decoding::
+
+    python -m benchmarks.decode --repeat 50 --json
+
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from congress import utils
+
+from . import payloads
+
+
+def old_decode(body):
+    return json.loads(utils.u(body))
+
+
+def decoders():
+    "Every decode path we can measure here"
+    yield 'u+json (old)', old_decode
+
+    for name in ('json', 'ujson', 'orjson'):
+        try:
+            _, loads = utils.get_json_backend(name)
+        except ImportError:
+            continue
+        yield 'bytes+%s' % name, loads
+
+
+def measure(decode, body, repeat):
+    "Return (CPU milliseconds per call, peak bytes allocated) for decoding ``body``"
+    decode(body)  # warm up
+
+    start = time.process_time()
+    for _ in range(repeat):
+        decode(body)
+    cpu = (time.process_time() - start) / repeat * 1000
+
+    tracemalloc.start()
+    result = decode(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    return cpu, peak
+
+
+def run(repeat=20, scale=1):
+    "Return a result for each payload and decoder"
+    bodies = {
+        'members': payloads.body(payloads.members_response(450 * scale), crlf=True),
+        'rollcall': payloads.body(payloads.rollcall_response(count=435 * scale), crlf=True),
+    }
+
+    results = []
+    for payload, body in sorted(bodies.items()):
+        for name, decode in decoders():
+            cpu, peak = measure(decode, body, repeat)
+            results.append({
+                'benchmark': 'decode',
+                'payload': payload,
+                'bytes': len(body),
+                'decoder': name,
+                'cpu_ms': round(cpu, 3),
+                'peak_bytes': peak,
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--scale', type=int, default=1,
+                        help='multiply payload sizes, e.g. for a whole session of positions')
+    parser.add_argument('--json', action='store_true', help='emit results as JSON')
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.scale)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+
+    print('%-10s %10s  %-14s %10s %12s' % ('payload', 'bytes', 'decoder', 'cpu ms', 'peak KiB'))
+    for r in results:
+        print('%-10s %10d  %-14s %10.3f %12.1f' % (
+            r['payload'], r['bytes'], r['decoder'], r['cpu_ms'], r['peak_bytes'] / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
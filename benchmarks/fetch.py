@@ -0,0 +1,187 @@
+"""
+Measure Client.fetch against a local stand-in server: throughput and
+latency percentiles for cold, HTTP-cached, revalidated and in-memory
+requests, and how fetch_many scales with more workers::
+
+    python -m benchmarks.fetch --requests 200 --latency 0.005 --json
+
+Nothing leaves the machine; the server answers from generated payloads.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from timeit import default_timer
+
+from congress import Congress
+from congress.cache import ResultCache, SQLiteCache
+from congress.testing import Cassette, StandInServer
+from congress.transport import Httplib2Transport, Urllib3Transport
+
+from . import payloads
+from .startup import percentile
+
+MEMBERS = '115/house/members.json'
+ROLLCALL = '115/house/sessions/1/votes/%d.json'
+PAYLOADS = {'members': MEMBERS, 'rollcall': ROLLCALL % 1}
+
+
+def cassette(rollcalls=100):
+    "Canned responses: a House member list and ``rollcalls`` roll-call votes"
+    tape = Cassette()
+    tape.add(MEMBERS, 200, payloads.body(payloads.members_response()))
+    for n in range(1, rollcalls + 1):
+        tape.add(ROLLCALL % n, 200, payloads.body(payloads.rollcall_response(n)))
+    return tape
+
+
+def transport(name, cache=None):
+    if name == 'urllib3':
+        return Urllib3Transport(pool_size=32)
+    return Httplib2Transport(cache=cache)
+
+
+def summarize(latencies, wall):
+    ms = [t * 1000 for t in latencies]
+    return {
+        'requests': len(ms),
+        'throughput_rps': round(len(ms) / wall, 1) if wall else None,
+        'mean_ms': round(sum(ms) / len(ms), 3),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p90_ms': round(percentile(ms, 90), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+    }
+
+
+def time_fetches(client, path, requests):
+    latencies = []
+    start = default_timer()
+    for _ in range(requests):
+        t = default_timer()
+        client.fetch(path, parse=lambda r: r)
+        latencies.append(default_timer() - t)
+    return latencies, default_timer() - start
+
+
+def scenarios(server, tmp, path):
+    """
+    Yield ``(name, client)`` for each way a fetch can be answered, each
+    already warmed up with one request where that matters. ``server.max_age``
+    is set for each, so HTTP cache entries are fresh or need revalidating.
+    """
+    server.max_age = 0
+    yield 'cold', Congress('key', transport=transport('httplib2'), base_uri=server.base_uri)
+
+    for name, max_age in (('http_cache', 3600), ('revalidated', 0)):
+        server.max_age = max_age
+        cache = SQLiteCache(os.path.join(tmp, '%s.sqlite' % name))
+        client = Congress('key', transport=transport('httplib2', cache), base_uri=server.base_uri)
+        client.fetch(path, parse=lambda r: r)
+        yield name, client
+
+    server.max_age = 0
+    client = Congress('key', transport=transport('httplib2'), base_uri=server.base_uri,
+                      result_cache=ResultCache(ttl=3600))
+    client.fetch(path, parse=lambda r: r)
+    yield 'memory', client
+
+
+def fetch_results(server, tmp, requests):
+    results = []
+    for payload, path in sorted(PAYLOADS.items()):
+        for scenario, client in scenarios(server, tmp, path):
+            latencies, wall = time_fetches(client, path, requests)
+            result = {'benchmark': 'fetch', 'scenario': scenario, 'payload': payload}
+            result.update(summarize(latencies, wall))
+            results.append(result)
+    return results
+
+
+def fanout_results(server, workers, rollcalls, transports):
+    paths = [ROLLCALL % n for n in range(1, rollcalls + 1)]
+    results = []
+    server.max_age = 0
+
+    for name in transports:
+        baseline = None
+        for count in workers:
+            client = Congress('key', transport=transport(name), base_uri=server.base_uri)
+            start = default_timer()
+            responses = client.fetch_many(paths, parse=lambda r: r, max_workers=count)
+            wall = default_timer() - start
+
+            errors = sum(1 for r in responses if isinstance(r, Exception))
+            baseline = baseline or wall
+            results.append({
+                'benchmark': 'fanout',
+                'transport': name,
+                'workers': count,
+                'requests': len(paths),
+                'errors': errors,
+                'wall_s': round(wall, 4),
+                'throughput_rps': round(len(paths) / wall, 1),
+                'speedup': round(baseline / wall, 2),
+            })
+            close = getattr(client.transport, 'close', None)
+            if close is not None:
+                close()
+    return results
+
+
+def run(requests=100, rollcalls=100, latency=0.005, workers=(1, 2, 4, 8, 16),
+        transports=('httplib2', 'urllib3')):
+    """
+    Return fetch results for each scenario and payload, and fan-out results
+    for each transport and worker count. ``latency`` is added to every
+    response, to stand in for the network.
+    """
+    tmp = tempfile.mkdtemp(prefix='congress-bench-')
+    try:
+        with StandInServer(cassette(rollcalls), latency=latency) as server:
+            results = fetch_results(server, tmp, requests)
+            results.extend(fanout_results(server, workers, rollcalls, transports))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=100,
+                        help='requests per fetch scenario')
+    parser.add_argument('--rollcalls', type=int, default=100,
+                        help='distinct paths fetched by each fan-out run')
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='seconds the server waits before each response')
+    parser.add_argument('--workers', default='1,2,4,8,16',
+                        help='comma-separated worker counts for fan-out')
+    parser.add_argument('--transports', default='httplib2,urllib3')
+    parser.add_argument('--json', action='store_true', help='emit results as JSON')
+    args = parser.parse_args(argv)
+
+    results = run(args.requests, args.rollcalls, args.latency,
+                  [int(n) for n in args.workers.split(',')], args.transports.split(','))
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+
+    print('%-12s %-9s %10s %9s %9s %9s' % ('scenario', 'payload', 'req/s', 'p50 ms', 'p90 ms', 'p99 ms'))
+    for r in results:
+        if r['benchmark'] == 'fetch':
+            print('%-12s %-9s %10.1f %9.3f %9.3f %9.3f' % (
+                r['scenario'], r['payload'], r['throughput_rps'],
+                r['p50_ms'], r['p90_ms'], r['p99_ms']))
+
+    print('\n%-10s %8s %10s %9s %8s' % ('transport', 'workers', 'req/s', 'wall s', 'speedup'))
+    for r in results:
+        if r['benchmark'] == 'fanout':
+            print('%-10s %8d %10.1f %9.3f %7.2fx' % (
+                r['transport'], r['workers'], r['throughput_rps'], r['wall_s'], r['speedup']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Synthetic API responses, shaped like the real thing, for benchmarks
+"""
+import json
+import random
+
+STATES = ['AL', 'AK', 'AZ', 'CA', 'CO', 'FL', 'GA', 'IL', 'MA', 'NY', 'OH', 'PA', 'RI', 'TX', 'WA']
+POSITIONS = ['Yes', 'No', 'Not Voting', 'Present']
+
+
+def member(n, chamber='House'):
+    "One entry in a members.json list"
+    return {
+        'id': 'M%06d' % n,
+        'title': 'Representative' if chamber == 'House' else 'Senator',
+        'first_name': 'First%d' % n,
+        'middle_name': None,
+        'last_name': 'Last%d' % n,
+        'suffix': None,
+        'date_of_birth': '1950-01-%02d' % (n % 28 + 1),
+        'party': random.choice(['D', 'R']),
+        'leadership_role': None,
+        'twitter_account': 'rep%d' % n,
+        'facebook_account': 'rep%d' % n,
+        'youtube_account': None,
+        'govtrack_id': str(400000 + n),
+        'cspan_id': str(10000 + n),
+        'votesmart_id': str(20000 + n),
+        'icpsr_id': str(30000 + n),
+        'crp_id': 'N%08d' % n,
+        'google_entity_id': '/m/%06d' % n,
+        'fec_candidate_id': 'H%07d' % n,
+        'url': 'https://example.house.gov/%d' % n,
+        'rss_url': None,
+        'contact_form': None,
+        'in_office': True,
+        'dw_nominate': round(random.uniform(-1, 1), 3),
+        'seniority': str(random.randint(1, 40)),
+        'next_election': '2018',
+        'total_votes': 1000,
+        'missed_votes': random.randint(0, 100),
+        'total_present': random.randint(0, 5),
+        'last_updated': '2018-01-01 12:00:00 -0500',
+        'ocd_id': 'ocd-division/country:us/state:ri/cd:%d' % (n % 10),
+        'office': '%d Rayburn House Office Building' % n,
+        'phone': '202-225-%04d' % (n % 10000),
+        'fax': None,
+        'state': random.choice(STATES),
+        'district': str(n % 50 + 1),
+        'at_large': False,
+        'geoid': '%04d' % n,
+        'missed_votes_pct': round(random.uniform(0, 10), 2),
+        'votes_with_party_pct': round(random.uniform(80, 100), 2),
+    }
+
+
+def members_response(count=450, chamber='House', congress=115):
+    "A full members.json response"
+    return {
+        'status': 'OK',
+        'copyright': 'Copyright (c) 2018 Pro Publica Inc. All Rights Reserved.',
+        'results': [{
+            'congress': str(congress),
+            'chamber': chamber,
+            'num_results': count,
+            'offset': 0,
+            'members': [member(n, chamber) for n in range(count)],
+        }],
+    }
+
+
+def rollcall_response(roll_call=1, count=435, chamber='House', congress=115, session=1):
+    "A roll-call vote detail response, with a full list of member positions"
+    return {
+        'status': 'OK',
+        'copyright': 'Copyright (c) 2018 Pro Publica Inc. All Rights Reserved.',
+        'results': {'votes': {'vote': {
+            'congress': congress,
+            'session': session,
+            'chamber': chamber,
+            'roll_call': roll_call,
+            'source': 'http://clerk.house.gov/evs/2017/roll%03d.xml' % roll_call,
+            'url': 'http://clerk.house.gov/evs/2017/roll%03d.xml' % roll_call,
+            'bill': {'bill_id': 'hr%d-%d' % (roll_call, congress), 'number': 'H.R.%d' % roll_call},
+            'question': 'On Passage',
+            'description': 'A bill to do something, number %d' % roll_call,
+            'vote_type': 'RECORDED VOTE',
+            'date': '2017-%02d-%02d' % (roll_call % 12 + 1, roll_call % 28 + 1),
+            'time': '12:%02d:00' % (roll_call % 60),
+            'result': 'Passed',
+            'democratic': {'yes': 180, 'no': 10, 'present': 0, 'not_voting': 4, 'majority_position': 'Yes'},
+            'republican': {'yes': 20, 'no': 210, 'present': 0, 'not_voting': 11, 'majority_position': 'No'},
+            'independent': {'yes': 0, 'no': 0, 'present': 0, 'not_voting': 0},
+            'total': {'yes': 200, 'no': 220, 'present': 0, 'not_voting': 15},
+            'positions': [{
+                'member_id': 'M%06d' % n,
+                'name': 'First%d Last%d' % (n, n),
+                'party': random.choice(['D', 'R']),
+                'state': random.choice(STATES),
+                'district': str(n % 50 + 1),
+                'vote_position': random.choice(POSITIONS),
+                'dw_nominate': round(random.uniform(-1, 1), 3),
+            } for n in range(count)],
+        }}},
+    }
+
+
+def body(response, crlf=False):
+    "Encode a response as the API would send it"
+    text = json.dumps(response, indent=2)
+    if crlf:
+        text = text.replace('\n', '\r\n')
+    return text.encode('utf-8')
@@ -0,0 +1,84 @@
+"""
+Measure how long a fresh interpreter takes to import congress, build a
+client and make its first subclient, and which heavy modules that pulls in.
+
+Each run is a separate process, so nothing is already imported::
+
+    python -m benchmarks.startup --repeat 20 --json
+
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# modules we expect to load only once a request is made
+HEAVY = ('httplib2', 'six', 'dateutil', 'orjson', 'ujson', 'numpy', 'aiohttp', 'urllib3')
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import congress
+imported = time.perf_counter()
+client = congress.Congress('key')
+constructed = time.perf_counter()
+client.members
+accessed = time.perf_counter()
+json.dump({
+    'import_ms': (imported - start) * 1000,
+    'construct_ms': (constructed - imported) * 1000,
+    'subclient_ms': (accessed - constructed) * 1000,
+    'loaded': [name for name in %r if name in sys.modules],
+}, sys.stdout)
+""" % (HEAVY,)
+
+
+def run_once():
+    output = subprocess.check_output([sys.executable, '-c', SCRIPT])
+    return json.loads(output.decode('utf-8'))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def run(repeat=10):
+    "Return a result for each startup step"
+    runs = [run_once() for _ in range(repeat)]
+
+    results = []
+    for step in ('import_ms', 'construct_ms', 'subclient_ms'):
+        values = [run[step] for run in runs]
+        results.append({
+            'benchmark': 'startup',
+            'step': step[:-3],
+            'runs': len(values),
+            'median_ms': round(percentile(values, 50), 3),
+            'p90_ms': round(percentile(values, 90), 3),
+            'loaded': runs[-1]['loaded'],
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help='emit results as JSON')
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+
+    print('%-10s %10s %10s  %s' % ('step', 'median ms', 'p90 ms', 'heavy modules loaded'))
+    for r in results:
+        print('%-10s %10.3f %10.3f  %s' % (
+            r['step'], r['median_ms'], r['p90_ms'], ', '.join(r['loaded']) or '-'))
+
+
+if __name__ == '__main__':
+    main()
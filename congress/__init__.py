@@ -8,8 +8,9 @@ __version__ = "0.2.0"
 
 import os
 
-from .client import Client
-from .utils import CongressError, NotFound, check_chamber, get_congress, CURRENT_CONGRESS
+from .client import Client, subclient
+from .utils import (CongressError, NotFound, NotCached, check_chamber, get_congress,
+                    is_stale, CURRENT_CONGRESS)
 
 # subclients
 from .bills import BillsClient
@@ -19,7 +20,8 @@ from .votes import VotesClient
 from .nominations import NominationsClient
 
 
-__all__ = ('Congress', 'CongressError', 'NotFound', 'get_congress', 'CURRENT_CONGRESS')
+__all__ = ('Congress', 'CongressError', 'NotFound', 'NotCached', 'get_congress', 'is_stale',
+           'CURRENT_CONGRESS')
 
 
 class Congress(Client):
@@ -41,16 +43,42 @@ class Congress(Client):
     it uses `httplib2.FileCache <https://httplib2.readthedocs.io/en/latest/libhttplib2.html#httplib2.FileCache>`_,
     in a directory called ``.cache``, but it should also work with memcache
     or anything else that exposes the same interface as FileCache (per httplib2 docs).
+    For connection pooling, pass a ``transport`` from ``congress.transport``
+    instead; every subclient shares it.
+
+    A ``rate_limiter`` and ``retry`` policy (see ``congress.ratelimit``) and a
+    daily ``quota`` (see ``congress.scheduler``) are shared by every subclient,
+    so limits apply to the instance as a whole. So is an in-memory
+    ``result_cache`` of parsed responses (see ``congress.cache.ResultCache``).
+    Pass ``models=True`` to get ``congress.models`` objects instead of dicts,
+    and a ``congress.singleflight.SingleFlight`` to have concurrent requests
+    for the same URL, from any subclient, share one API call. ``hooks``,
+    such as ``congress.metrics.Metrics``, are called around every fetch.
+
+    ``offline=True`` answers everything from the cache, for running against
+    a snapshot. ``fallback=True`` answers a failed request with the last
+    good cached response, which ``is_stale`` flags.
     """
 
-    def __init__(self, apikey=None, cache='.cache', http=None):
+    def __init__(self, apikey=None, cache='.cache', http=None, rate_limiter=None, retry=None,
+                 quota=None, result_cache=None, models=False, singleflight=None, hooks=None,
+                 transport=None, offline=False, fallback=False, base_uri=None):
         if apikey is None:
             apikey = os.environ.get('PROPUBLICA_API_KEY')
 
-        super(Congress, self).__init__(apikey, cache, http)
+        shared = dict(rate_limiter=rate_limiter, retry=retry, quota=quota,
+                      result_cache=result_cache, models=models, singleflight=singleflight,
+                      hooks=hooks if hooks is not None else [],
+                      offline=offline, fallback=fallback, base_uri=base_uri)
+        super(Congress, self).__init__(apikey, cache, http, transport=transport, **shared)
+        self.shared = shared
+
+    bills = subclient('bills', BillsClient)
+    committees = subclient('committees', CommitteesClient)
+    members = subclient('members', MembersClient)
+    nominations = subclient('nominations', NominationsClient)
+    votes = subclient('votes', VotesClient)
 
-        self.bills = BillsClient(self.apikey, cache, self.http)
-        self.committees = CommitteesClient(self.apikey, cache, self.http)
-        self.members = MembersClient(self.apikey, cache, self.http)
-        self.nominations = NominationsClient(self.apikey, cache, self.http)
-        self.votes = VotesClient(self.apikey, cache, self.http)
+    def create_subclient(self, cls):
+        "Create a subclient sharing this client's transport and settings"
+        return cls(self.apikey, transport=self.transport, **self.shared)
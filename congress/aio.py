@@ -0,0 +1,424 @@
+"""
+Asyncio clients for the ProPublica Congress API
+
+These mirror ``Congress`` and each of its subclients, but every API method
+is a coroutine. All subclients of an ``AsyncCongress`` share one pooled
+`aiohttp <https://docs.aiohttp.org/>`_ session, so many requests can be
+in flight at once::
+
+    >>> import asyncio
+    >>> from congress.aio import AsyncCongress
+    >>> async def main():
+    ...     async with AsyncCongress(API_KEY) as congress:
+    ...         return await asyncio.gather(
+    ...             congress.members.get('P000197'),
+    ...             congress.bills.get('hr21', 115))
+
+Requires Python 3.6+ and aiohttp, which is not installed by default.
+"""
+import asyncio
+import itertools
+import logging
+import os
+
+from .client import Client, PAGE_SIZE, next_offset, subclient
+from .bills import BillsClient
+from .members import MembersClient
+from .committees import CommitteesClient
+from .export import BATCH_SIZE, flatten
+from .stream import CHUNK_SIZE, ArrayParser, dig
+from .utils import NotCached, NotFound, check_chamber, mark_stale
+from .votes import VotesClient, month_windows, unique_votes
+from .nominations import NominationsClient
+
+log = logging.getLogger('congress')
+
+
+class AsyncSingleFlight(object):
+    """
+    Async counterpart of ``congress.singleflight.SingleFlight``: tasks
+    awaiting the same key while a call is in flight share its result.
+    """
+
+    def __init__(self):
+        self.calls = {}
+
+    async def do(self, key, func):
+        """
+        Await ``func()``, or the call already in flight for ``key``,
+        returning ``(result, shared)``.
+        """
+        call = self.calls.get(key)
+        if call is not None:
+            call[1] += 1
+            # shield, so one cancelled waiter doesn't cancel everyone's request
+            return await asyncio.shield(call[0]), True
+
+        call = self.calls[key] = [asyncio.ensure_future(func()), 0]
+        try:
+            result = await asyncio.shield(call[0])
+        finally:
+            del self.calls[key]
+
+        return result, call[1] > 0
+
+    def __len__(self):
+        return len(self.calls)
+
+
+class AsyncClient(Client):
+    """
+    Base async client. Path building and response parsing are inherited
+    from ``Client``; only the network call is different.
+
+    Pass an existing ``aiohttp.ClientSession`` as ``session`` to control
+    connection pooling yourself. Otherwise a session with a connection
+    pool of ``limit`` connections is created on first use.
+
+    ``rate_limiter``, ``retry``, ``quota``, ``result_cache`` and ``models``
+    work as they do for ``Client``. To coalesce identical requests, pass an
+    ``AsyncSingleFlight`` as ``singleflight``. ``hooks`` see every fetch,
+    as for ``Client``, and so do ``offline``, ``fallback`` and ``base_uri``.
+    """
+
+    def __init__(self, apikey=None, session=None, limit=100, parent=None,
+                 rate_limiter=None, retry=None, quota=None, result_cache=None, models=False,
+                 singleflight=None, hooks=None, offline=False, fallback=False, base_uri=None):
+        self.apikey = apikey
+        if base_uri is not None:
+            self.BASE_URI = base_uri
+        self.limit = limit
+        self.parent = parent
+        self.rate_limiter = rate_limiter
+        self.retry = retry
+        self.quota = quota
+        self.result_cache = result_cache
+        self.models = models
+        self.singleflight = singleflight
+        self.hooks = hooks if hooks is not None else []
+        self.offline = offline
+        self.fallback = fallback
+        self._session = session
+
+    @property
+    def session(self):
+        "The shared ``aiohttp.ClientSession``, created on first use"
+        if self.parent is not None:
+            return self.parent.session
+
+        if self._session is None or self._session.closed:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=self.limit)
+            self._session = aiohttp.ClientSession(connector=connector)
+
+        return self._session
+
+    async def close(self):
+        "Close the shared session, if this client owns it"
+        if self.parent is not None:
+            return await self.parent.close()
+
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def fetch(self, path, parse=lambda r: r['results'][0], cache_only=False, refresh=False):
+        """
+        Make an API request, with authentication.
+
+        Same as ``Client.fetch``, but must be awaited. There's no HTTP
+        cache here, so ``cache_only`` requests are answered only from
+        the ``result_cache``, if there is one, as is every request from
+        an ``offline`` client, and ``fallback`` serves only results still
+        in the ``result_cache``. Stale results are refreshed in a
+        background task.
+        """
+        url = self.BASE_URI + path
+        cache_only = cache_only or self.offline
+
+        with self.observe(url, path) as event:
+            if self.result_cache is not None and not refresh:
+                content, stale = self.result_cache.lookup(url)
+                if content is not None:
+                    event.cache = 'memory'
+                    if stale:
+                        event.cache = 'stale'
+                        if not cache_only and self.result_cache.claim_refresh(url):
+                            asyncio.ensure_future(self.revalidate(url, path))
+
+                    with event.timer('parse'):
+                        return self.export(content, parse)
+
+            async def load():
+                with event.timer('network'):
+                    resp, content = await self.request(url, path, cache_only)
+                event.response(resp, content)
+                with event.timer('decode'):
+                    return self.read_response(resp, content, path, url)
+
+            try:
+                if self.singleflight is None:
+                    content, shared = await load(), False
+                else:
+                    content, shared = await self.singleflight.do(url, load)
+                    if event.cache is None:
+                        event.cache = 'coalesced'
+            except Exception as e:
+                if not self.fallback or cache_only or isinstance(e, (NotFound, NotCached)):
+                    raise
+
+                content = self.last_good(url, path)
+                if content is None:
+                    raise
+
+                log.warning('Serving cached %s after error: %s', path, e)
+                event.cache = 'fallback'
+                with event.timer('parse'):
+                    return mark_stale(self.export(content, parse))
+
+            with event.timer('parse'):
+                return self.export(content, parse, shared)
+
+    def last_good(self, url, path):
+        "The last successful result for ``url`` in the result cache, or None"
+        if self.result_cache is not None:
+            return self.result_cache.last_good(url)
+
+    async def revalidate(self, url, path):
+        "Fetch a fresh copy of a stale result into the result cache"
+        try:
+            resp, content = await self.request(url, path)
+            return self.read_response(resp, content, path, url)
+        except Exception as e:
+            log.warning('Could not refresh %s: %s', url, e)
+        finally:
+            self.result_cache.release_refresh(url)
+
+    async def request(self, url, path, cache_only=False, refresh=False):
+        "Async version of ``Client.request``"
+        headers = {'X-API-Key': self.apikey}
+
+        log.debug(url)
+
+        if cache_only:
+            raise NotCached(path)
+
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await asyncio.sleep(self.rate_limiter.reserve())
+
+            async with self.session.get(url, headers=headers) as resp:
+                content = await resp.read()
+
+            if self.quota is not None:
+                self.quota.consume()
+
+            delay = self.retry_delay(resp, attempt)
+            if delay is None:
+                return resp, content
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def stream(self, path, keys, cache_only=False, refresh=False):
+        """
+        Async generator version of ``Client.stream``, parsing the body
+        as it's read from the connection
+        """
+        url = self.BASE_URI + path
+        if cache_only or self.offline:
+            raise NotCached(path)
+
+        headers = {'X-API-Key': self.apikey}
+        log.debug(url)
+
+        with self.observe(url, path) as event:
+            attempt = 0
+            while True:
+                if self.rate_limiter is not None:
+                    await asyncio.sleep(self.rate_limiter.reserve())
+
+                with event.timer('network'):
+                    resp = await self.session.get(url, headers=headers)
+
+                if self.quota is not None:
+                    self.quota.consume()
+
+                delay = self.retry_delay(resp, attempt)
+                if delay is None:
+                    break
+
+                resp.release()
+                await asyncio.sleep(delay)
+                attempt += 1
+
+            event.response(resp, b'')
+
+            try:
+                if resp.status != 200:
+                    content = self.decode(resp, await resp.read(), path, url)
+                    for item in dig(content, keys) or []:
+                        yield self.export_item(item, keys)
+                    return
+
+                parser = ArrayParser(keys)
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    for item in self.stream_items(parser, chunk, resp, path, url, event):
+                        yield item
+                    if parser.done:
+                        break
+
+                if not parser.done:
+                    for item in self.stream_items(parser, None, resp, path, url, event):
+                        yield item
+            finally:
+                # closes the connection instead if the body wasn't read to the end
+                resp.release()
+
+    async def fetch_many(self, paths, parse=lambda r: r['results'][0],
+                         max_workers=8, return_exceptions=True):
+        """
+        Fetch several paths concurrently, with at most ``max_workers``
+        requests in flight. Same ordering and error semantics as
+        ``Client.fetch_many``.
+        """
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def fetch(path):
+            async with semaphore:
+                return await self.fetch(path, parse=parse)
+
+        return await asyncio.gather(*[fetch(path) for path in paths],
+                                    return_exceptions=return_exceptions)
+
+    async def paginate(self, path, key, parse=lambda r: r['results'][0],
+                       page_size=PAGE_SIZE, prefetch=False):
+        """
+        Async generator version of ``Client.paginate``. With
+        ``prefetch=True``, the next page is requested as a background
+        task while the caller consumes the current one.
+        """
+        def fetch(offset):
+            return self.fetch("{0}?offset={1}".format(path, offset), parse=parse)
+
+        offset, seen = 0, 0
+        page = await fetch(offset)
+        while True:
+            items = page.get(key) or []
+            seen += len(items)
+            offset = next_offset(page, items, offset, seen, page_size)
+
+            upcoming = None
+            if offset is not None and prefetch:
+                upcoming = asyncio.ensure_future(fetch(offset))
+
+            try:
+                for item in items:
+                    yield item
+            except BaseException:
+                if upcoming is not None:
+                    upcoming.cancel()
+                raise
+
+            if offset is None:
+                break
+
+            page = await (upcoming if upcoming is not None else fetch(offset))
+
+
+async def export_async(records, writer, batch_size=BATCH_SIZE, flatten=flatten):
+    "``congress.export.export`` for async iterators, such as those of the async subclients"
+    count, batch = 0, []
+    async for record in records:
+        batch.append(flatten(record) if flatten is not None else record)
+        if len(batch) >= batch_size:
+            writer.write_batch(batch)
+            count += len(batch)
+            batch = []
+
+    if batch:
+        writer.write_batch(batch)
+        count += len(batch)
+
+    return count
+
+
+class AsyncBillsClient(AsyncClient, BillsClient):
+    pass
+
+
+class AsyncMembersClient(AsyncClient, MembersClient):
+    pass
+
+
+class AsyncCommitteesClient(AsyncClient, CommitteesClient):
+    pass
+
+
+class AsyncVotesClient(AsyncClient, VotesClient):
+
+    async def iter_range(self, chamber, start, end, max_workers=4):
+        "Async generator version of ``VotesClient.iter_range``"
+        check_chamber(chamber)
+        windows = month_windows(start, end)
+
+        async def fetch(window):
+            return (await self.by_range(chamber, *window))['votes']
+
+        pending = [asyncio.ensure_future(fetch(w)) for w in itertools.islice(windows, max_workers)]
+        previous = set()
+        try:
+            while pending:
+                votes = await pending.pop(0)
+                for window in windows:
+                    pending.append(asyncio.ensure_future(fetch(window)))
+                    break
+
+                votes, previous = unique_votes(votes, previous)
+                for vote in votes:
+                    yield vote
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+class AsyncNominationsClient(AsyncClient, NominationsClient):
+    pass
+
+
+class AsyncCongress(AsyncClient):
+    """
+    Async counterpart of ``Congress``, with the same subclients.
+
+    Use it as an async context manager, or call ``await congress.close()``
+    when you're done, to release pooled connections.
+    """
+
+    def __init__(self, apikey=None, session=None, limit=100, rate_limiter=None, retry=None,
+                 quota=None, result_cache=None, models=False, singleflight=None, hooks=None,
+                 offline=False, fallback=False, base_uri=None):
+        if apikey is None:
+            apikey = os.environ.get('PROPUBLICA_API_KEY')
+
+        shared = dict(rate_limiter=rate_limiter, retry=retry, quota=quota,
+                      result_cache=result_cache, models=models, singleflight=singleflight,
+                      hooks=hooks if hooks is not None else [],
+                      offline=offline, fallback=fallback, base_uri=base_uri)
+        super(AsyncCongress, self).__init__(apikey, session, limit, **shared)
+        self.shared = shared
+
+    bills = subclient('bills', AsyncBillsClient)
+    committees = subclient('committees', AsyncCommitteesClient)
+    members = subclient('members', AsyncMembersClient)
+    nominations = subclient('nominations', AsyncNominationsClient)
+    votes = subclient('votes', AsyncVotesClient)
+
+    def create_subclient(self, cls):
+        "Create a subclient sharing this client's session and settings"
+        return cls(self.apikey, parent=self, **self.shared)
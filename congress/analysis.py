@@ -0,0 +1,435 @@
+"""
+Local analysis of roll-call votes
+
+``VoteMatrix`` collects member positions from many roll calls into a NumPy
+member x roll call matrix, coded as small integers, which grows as votes are
+added::
+
+    >>> from congress.analysis import VoteMatrix
+    >>> matrix = VoteMatrix()
+    >>> for vote in congress.votes.get_many('senate', range(1, 101), 1, 115):
+    ...     matrix.add(vote)
+    >>> matrix.matrix.shape
+    (100, 100)
+
+Requires NumPy, which is not installed by default.
+"""
+import datetime
+
+import numpy as np
+
+from .utils import parse_date
+
+# position codes
+ABSENT = 0  # not a member when the vote was taken
+YES = 1
+NO = 2
+PRESENT = 3
+NOT_VOTING = 4
+
+CODES = {
+    'Yes': YES,
+    'Aye': YES,
+    'Yea': YES,
+    'No': NO,
+    'Nay': NO,
+    'Present': PRESENT,
+    'Not Voting': NOT_VOTING,
+}
+
+
+def get_vote(vote):
+    "Unwrap a ``VotesClient.get`` result into the vote itself"
+    votes = vote.get('votes')
+    if votes is not None and not isinstance(votes, list):
+        return votes['vote']
+    return vote
+
+
+def to_datetime64(date):
+    if not date:
+        return np.datetime64('NaT')
+    if not isinstance(date, (datetime.date, datetime.datetime)):
+        date = parse_date(date)
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    return np.datetime64(date, 'D')
+
+
+class VoteMatrix(object):
+    """
+    A member x roll call matrix of vote positions, stored as ``int8``.
+
+    Rows are members, in the order first seen, with IDs in ``member_ids``;
+    columns are roll calls, in the order added, identified by
+    ``(congress, session, roll_call)`` in ``rollcall_ids``. Cells hold
+    ``YES``, ``NO``, ``PRESENT``, ``NOT_VOTING``, or ``ABSENT`` where a
+    member wasn't part of the vote at all.
+
+    Storage grows geometrically in both directions, so adding votes one
+    at a time never rebuilds the whole matrix.
+    """
+
+    def __init__(self, members=64, rollcalls=64):
+        self._data = np.zeros((members, rollcalls), dtype=np.int8)
+        self._dates = np.empty(rollcalls, dtype='datetime64[D]')
+        self._rollcalls = np.zeros((rollcalls, 3), dtype=np.int32)
+        self.n_members = 0
+        self.n_rollcalls = 0
+
+        self.member_index = {}
+        self.rollcall_index = {}
+        self._member_ids = []
+        self._parties = []
+        self._members = []
+
+        # callables taking (matrix, column), run after each roll call is added
+        self.listeners = []
+
+    @property
+    def matrix(self):
+        "The member x roll call matrix, as a view"
+        return self._data[:self.n_members, :self.n_rollcalls]
+
+    @property
+    def member_ids(self):
+        "Member IDs for each row"
+        return np.array(self._member_ids, dtype=object)
+
+    @property
+    def parties(self):
+        "Each member's party, as of the latest vote added"
+        return np.array(self._parties, dtype=object)
+
+    @property
+    def members(self):
+        "Name, party, state and district for each row, from each member's latest position"
+        return list(self._members)
+
+    @property
+    def rollcall_ids(self):
+        "``(congress, session, roll_call)`` for each column, as an n x 3 array"
+        return self._rollcalls[:self.n_rollcalls]
+
+    @property
+    def dates(self):
+        "The date of each roll call, as ``datetime64[D]``"
+        return self._dates[:self.n_rollcalls]
+
+    def _grow(self, members, rollcalls):
+        rows, cols = self._data.shape
+        if members <= rows and rollcalls <= cols:
+            return
+
+        rows = max(rows, members) if members <= rows else max(members, rows * 2)
+        cols = max(cols, rollcalls) if rollcalls <= cols else max(rollcalls, cols * 2)
+
+        data = np.zeros((rows, cols), dtype=np.int8)
+        data[:self.n_members, :self.n_rollcalls] = self.matrix
+        self._data = data
+
+        if cols > len(self._dates):
+            dates = np.empty(cols, dtype='datetime64[D]')
+            dates[:self.n_rollcalls] = self.dates
+            self._dates = dates
+
+            rollcall_ids = np.zeros((cols, 3), dtype=np.int32)
+            rollcall_ids[:self.n_rollcalls] = self.rollcall_ids
+            self._rollcalls = rollcall_ids
+
+    def _member(self, position):
+        member_id = position['member_id']
+        info = dict((key, position.get(key)) for key in ('name', 'party', 'state', 'district'))
+        info['id'] = member_id
+
+        row = self.member_index.get(member_id)
+        if row is None:
+            row = self.member_index[member_id] = len(self._member_ids)
+            self._member_ids.append(member_id)
+            self._parties.append(info['party'])
+            self._members.append(info)
+        else:
+            self._parties[row] = info['party'] or self._parties[row]
+            self._members[row] = info
+        return row
+
+    def add(self, vote):
+        """
+        Add one roll call, either a ``VotesClient.get`` result or the vote
+        inside it, returning its column. Adding a roll call again replaces it.
+        """
+        vote = get_vote(vote)
+        key = (int(vote.get('congress') or 0), int(vote.get('session') or 0),
+               int(vote.get('roll_call') or 0))
+        positions = vote.get('positions') or []
+
+        rows = np.array([self._member(p) for p in positions], dtype=np.intp)
+        codes = np.array([CODES.get(p.get('vote_position'), ABSENT) for p in positions],
+                         dtype=np.int8)
+
+        col = self.rollcall_index.get(key)
+        if col is None:
+            col = self.rollcall_index[key] = self.n_rollcalls
+            self._grow(len(self._member_ids), col + 1)
+            self.n_rollcalls += 1
+        else:
+            self._grow(len(self._member_ids), self.n_rollcalls)
+            self._data[:, col] = ABSENT
+
+        self.n_members = len(self._member_ids)
+        self._data[rows, col] = codes
+        self._dates[col] = to_datetime64(vote.get('date'))
+        self._rollcalls[col] = key
+
+        for listener in self.listeners:
+            listener(self, col)
+
+        return col
+
+    def extend(self, votes):
+        "Add many roll calls, skipping any that failed to fetch"
+        for vote in votes:
+            if not isinstance(vote, Exception):
+                self.add(vote)
+
+    def fetch(self, client, chamber, rollcall_nums, session, congress, max_workers=8):
+        """
+        Fetch roll calls concurrently with ``VotesClient.get_many`` and add them.
+        ``client`` is a ``Congress`` instance or its ``votes`` subclient.
+        """
+        votes = getattr(client, 'votes', client)
+        self.extend(votes.get_many(chamber, rollcall_nums, session, congress, max_workers))
+        return self
+
+    def mask(self, start=None, end=None, session=None, congress=None):
+        "A boolean mask over roll calls, by date range, session and Congress"
+        mask = np.ones(self.n_rollcalls, dtype=bool)
+        if start is not None:
+            mask &= self.dates >= to_datetime64(start)
+        if end is not None:
+            mask &= self.dates <= to_datetime64(end)
+        if session is not None:
+            mask &= self.rollcall_ids[:, 1] == int(session)
+        if congress is not None:
+            mask &= self.rollcall_ids[:, 0] == int(congress)
+        return mask
+
+
+class Agreement(object):
+    """
+    How often every pair of members voted together, computed locally from
+    a ``VoteMatrix`` instead of one ``MembersClient.compare`` request per pair.
+
+    ``common`` counts roll calls where both members voted yes or no,
+    and ``disagree`` those where they voted opposite ways; both are
+    members x members arrays, in ``member_ids`` order.
+    """
+
+    def __init__(self, member_ids, common, disagree):
+        self.member_ids = member_ids
+        self.index = dict((m, i) for i, m in enumerate(member_ids))
+        self.common = common
+        self.disagree = disagree
+
+    @property
+    def agree(self):
+        return self.common - self.disagree
+
+    @property
+    def agree_percent(self):
+        "Percent of common votes each pair agreed on, NaN where they had none"
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.round(100.0 * self.agree / self.common, 2)
+
+    @property
+    def disagree_percent(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.round(100.0 * self.disagree / self.common, 2)
+
+    def compare(self, first, second, chamber=None, congress=None):
+        """
+        Compare two members, returning the same fields
+        as ``MembersClient.compare``.
+        """
+        i, j = self.index[first], self.index[second]
+        common, disagree = int(self.common[i, j]), int(self.disagree[i, j])
+
+        result = {
+            'first_member_id': first,
+            'second_member_id': second,
+            'common_votes': common,
+            'disagree_votes': disagree,
+            'agree_percent': round(100.0 * (common - disagree) / common, 2) if common else None,
+            'disagree_percent': round(100.0 * disagree / common, 2) if common else None,
+        }
+        if chamber is not None:
+            result['chamber'] = chamber.title()
+        if congress is not None:
+            result['congress'] = str(congress)
+        return result
+
+
+def agreement(matrix, mask=None):
+    """
+    Compute pairwise agreement for every member of a ``VoteMatrix``,
+    optionally over only the roll calls selected by a boolean ``mask``
+    (see ``VoteMatrix.mask``).
+
+    This is two matrix products, so a full House, for a full Congress,
+    takes well under a second.
+    """
+    votes = matrix.matrix
+    if mask is not None:
+        votes = votes[:, mask]
+
+    # float32 products go through BLAS, and are exact for any realistic count
+    yes = (votes == YES).astype(np.float32)
+    no = (votes == NO).astype(np.float32)
+    cast = yes + no
+
+    common = np.rint(cast.dot(cast.T)).astype(np.int32)
+    disagree = np.rint(yes.dot(no.T) + no.dot(yes.T)).astype(np.int32)
+
+    return Agreement(list(matrix.member_ids), common, disagree)
+
+
+class VoteStats(object):
+    """
+    Local versions of the ``VotesClient.missed``, ``party``, ``loneno`` and
+    ``perfect`` leaderboards, for any window of roll calls in a ``VoteMatrix``.
+
+    Per-vote facts (who voted with their party's majority, who was the lone
+    no) are worked out once, as each roll call is added to the matrix, so
+    leaderboards stay current without re-reading old votes. Each leaderboard
+    takes the same filters as ``VoteMatrix.mask``, or a ``mask`` of its own::
+
+        >>> stats = VoteStats(matrix)
+        >>> stats.missed(start='2017-06-01', end='2017-06-30')[:3]
+
+    """
+
+    WITH_PARTY = 1
+    AGAINST_PARTY = 2
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self._with_party = np.zeros(matrix._data.shape, dtype=np.int8)
+        self._lone_no = np.full(matrix._data.shape[1], -1, dtype=np.int32)
+
+        for col in range(matrix.n_rollcalls):
+            self.update(matrix, col)
+        matrix.listeners.append(self.update)
+
+    def _grow(self):
+        shape = self.matrix._data.shape
+        if self._with_party.shape != shape:
+            rows, cols = self._with_party.shape
+            with_party = np.zeros(shape, dtype=np.int8)
+            with_party[:rows, :cols] = self._with_party
+            self._with_party = with_party
+
+        if len(self._lone_no) != shape[1]:
+            lone_no = np.full(shape[1], -1, dtype=np.int32)
+            lone_no[:len(self._lone_no)] = self._lone_no
+            self._lone_no = lone_no
+
+    def update(self, matrix, col):
+        "Work out per-vote facts for one roll call; called as the matrix grows"
+        self._grow()
+        n = matrix.n_members
+        votes = matrix._data[:n, col]
+        parties = matrix.parties
+
+        with_party = np.zeros(n, dtype=np.int8)
+        for party in set(parties):
+            members = parties == party
+            yes = np.count_nonzero(votes[members] == YES)
+            no = np.count_nonzero(votes[members] == NO)
+            if yes == no:
+                continue
+
+            majority, minority = (YES, NO) if yes > no else (NO, YES)
+            with_party[members & (votes == majority)] = self.WITH_PARTY
+            with_party[members & (votes == minority)] = self.AGAINST_PARTY
+
+        self._with_party[:, col] = 0
+        self._with_party[:n, col] = with_party
+
+        no = np.flatnonzero(votes == NO)
+        self._lone_no[col] = no[0] if len(no) == 1 else -1
+
+    def _window(self, mask=None, **filters):
+        if mask is None:
+            mask = self.matrix.mask(**filters)
+        n, m = self.matrix.n_members, self.matrix.n_rollcalls
+        return mask, self.matrix.matrix[:, mask], self._with_party[:n, :m][:, mask]
+
+    def _rows(self, columns, order, limit=None):
+        "Build ranked leaderboard rows from per-member arrays"
+        members = self.matrix.members
+        rows = []
+        for rank, i in enumerate(order, 1):
+            row = dict(members[i])
+            for key, values in columns.items():
+                value = values[i]
+                row[key] = round(float(value), 2) if isinstance(value, np.floating) else int(value)
+            row['rank'] = rank
+            rows.append(row)
+        return rows[:limit] if limit else rows
+
+    def totals(self, mask=None, **filters):
+        "Per-member counts of votes eligible, missed and present, in row order"
+        _, votes, _ = self._window(mask, **filters)
+        return {
+            'total_votes': np.count_nonzero(votes != ABSENT, axis=1),
+            'missed_votes': np.count_nonzero(votes == NOT_VOTING, axis=1),
+            'total_present': np.count_nonzero(votes == PRESENT, axis=1),
+        }
+
+    def missed(self, mask=None, limit=None, **filters):
+        "Members ranked by share of votes missed, like ``VotesClient.missed``"
+        totals = self.totals(mask, **filters)
+        total, missed = totals['total_votes'], totals['missed_votes']
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = np.where(total > 0, 100.0 * missed / total, 0.0)
+
+        order = [i for i in np.lexsort((-missed, -pct)) if total[i] > 0]
+        return self._rows({'total_votes': total, 'missed_votes': missed,
+                           'missed_votes_pct': pct}, order, limit)
+
+    def party(self, mask=None, limit=None, **filters):
+        "Members ranked by how often they vote with their party, like ``VotesClient.party``"
+        _, votes, with_party = self._window(mask, **filters)
+        agree = np.count_nonzero(with_party == self.WITH_PARTY, axis=1)
+        against = np.count_nonzero(with_party == self.AGAINST_PARTY, axis=1)
+        total = np.count_nonzero(votes != ABSENT, axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = np.where(agree + against > 0, 100.0 * agree / (agree + against), 0.0)
+
+        order = [i for i in np.argsort(-pct, kind='mergesort') if agree[i] + against[i] > 0]
+        return self._rows({'total_votes': total, 'votes_with_party_pct': pct,
+                           'votes_against_party_pct': np.where(agree + against > 0, 100.0 - pct, 0.0)},
+                          order, limit)
+
+    def loneno(self, mask=None, limit=None, **filters):
+        "Members who were the only no vote, most often first, like ``VotesClient.loneno``"
+        mask, votes, _ = self._window(mask, **filters)
+        lone = self._lone_no[:self.matrix.n_rollcalls][mask]
+        counts = np.bincount(lone[lone >= 0], minlength=self.matrix.n_members)
+        total = np.count_nonzero(votes != ABSENT, axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = np.where(total > 0, 100.0 * counts / total, 0.0)
+
+        order = [i for i in np.argsort(-counts, kind='mergesort') if counts[i] > 0]
+        return self._rows({'total_votes': total, 'lone_no_votes': counts, 'lone_no_pct': pct},
+                          order, limit)
+
+    def perfect(self, mask=None, **filters):
+        "Members who didn't miss a single vote, like ``VotesClient.perfect``"
+        totals = self.totals(mask, **filters)
+        total, missed = totals['total_votes'], totals['missed_votes']
+        order = [i for i in range(len(total)) if total[i] > 0 and missed[i] == 0]
+        return self._rows({'total_votes': total}, order)
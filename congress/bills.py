@@ -1,9 +1,12 @@
 from .client import Client
+from .models import Bill
 from .utils import CURRENT_CONGRESS, check_chamber
 
 
 class BillsClient(Client):
 
+    model = Bill
+
     def by_member(self, member_id, type='introduced'):
         """
         Takes a bioguide ID and a type:
@@ -14,6 +17,15 @@ class BillsClient(Client):
             member_id=member_id, type=type)
         return self.fetch(path)
 
+    def iter_by_member(self, member_id, type='introduced', prefetch=False):
+        """
+        Like ``by_member``, but lazily yields every bill,
+        across as many pages as there are
+        """
+        path = "members/{member_id}/bills/{type}.json".format(
+            member_id=member_id, type=type)
+        return self.paginate(path, 'bills', prefetch=prefetch)
+
     def get(self, bill_id, congress=CURRENT_CONGRESS, type=None):
         if type:
             path = "{congress}/bills/{bill_id}/{type}.json".format(
@@ -47,6 +59,16 @@ class BillsClient(Client):
             congress=congress, chamber=chamber, type=type)
         return self.fetch(path)
 
+    def iter_recent(self, chamber, congress=CURRENT_CONGRESS, type='introduced', prefetch=False):
+        """
+        Like ``recent``, but lazily yields every bill,
+        across as many pages as there are
+        """
+        check_chamber(chamber)
+        path = "{congress}/{chamber}/bills/{type}.json".format(
+            congress=congress, chamber=chamber, type=type)
+        return self.paginate(path, 'bills', prefetch=prefetch)
+
     def introduced(self, chamber, congress=CURRENT_CONGRESS):
         "Shortcut for getting introduced bills"
         return self.recent(chamber, congress, 'introduced')
@@ -0,0 +1,458 @@
+"""
+Cache backends
+
+``SQLiteCache`` keeps every cached response in a single SQLite file, as an
+alternative to ``httplib2.FileCache``, which writes one file per URL.
+It works anywhere httplib2 expects a cache::
+
+    >>> from congress import Congress
+    >>> from congress.cache import SQLiteCache
+    >>> cache = SQLiteCache('congress.sqlite', max_size=500 * 1024 * 1024, ttl=[
+    ...     ('members/*.json', 3 * 86400),
+    ...     ('*/votes/recent.json', 300),
+    ... ])
+    >>> congress = Congress(API_KEY, cache=cache)
+
+``ResultCache`` sits in front of the HTTP cache, keeping already-decoded
+responses in memory so repeated calls skip decoding entirely. Results
+from it are read-only::
+
+    >>> from congress.cache import ResultCache
+    >>> congress = Congress(API_KEY, result_cache=ResultCache(max_bytes=64 * 1024 * 1024, ttl=60))
+
+"""
+import collections
+import email.utils
+import fnmatch
+import logging
+import sqlite3
+import threading
+import time
+
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:
+    from collections import Mapping, Sequence
+
+from .client import Client
+from .utils import copy_json
+
+log = logging.getLogger('congress')
+
+
+def api_path(key, base_uri=Client.BASE_URI):
+    "The API path a cache key (a URL) refers to, without the query string"
+    if key.startswith(base_uri):
+        key = key[len(base_uri):]
+    return key.split('?', 1)[0]
+
+
+def match_rule(rules, path, default=None):
+    "The value of the first ``(pattern, value)`` rule whose pattern matches ``path``"
+    for pattern, value in rules:
+        if fnmatch.fnmatch(path, pattern):
+            return value
+    return default
+
+
+class SQLiteCache(object):
+    """
+    A single-file, indexed cache with LRU eviction and TTL rules.
+
+    ``ttl`` is a list of ``(pattern, seconds)`` rules, matched in order
+    against each request's path (relative to the API root, without
+    the query string) using shell-style wildcards. A matching response is
+    treated as fresh for that many seconds, overriding whatever caching
+    headers it came with; a TTL of zero means don't cache it at all.
+    Responses that match no rule use ``default_ttl``, or their own headers
+    if that's None.
+
+    When the cache grows beyond ``max_size`` bytes or ``max_entries``
+    responses, the least recently used are evicted.
+    """
+
+    def __init__(self, filename='.cache.sqlite', max_size=None, max_entries=None,
+                 ttl=(), default_ttl=None, base_uri=Client.BASE_URI, clock=time.time):
+        self.filename = filename
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self.ttl = list(ttl)
+        self.default_ttl = default_ttl
+        self.base_uri = base_uri
+        self.clock = clock
+        self.lock = threading.RLock()
+
+        self.db = sqlite3.connect(filename, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self.db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+
+        self.size, self.entries = self.db.execute(
+            'SELECT COALESCE(SUM(size), 0), COUNT(*) FROM responses').fetchone()
+
+    def path(self, key):
+        "The API path a cache key (a URL) refers to"
+        return api_path(key, self.base_uri)
+
+    def ttl_for(self, key):
+        "Seconds a response for ``key`` should stay fresh, or None to leave its headers alone"
+        return match_rule(self.ttl, self.path(key), self.default_ttl)
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute('SELECT value FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+
+            self.db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (self.clock(), key))
+            return bytes(row[0])
+
+    def set(self, key, value):
+        ttl = self.ttl_for(key)
+        if ttl == 0:
+            return self.delete(key)
+
+        if ttl is not None:
+            value = set_freshness(value, ttl, self.clock())
+
+        with self.lock:
+            old = self.db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            if old is not None:
+                self.size -= old[0]
+                self.entries -= 1
+
+            self.db.execute('INSERT OR REPLACE INTO responses (key, value, size, accessed) '
+                            'VALUES (?, ?, ?, ?)', (key, sqlite3.Binary(value), len(value), self.clock()))
+            self.size += len(value)
+            self.entries += 1
+            self.evict()
+
+    def delete(self, key):
+        with self.lock:
+            old = self.db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            if old is not None:
+                self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.size -= old[0]
+                self.entries -= 1
+
+    def evict(self):
+        "Drop least recently used responses until we're within limits"
+        with self.lock:
+            while self.entries and (self.max_size is not None and self.size > self.max_size or
+                                    self.max_entries is not None and self.entries > self.max_entries):
+                key, size = self.db.execute(
+                    'SELECT key, size FROM responses ORDER BY accessed LIMIT 1').fetchone()
+                self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.size -= size
+                self.entries -= 1
+
+    def clear(self):
+        with self.lock:
+            self.db.execute('DELETE FROM responses')
+            self.size = self.entries = 0
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.entries
+
+    def __bool__(self):
+        # httplib2 skips caching entirely if the cache is falsy, as an empty one would be
+        return True
+
+    __nonzero__ = __bool__
+
+    def __contains__(self, key):
+        with self.lock:
+            return self.db.execute('SELECT 1 FROM responses WHERE key = ?', (key,)).fetchone() is not None
+
+
+def set_freshness(value, ttl, now):
+    """
+    Rewrite the headers of a cached response, as httplib2 stores them,
+    so it's fresh for ``ttl`` seconds from ``now``.
+    """
+    try:
+        head, body = value.split(b'\r\n\r\n', 1)
+    except ValueError:
+        return value
+
+    lines = [line for line in head.split(b'\r\n')
+             if line.split(b':', 1)[0].strip().lower() not in (b'cache-control', b'expires', b'pragma', b'date')]
+    lines.append(b'cache-control: max-age=' + str(int(ttl)).encode('ascii'))
+    lines.append(b'date: ' + email.utils.formatdate(now, usegmt=True).encode('ascii'))
+
+    return b'\r\n'.join(lines) + b'\r\n\r\n' + body
+
+
+class ResultCache(object):
+    """
+    In-memory LRU cache of decoded responses, keyed on URL.
+
+    Entries expire after ``ttl`` seconds (None to keep them until evicted),
+    and the least recently used are evicted once the raw responses they were
+    decoded from add up to more than ``max_bytes``.
+
+    Cached results are shared, so callers get a read-only view of each
+    result, which costs nothing to hand out. With ``copy=True``, each
+    caller gets its own copy to change instead, but copying a large
+    response can take longer than reading it back from the HTTP cache.
+
+    To serve expired entries while they're refreshed in the background
+    (stale-while-revalidate), give ``stale`` rules: ``(pattern, seconds)``
+    pairs, matched like ``SQLiteCache`` TTL rules, saying how long past
+    expiry an endpoint's results may still be served. Paths matching no
+    rule use ``default_stale``; zero means never serve stale results.
+    Refreshes run on up to ``refresh_workers`` background threads::
+
+        >>> results = ResultCache(ttl=300, stale=[
+        ...     ('*/members.json', 86400),
+        ...     ('*/committees.json', 86400),
+        ...     ('*/bills/*.json', 3600),
+        ... ])
+
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=300, copy=False, clock=time.time,
+                 stale=(), default_stale=0, refresh_workers=2, base_uri=Client.BASE_URI):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.copy = copy
+        self.clock = clock
+        self.stale = list(stale)
+        self.default_stale = default_stale
+        self.refresh_workers = refresh_workers
+        self.base_uri = base_uri
+        self.size = 0
+        self.hits = self.misses = self.stale_hits = 0
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.refreshing = set()
+        self._pool = None
+
+    def get(self, key):
+        "Return the fresh decoded response for ``key``, or None"
+        content, stale = self.lookup(key, allow_stale=False)
+        return content
+
+    def lookup(self, key, allow_stale=True):
+        """
+        Return ``(content, stale)`` for ``key``: the decoded response, or
+        None, and whether it has expired but may still be served while
+        it's refreshed.
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None, False
+
+            # re-insert as most recently used; expired entries are
+            # kept until they're replaced or evicted, see last_good
+            self.entries[key] = entry
+
+            content, size, expires, stale_until = entry
+            now = self.clock()
+            stale = expires is not None and expires <= now
+            if stale and (not allow_stale or stale_until is None or stale_until <= now):
+                self.misses += 1
+                return None, False
+
+            if stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return content, stale
+
+    def last_good(self, key):
+        "The last response stored for ``key``, however old, or None"
+        with self.lock:
+            entry = self.entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def stale_for(self, key):
+        "Seconds past expiry a result for ``key`` may still be served"
+        return match_rule(self.stale, api_path(key, self.base_uri), self.default_stale)
+
+    def set(self, key, content, size):
+        "Store a decoded response, decoded from ``size`` bytes"
+        if size > self.max_bytes:
+            return
+
+        expires = stale_until = None
+        if self.ttl is not None:
+            expires = self.clock() + self.ttl
+            stale = self.stale_for(key) if self.stale or self.default_stale else 0
+            if stale:
+                stale_until = expires + stale
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+
+            self.entries[key] = (content, size, expires, stale_until)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                _, entry = self.entries.popitem(last=False)
+                self.size -= entry[1]
+
+    def claim_refresh(self, key):
+        "Mark ``key`` as being refreshed, returning False if it already is"
+        with self.lock:
+            if key in self.refreshing:
+                return False
+            self.refreshing.add(key)
+            return True
+
+    def release_refresh(self, key):
+        with self.lock:
+            self.refreshing.discard(key)
+
+    def refresh(self, key, func):
+        """
+        Call ``func`` on a background thread to refresh ``key``, unless a
+        refresh is already running. Errors are logged, and the stale
+        result is served until a refresh succeeds or it runs out of time.
+        """
+        if not self.claim_refresh(key):
+            return None
+
+        def run():
+            try:
+                return func()
+            except Exception as e:
+                log.warning('Could not refresh %s: %s', key, e)
+            finally:
+                self.release_refresh(key)
+
+        return self.pool.submit(run)
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            with self.lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.refresh_workers)
+        return self._pool
+
+    def delete(self, key):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def export(self, content, parse):
+        "Apply ``parse`` to a shared, cached response and make the result safe to hand out"
+        if callable(parse):
+            content = parse(content)
+
+        if self.copy:
+            return copy_json(content)
+        return freeze(content)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __bool__(self):
+        return True
+
+    __nonzero__ = __bool__
+
+    def __contains__(self, key):
+        return key in self.entries
+
+
+def freeze(obj):
+    "Wrap decoded JSON in a read-only view"
+    if isinstance(obj, dict):
+        return FrozenDict(obj)
+    if isinstance(obj, list):
+        return FrozenList(obj)
+    return obj
+
+
+def thaw(obj):
+    "Return a mutable copy of a read-only view"
+    if isinstance(obj, (FrozenDict, FrozenList)):
+        return copy_json(obj._data)
+    return copy_json(obj)
+
+
+class FrozenDict(Mapping):
+    """
+    Read-only view of a dict. Nested dicts and lists come back as
+    read-only views too, wrapped as they're accessed.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, key):
+        return freeze(self._data[key])
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenDict):
+            other = other._data
+        return self._data == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'FrozenDict(%r)' % (self._data,)
+
+
+class FrozenList(Sequence):
+    "Read-only view of a list"
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return FrozenList(self._data[index])
+        return freeze(self._data[index])
+
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenList):
+            other = other._data
+        return self._data == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'FrozenList(%r)' % (self._data,)
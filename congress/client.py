@@ -1,14 +1,110 @@
 """
 Base client outlining how we fetch and parse responses
 """
-import json
+import contextlib
 import logging
-import httplib2
+import threading
+import time
 
-from .utils import NotFound, CongressError, u
+from .transport import Httplib2Transport
+from .metrics import Event, NULL_EVENT
+from .stream import ArrayParser, chunked, dig
+from .utils import NotFound, NotCached, CongressError, copy_json, loads, mark_stale
 
 log = logging.getLogger('congress')
 
+PAGE_SIZE = 20
+
+# per-thread request settings, see only_cached
+context = threading.local()
+
+
+@contextlib.contextmanager
+def only_cached():
+    """
+    Make every fetch on the current thread cache-only while inside
+    this block, including fetches made inside subclient methods.
+
+    ::
+
+        >>> with only_cached():
+        ...     hr21 = congress.bills.get('hr21', 115) # raises NotCached on a miss
+
+    """
+    previous = getattr(context, 'cache_only', False)
+    context.cache_only = True
+    try:
+        yield
+    finally:
+        context.cache_only = previous
+
+
+@contextlib.contextmanager
+def refreshing():
+    """
+    Make every fetch on the current thread skip the result cache and
+    revalidate with the API while inside this block, as with
+    ``fetch(..., refresh=True)``.
+    """
+    previous = getattr(context, 'refresh', False)
+    context.refresh = True
+    try:
+        yield
+    finally:
+        context.refresh = previous
+
+
+def close_body(body):
+    "Release a streamed response body that's no longer needed"
+    close = getattr(body, 'close', None)
+    if close is not None:
+        close()
+
+
+class subclient(object):
+    """
+    A subclient attribute, created on first access by the parent's
+    ``create_subclient(cls)`` method and kept on the instance from then on,
+    so building a client doesn't pay for subclients it never uses.
+    """
+
+    def __init__(self, name, cls):
+        self.name = name
+        self.cls = cls
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        client = instance.create_subclient(self.cls)
+        instance.__dict__[self.name] = client
+        return client
+
+
+def next_offset(page, items, offset, seen, page_size=PAGE_SIZE):
+    """
+    Given one page of a list response, return the offset of the next page,
+    or None if this was the last one.
+
+    Paginated endpoints return ``page_size`` items at a time. A short page
+    is the last, as is a longer one (the endpoint isn't paginated at all).
+    When ``num_results`` is a running total rather than a page count,
+    we also stop once we've seen that many.
+    """
+    if len(items) != page_size:
+        return None
+
+    num_results = page.get('num_results')
+    try:
+        num_results = int(num_results)
+    except (TypeError, ValueError):
+        num_results = None
+
+    if num_results and num_results > len(items) and seen >= num_results:
+        return None
+
+    return offset + len(items)
+
 
 class Client(object):
     """
@@ -16,24 +112,88 @@ class Client(object):
     API and parsing what comes back. In addition to storing API credentials,
     a client can use a custom cache, or even a customized
     httplib2.Http instance.
+
+    ``httplib2.Http`` isn't thread-safe, so a client used from other threads
+    gives each thread its own copy of ``http``, sharing the same cache.
+    To make requests some other way, pass a ``transport`` from
+    ``congress.transport``; ``http`` and ``cache`` are then ignored.
+
+    Pass a ``congress.ratelimit.RateLimiter`` to cap the request rate,
+    and a ``congress.ratelimit.Retry`` to retry throttled or failed requests.
+    A ``congress.scheduler.Quota`` counts every request that isn't
+    answered from the cache. A ``congress.cache.ResultCache`` keeps
+    parsed responses in memory, skipping the HTTP cache and JSON decoding.
+    A ``congress.singleflight.SingleFlight`` lets threads asking for the
+    same URL at once share one request. ``hooks`` are told about every
+    fetch; see ``congress.metrics``.
+
+    Pass ``base_uri`` to talk to something other than the live API, such
+    as a ``congress.testing.StandInServer``.
+
+    With ``offline=True``, every response comes from the cache, and a
+    miss raises ``NotCached``. With ``fallback=True``, a failed request is
+    answered with the last good cached response, flagged as stale.
+
+    With ``models=True``, results come back as compact ``congress.models``
+    objects instead of dicts.
     """
 
     BASE_URI = "https://api.propublica.org/congress/v1/"
 
-    def __init__(self, apikey=None, cache='.cache', http=None):
+    # the model for records returned at the top level of a result
+    model = None
+
+    transport = None
+
+    def __init__(self, apikey=None, cache='.cache', http=None, rate_limiter=None, retry=None,
+                 quota=None, result_cache=None, models=False, singleflight=None, hooks=None,
+                 transport=None, offline=False, fallback=False, base_uri=None):
         self.apikey = apikey
+        if base_uri is not None:
+            self.BASE_URI = base_uri
+        self.rate_limiter = rate_limiter
+        self.retry = retry
+        self.quota = quota
+        self.result_cache = result_cache
+        self.models = models
+        self.singleflight = singleflight
+        self.hooks = hooks if hooks is not None else []
+        self.offline = offline
+        self.fallback = fallback
+
+        if transport is None:
+            transport = Httplib2Transport(http, cache)
+        self.transport = transport
+
+    @property
+    def http(self):
+        "The ``httplib2.Http`` this client requests with, if it uses one"
+        return getattr(self.transport, 'http', None)
 
-        if isinstance(http, httplib2.Http):
-            self.http = http
-        else:
-            self.http = httplib2.Http(cache)
+    def get_http(self):
+        """
+        Return an ``httplib2.Http`` that's safe to use from the current thread.
+        Only for clients using an ``Httplib2Transport``.
+        """
+        return self.transport.get_http()
 
-    def fetch(self, path, parse=lambda r: r['results'][0]):
+    def fetch(self, path, parse=lambda r: r['results'][0], cache_only=False, refresh=False):
         """
         Make an API request, with authentication.
 
         This method can be used directly to fetch new endpoints
-        or customize parsing.
+        or customize parsing. With ``cache_only=True``, nothing is
+        requested from the API; a response not already in the cache
+        raises ``NotCached``; a client created with ``offline=True`` treats
+        every fetch this way. With ``refresh=True``, the result cache is
+        skipped and any HTTP-cached response is revalidated with the API.
+
+        If the result cache allows stale results for this path, an expired
+        result is returned at once and refreshed in the background.
+
+        With ``fallback=True`` on the client, a request that fails (other
+        than with ``NotFound``) returns the last good cached response
+        instead, if there is one, flagged so ``is_stale(result)`` is true.
 
         ::
 
@@ -45,15 +205,324 @@ class Client(object):
 
         """
         url = self.BASE_URI + path
+        cache_only = cache_only or self.offline or getattr(context, 'cache_only', False)
+        refresh = refresh or getattr(context, 'refresh', False)
+
+        with self.observe(url, path) as event:
+            if self.result_cache is not None and not refresh:
+                content, stale = self.result_cache.lookup(url)
+                if content is not None:
+                    event.cache = 'memory'
+                    if stale:
+                        event.cache = 'stale'
+                        if not cache_only:
+                            self.result_cache.refresh(url, lambda: self.revalidate(url, path))
+
+                    with event.timer('parse'):
+                        return self.export(content, parse)
+
+            def load():
+                with event.timer('network'):
+                    resp, content = self.request(url, path, cache_only, refresh)
+                event.response(resp, content)
+                with event.timer('decode'):
+                    return self.read_response(resp, content, path, url)
+
+            # httplib2 drops its copy of a response when revalidating it
+            # fails, so read it first in case we need to fall back to it
+            saved = None
+            if self.fallback and not cache_only and (
+                    self.result_cache is None or self.result_cache.last_good(url) is None):
+                saved = self.cached_response(url, path)
+
+            try:
+                if self.singleflight is None:
+                    content, shared = load(), False
+                else:
+                    content, shared = self.singleflight.do(url, load)
+                    if event.cache is None:
+                        event.cache = 'coalesced'
+            except Exception as e:
+                if not self.fallback or cache_only or isinstance(e, (NotFound, NotCached)):
+                    raise
+
+                content = self.last_good(url, path, saved)
+                if content is None:
+                    raise
+
+                log.warning('Serving cached %s after error: %s', path, e)
+                event.cache = 'fallback'
+                with event.timer('parse'):
+                    return mark_stale(self.export(content, parse))
+
+            with event.timer('parse'):
+                return self.export(content, parse, shared)
+
+    @contextlib.contextmanager
+    def observe(self, url, path):
+        """
+        Call each hook's ``before_request``, then ``after_response`` or
+        ``on_error``, around a fetch, yielding the ``Event`` they're given.
+        """
+        if not self.hooks:
+            yield NULL_EVENT
+            return
+
+        event = Event(url, path)
+        self.emit('before_request', event)
+        try:
+            yield event
+        except Exception as e:
+            event.error = e
+            self.emit('on_error', event)
+            raise
+        self.emit('after_response', event)
+
+    def emit(self, name, event):
+        for hook in self.hooks:
+            method = getattr(hook, name, None)
+            if method is None:
+                continue
+            try:
+                method(event)
+            except Exception:
+                # a broken hook shouldn't break requests
+                log.exception('Error in %s hook %r', name, hook)
+
+    def cached_response(self, url, path):
+        "The raw response for ``url`` in the HTTP cache, however old, or None"
+        try:
+            return self.request(url, path, cache_only=True)
+        except NotCached:
+            return None
+
+    def last_good(self, url, path, saved=None):
+        """
+        The last successful response for ``url``, decoded, from the result
+        cache (however old) or the HTTP cache, or None. ``saved`` is a raw
+        response read from the HTTP cache before the request that failed.
+        """
+        if self.result_cache is not None:
+            content = self.result_cache.last_good(url)
+            if content is not None:
+                return content
+
+        if saved is None:
+            saved = self.cached_response(url, path)
+            if saved is None:
+                return None
+
+        try:
+            return self.decode(saved[0], saved[1], path, url)
+        except CongressError:
+            return None
+
+    def revalidate(self, url, path):
+        "Fetch a fresh copy of a stale result into the result cache"
+        resp, content = self.request(url, path, refresh=True)
+        return self.read_response(resp, content, path, url)
+
+    def request(self, url, path, cache_only=False, refresh=False, stream=False):
+        """
+        Request a URL, with authentication, rate limiting and retries,
+        returning the raw response and body. With ``refresh=True``, a
+        response in the HTTP cache is revalidated even if it's fresh.
+        With ``stream=True``, the body is an iterable of chunks.
+        """
         headers = {'X-API-Key': self.apikey}
+        if refresh:
+            headers['cache-control'] = 'max-age=0'
+
+        send = self.open_stream if stream else self.transport.request
 
         log.debug(url)
 
-        resp, content = self.http.request(url, headers=headers)
-        content = u(content)
-        content = json.loads(content)
+        if cache_only or getattr(context, 'cache_only', False):
+            headers['cache-control'] = 'only-if-cached'
+            resp, content = send(url, headers)
+            if resp.status == 504:
+                raise NotCached(path)
+            return resp, content
+
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            resp, content = send(url, headers)
+
+            # httplib2 marks a revalidated response as from the cache,
+            # but the 304 still came from the API
+            if self.quota is not None and (not getattr(resp, 'fromcache', False)
+                                           or resp.get('status') == '304'):
+                self.quota.consume()
+
+            delay = self.retry_delay(resp, attempt)
+            if delay is None:
+                return resp, content
 
-        # handle errors
+            if stream:
+                close_body(content)
+            time.sleep(delay)
+            attempt += 1
+
+    def open_stream(self, url, headers):
+        "Request a URL from the transport, with the body as an iterable of chunks"
+        stream = getattr(self.transport, 'stream', None)
+        if stream is not None:
+            return stream(url, headers)
+
+        resp, content = self.transport.request(url, headers)
+        return resp, chunked(content)
+
+    def stream(self, path, keys, cache_only=False, refresh=False):
+        """
+        Request ``path`` and yield each element of the array at ``keys``
+        in the response, a sequence of object keys and list indexes, as
+        it's parsed, instead of decoding the whole response at once::
+
+            >>> for member in client.stream('115/house/members.json', ('results', 0, 'members')):
+            ...     print(member['id'])
+
+        Errors are raised as they would be by ``fetch``. Streamed responses
+        aren't kept in the result cache or coalesced; see ``congress.stream``.
+        """
+        url = self.BASE_URI + path
+        cache_only = cache_only or self.offline or getattr(context, 'cache_only', False)
+        refresh = refresh or getattr(context, 'refresh', False)
+
+        with self.observe(url, path) as event:
+            with event.timer('network'):
+                resp, body = self.request(url, path, cache_only, refresh, stream=True)
+            event.response(resp, b'')
+
+            try:
+                if resp.status != 200:
+                    content = self.decode(resp, b''.join(body), path, url)
+                    for item in dig(content, keys) or []:
+                        yield self.export_item(item, keys)
+                    return
+
+                parser = ArrayParser(keys)
+                for chunk in body:
+                    for item in self.stream_items(parser, chunk, resp, path, url, event):
+                        yield item
+                    if parser.done:
+                        break
+
+                if not parser.done:
+                    for item in self.stream_items(parser, None, resp, path, url, event):
+                        yield item
+            finally:
+                close_body(body)
+
+    def stream_items(self, parser, chunk, resp, path, url, event):
+        """
+        Feed the next chunk of a streamed response to an ``ArrayParser``,
+        or None at the end of the response, returning the elements it
+        completed. Unsuccessful responses raise as they would in ``decode``.
+        """
+        try:
+            with event.timer('decode'):
+                if chunk is None:
+                    items = parser.close()
+                else:
+                    event.bytes += len(chunk)
+                    items = parser.feed(chunk)
+        except ValueError:
+            raise CongressError('Could not decode response', resp, url)
+
+        if parser.done and not parser.found:
+            self.check(parser.header, resp, path, url)
+            raise CongressError('No array at %r in response' % (parser.keys,), resp, url)
+
+        # the status comes before the results, so this is known by the first element
+        if parser.header.get('status', 'OK') != 'OK':
+            self.check(parser.header, resp, path, url)
+
+        return [self.export_item(item, parser.keys) for item in items]
+
+    def export_item(self, item, keys):
+        "Turn one streamed array element into what callers get back"
+        if self.models:
+            from .models import convert_field
+            item = convert_field(keys[-1], item)
+        return item
+
+    def retry_delay(self, resp, attempt):
+        """
+        How long to wait before retrying a request, or None to stop here.
+        A throttled response also holds off every other request sharing
+        this client's rate limiter.
+        """
+        if self.retry is None:
+            return None
+
+        delay = self.retry.delay(resp, attempt)
+        if delay is not None:
+            log.warning('Retrying in %.2fs after HTTP %s (attempt %d)',
+                        delay, resp.status, attempt + 1)
+
+            if self.rate_limiter is not None and resp.status == 429:
+                self.rate_limiter.pause(delay)
+
+        return delay
+
+    def handle_response(self, resp, content, path, url, parse):
+        """
+        Decode a raw response body, raise ``NotFound`` or ``CongressError``
+        for unsuccessful responses and apply ``parse`` to the rest.
+
+        This is shared by every client, sync or async, so errors
+        look the same no matter how a response was fetched.
+        """
+        return self.export(self.read_response(resp, content, path, url), parse)
+
+    def read_response(self, resp, content, path, url):
+        "Decode a raw response body and keep it in the result cache"
+        size = len(content)
+        content = self.decode(resp, content, path, url)
+
+        if self.result_cache is not None:
+            self.result_cache.set(url, content, size)
+
+        return content
+
+    def export(self, content, parse, shared=False):
+        """
+        Turn a decoded response into what callers get back. A ``shared``
+        response went to other callers too, so each gets its own copy.
+        """
+        if self.models:
+            # converting builds new containers all the way down, so the
+            # models are already this caller's own copy, even of a cached
+            # or shared response
+            from .models import convert
+            if callable(parse):
+                content = parse(content)
+            return convert(content, self.model)
+
+        if self.result_cache is not None:
+            return self.result_cache.export(content, parse)
+
+        if callable(parse):
+            content = parse(content)
+        if shared:
+            content = copy_json(content)
+        return content
+
+    def decode(self, resp, content, path, url):
+        "Decode a raw response body, raising an error if the request wasn't successful"
+        try:
+            content = loads(content)
+        except ValueError:
+            raise CongressError('Could not decode response', resp, url)
+
+        self.check(content, resp, path, url)
+        return content
+
+    def check(self, content, resp, path, url):
+        "Raise ``NotFound`` or ``CongressError`` if a decoded response isn't successful"
         if not content.get('status') == 'OK':
 
             if "errors" in content and content['errors'][0]['error'] == "Record not found":
@@ -64,7 +533,78 @@ class Client(object):
 
             raise CongressError(content, resp, url)
 
-        if callable(parse):
-            content = parse(content)
+    def fetch_many(self, paths, parse=lambda r: r['results'][0],
+                   max_workers=8, return_exceptions=True):
+        """
+        Fetch several paths concurrently on a thread pool.
 
-        return content
+        Results come back in the same order as ``paths``. By default,
+        a path that fails has its exception in place of a result, so one
+        bad request doesn't throw away the rest; pass
+        ``return_exceptions=False`` to raise the first error instead.
+
+        ::
+
+            >>> paths = ['115/senate/sessions/1/votes/%d.json' % n for n in range(1, 11)]
+            >>> votes = client.fetch_many(paths, parse=lambda r: r['results'])
+
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        def fetch(path):
+            try:
+                return self.fetch(path, parse=parse)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(fetch, paths))
+
+    def paginate(self, path, key, parse=lambda r: r['results'][0],
+                 page_size=PAGE_SIZE, prefetch=False):
+        """
+        Lazily walk a paginated list endpoint, yielding each item under
+        ``key`` on each page, and requesting pages with ``offset``
+        until the list runs out.
+
+        With ``prefetch=True``, the next page is requested in a background
+        thread while the caller works through the current one.
+
+        ::
+
+            >>> for bill in client.paginate('115/house/bills/introduced.json', 'bills'):
+            ...     print(bill['bill_id'])
+
+        """
+        pool = None
+        if prefetch:
+            from concurrent.futures import ThreadPoolExecutor
+            pool = ThreadPoolExecutor(max_workers=1)
+
+        def fetch(offset):
+            return self.fetch("{0}?offset={1}".format(path, offset), parse=parse)
+
+        try:
+            offset, seen = 0, 0
+            page = fetch(offset)
+            while True:
+                items = page.get(key) or []
+                seen += len(items)
+                offset = next_offset(page, items, offset, seen, page_size)
+
+                upcoming = None
+                if offset is not None and pool is not None:
+                    upcoming = pool.submit(fetch, offset)
+
+                for item in items:
+                    yield item
+
+                if offset is None:
+                    break
+
+                page = upcoming.result() if upcoming is not None else fetch(offset)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False)
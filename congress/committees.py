@@ -1,9 +1,12 @@
 from .client import Client
+from .models import Committee
 from .utils import CURRENT_CONGRESS, check_chamber
 
 
 class CommitteesClient(Client):
 
+    model = Committee
+
     def filter(self, chamber, congress=CURRENT_CONGRESS):
         check_chamber(chamber)
         path = "{congress}/{chamber}/committees.json".format(
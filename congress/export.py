@@ -0,0 +1,296 @@
+"""
+Streaming export to NDJSON, SQLite and Parquet
+
+``export`` reads records from any iterable, such as a subclient's
+``iter_*`` methods, flattens each into a single level of columns, and
+hands them to a writer in batches, so memory use depends on the batch
+size, not the size of the dataset::
+
+    >>> from congress import Congress
+    >>> from congress.export import export, vote_positions, SQLiteWriter
+    >>> congress = Congress(API_KEY)
+    >>> with SQLiteWriter('positions.sqlite', 'positions') as writer:
+    ...     export(vote_positions(congress.votes, 'house', range(1, 101), 1, 115), writer)
+    43500
+
+Nested fields become columns with their keys joined by ``_``, so a vote's
+``{"total": {"yes": 1}}`` becomes ``total_yes``. Lists are kept as JSON text.
+
+For the async subclients' iterators, use ``congress.aio.export_async``.
+
+Parquet needs `pyarrow <https://arrow.apache.org/docs/python/>`_, which is
+not installed by default.
+"""
+import itertools
+import json
+import logging
+import os
+import sqlite3
+
+from .models import Model, unconvert
+from .utils import CURRENT_CONGRESS
+
+log = logging.getLogger('congress')
+
+BATCH_SIZE = 1000
+
+# what sqlite3 stores as is; on Python 2, that includes unicode and long
+try:
+    SQLITE_TYPES = (int, long, float, str, unicode, bytes)
+except NameError:
+    SQLITE_TYPES = (int, float, str, bytes)
+
+
+def flatten(record, sep='_', prefix=''):
+    """
+    Flatten nested dicts into one level, joining keys with ``sep``.
+    Lists are encoded as JSON text, and models as plain dicts::
+
+        >>> flatten({'bill_id': 'hr21-115', 'sponsor': {'id': 'P000197'}, 'cosponsors': ['A', 'B']})
+        {'bill_id': 'hr21-115', 'sponsor_id': 'P000197', 'cosponsors': '["A", "B"]'}
+
+    """
+    if isinstance(record, Model):
+        record = record.to_dict()
+
+    row = {}
+    for key, value in record.items():
+        name = prefix + key
+        if isinstance(value, Model):
+            value = value.to_dict()
+
+        if isinstance(value, dict):
+            row.update(flatten(value, sep, name + sep))
+        elif isinstance(value, list):
+            row[name] = json.dumps(unconvert(value), default=str)
+        else:
+            row[name] = value
+    return row
+
+
+def batches(records, size=BATCH_SIZE):
+    "Group an iterable into lists of at most ``size`` items"
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def vote_positions(votes, chamber, rollcall_nums, session, congress=CURRENT_CONGRESS):
+    """
+    Yield one row per member position for each roll call, labelled with
+    its ``congress``, ``chamber``, ``session`` and ``roll_call``. Takes a
+    ``VotesClient`` and streams each roll call with ``iter_positions``,
+    so only one position need be in memory at a time.
+    """
+    for num in rollcall_nums:
+        for position in votes.iter_positions(chamber, num, session, congress):
+            row = {'congress': congress, 'chamber': chamber, 'session': session, 'roll_call': num}
+            row.update(position.to_dict() if isinstance(position, Model) else position)
+            yield row
+
+
+def export(records, writer, batch_size=BATCH_SIZE, flatten=flatten):
+    """
+    Write records to ``writer`` in batches of ``batch_size``, after
+    passing each through ``flatten`` (or as they are, if that's None).
+    Returns the number of records written.
+    """
+    count = 0
+    if flatten is not None:
+        records = (flatten(record) for record in records)
+
+    for batch in batches(records, batch_size):
+        writer.write_batch(batch)
+        count += len(batch)
+
+    return count
+
+
+class Writer(object):
+    "Base class for writers, which take rows a batch at a time"
+
+    def write_batch(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class NDJSONWriter(Writer):
+    """
+    Writes one JSON object per line, to a filename or an open text file.
+    Values JSON can't encode, such as dates, are written as strings.
+    """
+
+    def __init__(self, file):
+        self.owned = not hasattr(file, 'write')
+        self.file = open(file, 'w') if self.owned else file
+
+    def write_batch(self, rows):
+        self.file.writelines(json.dumps(row, default=str) + '\n' for row in rows)
+
+    def close(self):
+        if self.owned:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+def sqlite_value(value):
+    if value is None or isinstance(value, SQLITE_TYPES):
+        return value
+    return str(value)
+
+
+def quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+class SQLiteWriter(Writer):
+    """
+    Writes rows to a SQLite ``table``, created from the columns of the
+    first batch. Columns that turn up later are added as they appear.
+    Each batch is inserted in one transaction.
+
+    Pass ``key``, a column name or a tuple of them, to make it the
+    table's primary key and replace rows with the same key, so an export
+    can be run again without duplicating rows.
+    """
+
+    def __init__(self, filename, table, key=None):
+        self.filename = filename
+        self.table = table
+        self.key = (key,) if isinstance(key, str) else tuple(key or ())
+        self.db = sqlite3.connect(filename)
+        self.columns = [row[1] for row in self.db.execute('PRAGMA table_info(%s)' % quote(table))]
+
+    def add_columns(self, rows):
+        new = []
+        seen = set(self.columns)
+        for row in rows:
+            for column in row:
+                if column not in seen:
+                    seen.add(column)
+                    new.append(column)
+
+        if not new:
+            return
+
+        if not self.columns:
+            columns = [quote(c) for c in new]
+            if self.key:
+                columns.append('PRIMARY KEY (%s)' % ', '.join(quote(c) for c in self.key))
+            self.db.execute('CREATE TABLE %s (%s)' % (quote(self.table), ', '.join(columns)))
+        else:
+            for column in new:
+                self.db.execute('ALTER TABLE %s ADD COLUMN %s' % (quote(self.table), quote(column)))
+
+        self.columns.extend(new)
+
+    def write_batch(self, rows):
+        with self.db:
+            self.add_columns(rows)
+            sql = '%s INTO %s (%s) VALUES (%s)' % (
+                'INSERT OR REPLACE' if self.key else 'INSERT', quote(self.table),
+                ', '.join(quote(c) for c in self.columns), ', '.join('?' * len(self.columns)))
+            self.db.executemany(sql, ([sqlite_value(row.get(c)) for c in self.columns] for row in rows))
+
+    def close(self):
+        self.db.close()
+
+
+class ParquetWriter(Writer):
+    """
+    Writes rows to a Parquet file, one row group per batch.
+
+    The schema comes from the first batch unless you pass a
+    ``pyarrow.Schema`` as ``schema``. Columns missing from a row are
+    null; columns not in the schema are dropped, with a warning. Columns
+    that are null throughout the first batch are typed as strings, so pass
+    a ``schema`` if that batch can't tell you every column's type.
+
+    Requires pyarrow, which is not installed by default.
+    """
+
+    def __init__(self, filename, schema=None, compression='snappy'):
+        import pyarrow
+        import pyarrow.parquet
+
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.filename = filename
+        self.schema = schema
+        self.compression = compression
+        self.writer = None
+        self.dropped = set()
+
+    def infer_schema(self, rows):
+        pa = self.pa
+        columns = {}
+        for row in rows:
+            for column in row:
+                columns.setdefault(column, None)
+
+        fields = []
+        for column in columns:
+            dtype = pa.array([row.get(column) for row in rows]).type
+            if pa.types.is_null(dtype):
+                dtype = pa.string()
+            fields.append(pa.field(column, dtype))
+        return pa.schema(fields)
+
+    def write_batch(self, rows):
+        if self.writer is None:
+            if self.schema is None:
+                self.schema = self.infer_schema(rows)
+            self.writer = self.pq.ParquetWriter(self.filename, self.schema,
+                                                compression=self.compression)
+
+        names = set(self.schema.names)
+        for row in rows:
+            for column in row:
+                if column not in names and column not in self.dropped:
+                    self.dropped.add(column)
+                    log.warning('Dropping column %r, which is not in the Parquet schema', column)
+
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {
+    '.ndjson': NDJSONWriter,
+    '.jsonl': NDJSONWriter,
+    '.sqlite': SQLiteWriter,
+    '.db': SQLiteWriter,
+    '.parquet': ParquetWriter,
+}
+
+
+def open_writer(filename, table=None, **kwargs):
+    """
+    Open the right writer for a filename's extension: ``.ndjson`` or
+    ``.jsonl``, ``.sqlite`` or ``.db`` (which need a ``table``), or
+    ``.parquet``. Other keyword arguments go to the writer.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in WRITERS:
+        raise ValueError('No writer for %r files' % ext)
+
+    cls = WRITERS[ext]
+    if cls is SQLiteWriter:
+        if table is None:
+            raise ValueError('Exporting to SQLite needs a table name')
+        return cls(filename, table, **kwargs)
+    return cls(filename, **kwargs)
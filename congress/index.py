@@ -0,0 +1,175 @@
+"""
+In-memory member lookups
+
+``MemberIndex`` loads every member of both chambers with two
+``MembersClient.list_chamber`` requests, then answers lookups by bioguide ID,
+state, district, party and other IDs from hash indexes, without touching
+the network::
+
+    >>> from congress import Congress
+    >>> from congress.index import MemberIndex
+    >>> index = MemberIndex(Congress(API_KEY), refresh_interval=86400).start()
+    >>> index.get('P000197')['last_name']
+    'Pelosi'
+    >>> [m['id'] for m in index.filter('senate', state='RI')]
+    ['R000122', 'W000802']
+
+"""
+import logging
+import threading
+import time
+
+from .utils import CURRENT_CONGRESS, check_chamber
+
+log = logging.getLogger('congress')
+
+# other IDs members can be looked up by
+ID_FIELDS = ('govtrack_id', 'cspan_id', 'votesmart_id', 'icpsr_id', 'crp_id',
+             'fec_candidate_id', 'google_entity_id', 'ocd_id', 'twitter_account')
+
+
+def normalize_district(district):
+    if district is None:
+        return None
+    return str(district).lstrip('0') or '0'
+
+
+class Indexes(object):
+    "One immutable snapshot of every index, swapped in whole on refresh"
+
+    def __init__(self, members):
+        self.members = members
+        self.by_id = {}
+        self.by_state = {}
+        self.by_district = {}
+        self.by_party = {}
+        self.by_other = dict((field, {}) for field in ID_FIELDS)
+
+        for member in members:
+            chamber = member['chamber']
+            state = (member.get('state') or '').upper()
+
+            self.by_id[member['id']] = member
+            self.by_state.setdefault((chamber, state), []).append(member)
+            self.by_party.setdefault((chamber, member.get('party')), []).append(member)
+
+            if chamber == 'house':
+                key = (state, normalize_district(member.get('district')))
+                self.by_district.setdefault(key, []).append(member)
+
+            for field in ID_FIELDS:
+                value = member.get(field)
+                if value:
+                    self.by_other[field][str(value)] = member
+
+
+class MemberIndex(object):
+    """
+    Hash indexes over every member of a Congress, built from
+    ``list_chamber`` for both chambers.
+
+    ``client`` is a ``Congress`` instance (or its ``members`` subclient).
+    Indexes are built on first use, and rebuilt every ``refresh_interval``
+    seconds by a background thread once ``start()`` is called. Lookups
+    always see a complete snapshot; a refresh swaps the new one in at once.
+
+    Each member dict gets a ``chamber`` key, ``'house'`` or ``'senate'``.
+    """
+
+    def __init__(self, client, congress=CURRENT_CONGRESS, refresh_interval=86400, clock=time.time):
+        self.client = getattr(client, 'members', client)
+        self.congress = congress
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self.updated = None
+        self._indexes = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        "Rebuild every index from the API"
+        members = []
+        for chamber in ('house', 'senate'):
+            result = self.client.list_chamber(chamber, self.congress)
+            for member in result['members']:
+                member = dict(member)
+                member['chamber'] = chamber
+                members.append(member)
+
+        self._indexes = Indexes(members)
+        self.updated = self.clock()
+        return self
+
+    @property
+    def indexes(self):
+        if self._indexes is None:
+            with self._lock:
+                if self._indexes is None:
+                    self.refresh()
+        return self._indexes
+
+    def start(self):
+        "Refresh in a background thread every ``refresh_interval`` seconds"
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='congress-member-index')
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        self.indexes  # build now, if nobody has yet
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                # keep serving the old snapshot
+                log.exception('Could not refresh member index')
+
+    # lookups
+    def get(self, member_id):
+        "A member by bioguide ID, or None, like ``MembersClient.get``"
+        return self.indexes.by_id.get(member_id)
+
+    def by_id(self, field, value):
+        "A member by another ID, such as ``govtrack_id`` or ``fec_candidate_id``"
+        if field not in ID_FIELDS:
+            raise KeyError('%s is not indexed' % field)
+        return self.indexes.by_other[field].get(str(value))
+
+    def filter(self, chamber, state=None, district=None, party=None, current=True):
+        """
+        Members of a chamber, by state, state and district, and/or party,
+        like ``MembersClient.filter``. Only members still in office are
+        included unless ``current=False``.
+        """
+        check_chamber(chamber)
+        chamber = chamber.lower()
+        indexes = self.indexes
+
+        if state is not None and district is not None:
+            members = indexes.by_district.get((state.upper(), normalize_district(district)), [])
+        elif state is not None:
+            members = indexes.by_state.get((chamber, state.upper()), [])
+        elif party is not None:
+            members = indexes.by_party.get((chamber, party), [])
+        else:
+            members = [m for m in indexes.members if m['chamber'] == chamber]
+
+        return [m for m in members
+                if m['chamber'] == chamber
+                and (party is None or m.get('party') == party)
+                and (not current or m.get('in_office', True))]
+
+    def __len__(self):
+        return len(self.indexes.members)
+
+    def __contains__(self, member_id):
+        return member_id in self.indexes.by_id
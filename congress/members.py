@@ -1,15 +1,27 @@
 from .client import Client
+from .models import Member
 from .utils import CURRENT_CONGRESS, check_chamber
 
 
 class MembersClient(Client):
 
+    model = Member
+
     def list_chamber(self, chamber,congress=CURRENT_CONGRESS):
         "Returns full member list for a chamber, the members.json endpoint"
         check_chamber(chamber)
         path = "{congress}/{chamber}/members.json".format(congress=congress,chamber=chamber)
         return self.fetch(path)
 
+    def iter_chamber(self, chamber, congress=CURRENT_CONGRESS):
+        """
+        Like ``list_chamber``, but yields each member as the response is
+        parsed, without decoding the whole list at once
+        """
+        check_chamber(chamber)
+        path = "{congress}/{chamber}/members.json".format(congress=congress, chamber=chamber)
+        return self.stream(path, ('results', 0, 'members'))
+
     def get(self, member_id):
         "Takes a bioguide_id, returns a legislator"
         path = "members/{0}.json".format(member_id)
@@ -43,6 +55,11 @@ class MembersClient(Client):
         path = "members/{0}/bills/{1}.json".format(member_id, type)
         return self.fetch(path)
 
+    def iter_bills(self, member_id, type='introduced', prefetch=False):
+        "Same as BillsClient.iter_by_member"
+        path = "members/{0}/bills/{1}.json".format(member_id, type)
+        return self.paginate(path, 'bills', prefetch=prefetch)
+
     def new(self, **kwargs):
         "Returns a list of new members"
         path = "members/new.json"
@@ -0,0 +1,334 @@
+"""
+Request hooks and metrics
+
+Every fetch can be observed by a list of ``hooks``, objects with any of
+``before_request``, ``after_response`` and ``on_error`` methods. Each is
+called with an ``Event`` describing the fetch: its path and endpoint
+template, HTTP status, where the response came from, its size, and how
+long the network, decoding and parsing took.
+
+``Metrics`` is a hook that keeps counters and histograms of all that by
+endpoint template, so ``115/senate/members.json`` and
+``116/house/members.json`` are both counted under
+``{congress}/{chamber}/members.json``::
+
+    >>> from congress import Congress
+    >>> from congress.metrics import Metrics
+    >>> metrics = Metrics()
+    >>> congress = Congress(API_KEY, hooks=[metrics])
+    >>> senate = congress.members.list_chamber('senate')
+    >>> metrics.snapshot()['{congress}/{chamber}/members.json']['cache']
+    {'miss': 1}
+
+``snapshot()`` returns plain dicts and lists, ready to hand to a StatsD
+client, and ``prometheus()`` renders one in the Prometheus text format.
+"""
+import contextlib
+import re
+import threading
+from timeit import default_timer
+
+CHAMBERS = ('house', 'senate', 'joint', 'both')
+BILL_TYPES = ('hr', 's', 'hres', 'sres', 'hjres', 'sjres', 'hconres', 'sconres')
+
+MEMBER_ID = re.compile(r'^[A-Z]\d{6}$')
+BILL_ID = re.compile(r'^(%s)\d+$' % '|'.join(BILL_TYPES))
+NOMINATION_ID = re.compile(r'^PN\d+(-\d+)?$')
+COMMITTEE_ID = re.compile(r'^[A-Z]{4}\d*$')
+STATE = re.compile(r'^[A-Z]{2}$')
+DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+# histogram bucket upper bounds
+TIME_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def segment_name(segment, previous, first):
+    "The placeholder for one path segment, or the segment itself"
+    if segment.isdigit():
+        if first:
+            return '{congress}'
+        if previous == 'sessions':
+            return '{session}'
+        if previous == 'votes':
+            return '{year}' if len(segment) == 4 else '{roll_call}'
+        if previous == '{year}':
+            return '{month}'
+        if previous == '{state}':
+            return '{district}'
+        if len(segment) <= 3:
+            return '{congress}'
+        return '{n}'
+
+    if segment in CHAMBERS:
+        return '{chamber}'
+    if DATE.match(segment):
+        return '{date}'
+    if MEMBER_ID.match(segment):
+        return '{member_id}'
+    if BILL_ID.match(segment):
+        return '{bill_id}'
+    if NOMINATION_ID.match(segment):
+        return '{nomination_id}'
+    if STATE.match(segment):
+        return '{state}'
+    if COMMITTEE_ID.match(segment):
+        return '{committee_id}'
+    return segment
+
+
+def endpoint_template(path):
+    """
+    Turn a request path into the endpoint it belongs to, replacing
+    Congress numbers, chambers, IDs, states and dates with placeholders
+    and dropping the query string::
+
+        >>> endpoint_template('115/senate/sessions/1/votes/17.json')
+        '{congress}/{chamber}/sessions/{session}/votes/{roll_call}.json'
+
+    """
+    path = path.split('?', 1)[0]
+    names = []
+    previous = None
+    for i, segment in enumerate(path.split('/')):
+        stem, dot, ext = segment.partition('.')
+        previous = segment_name(stem, previous, i == 0)
+        names.append(previous + dot + ext)
+    return '/'.join(names)
+
+
+class Event(object):
+    """
+    One fetch, as seen by hooks.
+
+    ``cache`` is ``'memory'`` for a ``ResultCache`` hit, ``'stale'`` for an
+    expired one served while it's refreshed, ``'hit'`` for a
+    fresh HTTP cache entry, ``'revalidated'`` for a stale entry the API
+    confirmed with a 304, ``'miss'`` for a full response, and
+    ``'coalesced'`` for a response shared by a ``SingleFlight``.
+    ``times`` holds seconds spent in ``network``, ``decode`` and ``parse``.
+    """
+
+    def __init__(self, url, path):
+        self.url = url
+        self.path = path
+        self.status = None
+        self.cache = None
+        self.bytes = 0
+        self.error = None
+        self.times = {}
+        self._endpoint = None
+
+    @property
+    def endpoint(self):
+        if self._endpoint is None:
+            self._endpoint = endpoint_template(self.path)
+        return self._endpoint
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = default_timer()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0) + default_timer() - start
+
+    def response(self, resp, content):
+        "Record what came back from the HTTP layer"
+        self.status = getattr(resp, 'status', None)
+        self.bytes = len(content)
+        if not getattr(resp, 'fromcache', False):
+            self.cache = 'miss'
+        elif resp.get('status') == '304':
+            # httplib2 turns a 304 into a 200, but keeps the original status header
+            self.cache = 'revalidated'
+        else:
+            self.cache = 'hit'
+
+
+class NullEvent(object):
+    "Stands in for ``Event`` when nobody is listening"
+
+    cache = None
+    bytes = 0
+    timer = staticmethod(lambda name: NULL_TIMER)
+
+    def response(self, resp, content):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+
+class NullTimer(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = NullTimer()
+NULL_EVENT = NullEvent()
+
+
+class Hook(object):
+    "Base class for hooks. Override whichever methods you need."
+
+    def before_request(self, event):
+        pass
+
+    def after_response(self, event):
+        pass
+
+    def on_error(self, event):
+        pass
+
+
+class Histogram(object):
+    "Counts of observed values at or under each bucket's upper bound"
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        i = 0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        "Cumulative ``(upper bound, count)`` pairs, ending with ``inf``"
+        total, buckets = 0, []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
+
+class EndpointStats(object):
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = {}
+        self.cache = {}
+        self.statuses = {}
+        self.histograms = {
+            'network': Histogram(TIME_BUCKETS),
+            'decode': Histogram(TIME_BUCKETS),
+            'parse': Histogram(TIME_BUCKETS),
+            'bytes': Histogram(SIZE_BUCKETS),
+        }
+
+    def snapshot(self):
+        data = dict((name, h.snapshot()) for name, h in self.histograms.items())
+        data.update(requests=self.requests, errors=dict(self.errors),
+                    cache=dict(self.cache), statuses=dict(self.statuses))
+        return data
+
+
+class Metrics(Hook):
+    """
+    Counts requests, errors, cache results and HTTP statuses, and keeps
+    histograms of network, decode and parse time and response size,
+    by endpoint template.
+
+    Pass a different ``template`` function to group paths another way.
+    """
+
+    def __init__(self, template=endpoint_template):
+        self.template = template
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def stats(self, event):
+        endpoint = self.template(event.path)
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = EndpointStats()
+        return stats
+
+    def after_response(self, event):
+        with self.lock:
+            stats = self.stats(event)
+            self.count(stats, event)
+
+    def on_error(self, event):
+        name = event.error.__class__.__name__
+        with self.lock:
+            stats = self.stats(event)
+            stats.errors[name] = stats.errors.get(name, 0) + 1
+            self.count(stats, event)
+
+    def count(self, stats, event):
+        stats.requests += 1
+        if event.cache is not None:
+            stats.cache[event.cache] = stats.cache.get(event.cache, 0) + 1
+        if event.status is not None:
+            stats.statuses[event.status] = stats.statuses.get(event.status, 0) + 1
+        if event.cache in ('miss', 'revalidated'):
+            stats.histograms['bytes'].observe(event.bytes)
+        for name, seconds in event.times.items():
+            stats.histograms[name].observe(seconds)
+
+    def snapshot(self):
+        "Every endpoint's counters and histograms, as plain data"
+        with self.lock:
+            return dict((endpoint, stats.snapshot()) for endpoint, stats in self.endpoints.items())
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+    def prometheus(self, prefix='congress'):
+        "Render a snapshot in the Prometheus text exposition format"
+        return prometheus(self.snapshot(), prefix)
+
+
+def prometheus(snapshot, prefix='congress'):
+    """
+    Render a ``Metrics.snapshot()`` in the Prometheus text exposition
+    format: one contiguous group per metric family, each with its
+    ``# TYPE`` line, and a sample for each endpoint within it
+    """
+    lines = []
+    endpoints = sorted(snapshot.items())
+
+    def label(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+    def ep(endpoint):
+        return 'endpoint="%s"' % label(endpoint)
+
+    metric = '%s_requests_total' % prefix
+    lines.append('# TYPE %s counter' % metric)
+    for endpoint, data in endpoints:
+        lines.append('%s{%s} %d' % (metric, ep(endpoint), data['requests']))
+
+    for name, key in (('errors', 'type'), ('cache', 'result'), ('statuses', 'status')):
+        metric = '%s_%s_total' % (prefix, name)
+        lines.append('# TYPE %s counter' % metric)
+        for endpoint, data in endpoints:
+            for value, count in sorted(data[name].items()):
+                lines.append('%s{%s,%s="%s"} %d' % (metric, ep(endpoint), key, label(value), count))
+
+    for name in ('network', 'decode', 'parse', 'bytes'):
+        metric = prefix + ('_response_bytes' if name == 'bytes' else '_%s_seconds' % name)
+        lines.append('# TYPE %s histogram' % metric)
+        for endpoint, data in endpoints:
+            histogram = data[name]
+            for bound, count in histogram['buckets']:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('%s_bucket{%s,le="%s"} %d' % (metric, ep(endpoint), le, count))
+            lines.append('%s_sum{%s} %r' % (metric, ep(endpoint), histogram['sum']))
+            lines.append('%s_count{%s} %d' % (metric, ep(endpoint), histogram['count']))
+
+    return '\n'.join(lines) + '\n'
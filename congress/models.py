@@ -0,0 +1,319 @@
+"""
+Compact result models
+
+API responses are nested dicts, which are convenient but heavy when you hold
+thousands of members, bills or vote positions in memory. These models store
+known fields in ``__slots__``, parse dates once, and intern short, repetitive
+strings like party, state and vote position, so every copy shares one object.
+
+Turn them on for a whole client::
+
+    >>> congress = Congress(API_KEY, models=True)
+    >>> pelosi = congress.members.get('P000197')
+    >>> pelosi.last_name
+    'Pelosi'
+
+or convert a single result::
+
+    >>> from congress.models import convert
+    >>> house = convert(congress.members.list_chamber('house'))
+    >>> house['members'][0].party
+    'D'
+
+Models still support ``model['field']`` and ``model.get('field')``, so code
+written against dicts keeps working. Fields the model doesn't know about
+are kept, too.
+"""
+import datetime
+
+from .utils import parse_date
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+try:
+    from sys import intern
+except ImportError:
+    pass  # a builtin on Python 2
+
+# Python 2's intern only takes byte strings, but its json returns unicode,
+# so those are interned here instead
+INTERNED = {}
+
+
+def to_date(value):
+    "Parse a date or datetime string once, leaving anything unparseable as is"
+    if not value or not isinstance(value, string_types):
+        return value
+
+    try:
+        parsed = parse_date(value)
+    except (ValueError, OverflowError):
+        return value
+
+    if len(value) == 10 and isinstance(parsed, datetime.datetime):
+        return parsed.date()
+    return parsed
+
+
+def to_interned(value):
+    "Intern a string, so every copy of it is the same object"
+    if isinstance(value, str):
+        return intern(value)
+    if isinstance(value, string_types):
+        return INTERNED.setdefault(value, value)
+    return value
+
+
+class Model(object):
+    """
+    Base class for models. Subclasses list their ``FIELDS`` (which become
+    slots), which of those are ``DATES`` or ``INTERNED``, and the ``KEY``
+    field that identifies a record of this type.
+    """
+    # ``stale`` is only set by ``utils.mark_stale``, for a fallback result
+    __slots__ = ('_extra', 'stale')
+
+    FIELDS = ()
+    DATES = ()
+    INTERNED = ()
+    KEY = None
+
+    def __init__(self, data):
+        extra = None
+        for key, value in data.items():
+            value = convert_field(key, value)
+
+            if key not in self.FIELDS:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+                continue
+
+            if key in self.DATES:
+                value = to_date(value)
+            elif key in self.INTERNED:
+                value = to_interned(value)
+
+            setattr(self, key, value)
+
+        self._extra = extra
+
+    @classmethod
+    def matches(cls, data):
+        "Does this dict look like one of ours?"
+        return isinstance(data, dict) and cls.KEY in data
+
+    def __getattr__(self, name):
+        # only called for fields that weren't set
+        if name in self.FIELDS:
+            return None
+
+        extra = object.__getattribute__(self, '_extra')
+        if extra is not None and name in extra:
+            return extra[name]
+
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def keys(self):
+        keys = [f for f in self.FIELDS if hasattr_slot(self, f)]
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    def to_dict(self):
+        "Return a plain dict of this model's fields, with nested models as dicts too"
+        return dict((key, unconvert(self[key])) for key in self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, Model):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__, self.get(self.KEY))
+
+
+def hasattr_slot(obj, name):
+    try:
+        object.__getattribute__(obj, name)
+    except AttributeError:
+        return False
+    return True
+
+
+class Member(Model):
+    "A member of Congress, from member lists, detail responses and vote rankings"
+
+    FIELDS = (
+        'id', 'member_id', 'title', 'short_title', 'api_uri', 'first_name', 'middle_name',
+        'last_name', 'suffix', 'date_of_birth', 'gender', 'party', 'leadership_role',
+        'twitter_account', 'facebook_account', 'youtube_account', 'govtrack_id', 'cspan_id',
+        'votesmart_id', 'icpsr_id', 'crp_id', 'google_entity_id', 'fec_candidate_id', 'url',
+        'rss_url', 'contact_form', 'in_office', 'dw_nominate', 'ideal_point', 'seniority',
+        'next_election', 'total_votes', 'missed_votes', 'total_present', 'last_updated',
+        'ocd_id', 'office', 'phone', 'fax', 'state', 'district', 'at_large', 'geoid',
+        'missed_votes_pct', 'votes_with_party_pct', 'chamber', 'current_party', 'roles',
+    )
+    __slots__ = FIELDS
+    DATES = ('date_of_birth',)
+    INTERNED = ('party', 'current_party', 'state', 'chamber', 'title', 'short_title',
+                'gender', 'next_election', 'district')
+    KEY = 'id'
+
+    @classmethod
+    def matches(cls, data):
+        return isinstance(data, dict) and ('id' in data or 'member_id' in data) \
+            and 'bill_id' not in data and 'roll_call' not in data
+
+
+class Bill(Model):
+    "A bill, from bill lists and detail responses"
+
+    FIELDS = (
+        'bill_id', 'bill_slug', 'bill_type', 'number', 'bill_uri', 'title', 'short_title',
+        'sponsor_title', 'sponsor', 'sponsor_id', 'sponsor_uri', 'sponsor_party',
+        'sponsor_state', 'gpo_pdf_uri', 'congressdotgov_url', 'govtrack_url',
+        'introduced_date', 'active', 'last_vote', 'house_passage', 'senate_passage',
+        'enacted', 'vetoed', 'cosponsors', 'cosponsors_by_party', 'withdrawn_cosponsors',
+        'committees', 'committee_codes', 'subcommittee_codes', 'primary_subject',
+        'summary', 'summary_short', 'latest_major_action_date', 'latest_major_action',
+        'congress',
+    )
+    __slots__ = FIELDS
+    DATES = ('introduced_date', 'last_vote', 'house_passage', 'senate_passage',
+             'enacted', 'vetoed', 'latest_major_action_date')
+    INTERNED = ('bill_type', 'sponsor_title', 'sponsor_party', 'sponsor_state',
+                'primary_subject', 'congress')
+    KEY = 'bill_id'
+
+
+class Position(Model):
+    "One member's position on a roll-call vote"
+
+    FIELDS = ('member_id', 'name', 'party', 'state', 'district', 'vote_position', 'dw_nominate')
+    __slots__ = FIELDS
+    INTERNED = ('party', 'state', 'district', 'vote_position')
+    KEY = 'vote_position'
+
+
+class Vote(Model):
+    "A roll-call vote, with member ``positions`` in detail responses"
+
+    FIELDS = (
+        'congress', 'session', 'chamber', 'roll_call', 'source', 'url', 'vote_uri', 'bill',
+        'amendment', 'nomination', 'question', 'question_text', 'description', 'vote_type',
+        'date', 'time', 'result', 'document_number', 'document_title', 'tie_breaker',
+        'tie_breaker_vote', 'democratic', 'republican', 'independent', 'total', 'positions',
+        'vacant_seats',
+    )
+    __slots__ = FIELDS
+    DATES = ('date',)
+    INTERNED = ('chamber', 'vote_type', 'result', 'question')
+    KEY = 'roll_call'
+
+
+class Committee(Model):
+    "A committee or subcommittee"
+
+    FIELDS = (
+        'id', 'name', 'chamber', 'url', 'api_uri', 'chair', 'chair_id', 'chair_party',
+        'chair_state', 'chair_uri', 'ranking_member_id', 'congress', 'num_results',
+        'current_members', 'former_members', 'subcommittees',
+    )
+    __slots__ = FIELDS
+    INTERNED = ('chamber', 'chair_party', 'chair_state', 'congress')
+    KEY = 'id'
+
+
+class Nominee(Model):
+    "A presidential nomination"
+
+    FIELDS = (
+        'id', 'nomination_id', 'uri', 'date_received', 'description', 'nominee_state',
+        'committee_uri', 'latest_action_date', 'status', 'congress', 'nominee_description',
+        'committees', 'actions', 'votes',
+    )
+    __slots__ = FIELDS
+    DATES = ('date_received', 'latest_action_date')
+    INTERNED = ('nominee_state', 'status', 'congress')
+    KEY = 'nomination_id'
+
+
+# keys whose values hold records of a known type, in any response
+KEYS = {
+    'members': Member,
+    'current_members': Member,
+    'former_members': Member,
+    'bills': Bill,
+    'vote': Vote,
+    'votes': Vote,
+    'positions': Position,
+    'committees': Committee,
+    'subcommittees': Committee,
+    'nominations': Nominee,
+}
+
+
+def convert_field(key, value):
+    "Convert the value of a response field, using its key to tell what it holds"
+    model = KEYS.get(key)
+
+    if isinstance(value, list):
+        return [model(v) if model is not None and model.matches(v) else convert(v) for v in value]
+
+    if isinstance(value, dict):
+        if model is not None and model.matches(value):
+            return model(value)
+        return convert(value)
+
+    return value
+
+
+def convert(obj, model=None):
+    """
+    Convert a decoded response, or part of one, to models wherever we can
+    tell what a record is. If ``obj`` itself is a record, pass its ``model``.
+    """
+    if isinstance(obj, list):
+        return [convert(v, model) for v in obj]
+
+    if isinstance(obj, dict):
+        if model is not None and model.matches(obj):
+            return model(obj)
+        return dict((k, convert_field(k, v)) for k, v in obj.items())
+
+    return obj
+
+
+def unconvert(obj):
+    "Turn models back into plain dicts"
+    if isinstance(obj, Model):
+        return obj.to_dict()
+    if isinstance(obj, list):
+        return [unconvert(v) for v in obj]
+    if isinstance(obj, dict):
+        return dict((k, unconvert(v)) for k, v in obj.items())
+    return obj
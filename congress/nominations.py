@@ -1,9 +1,12 @@
 from .client import Client
+from .models import Nominee
 from .utils import CURRENT_CONGRESS
 
 
 class NominationsClient(Client):
 
+    model = Nominee
+
     def filter(self, type, congress=CURRENT_CONGRESS):
         path = "{congress}/nominees/{type}.json".format(congress=congress,
                                                         type=type)
@@ -0,0 +1,137 @@
+"""
+Client-side rate limiting and retries
+
+A ``RateLimiter`` is a token bucket that can be shared by every client
+attached to a ``Congress`` instance (and across threads), so the total
+request rate stays under a ceiling. ``Retry`` decides whether, and how long
+to wait before, a throttled or failed request is tried again.
+
+::
+
+    >>> from congress import Congress
+    >>> from congress.ratelimit import RateLimiter, Retry
+    >>> congress = Congress(API_KEY, rate_limiter=RateLimiter(5, burst=10), retry=Retry(5))
+
+"""
+import calendar
+import email.utils
+import random
+import threading
+import time
+
+
+class RateLimiter(object):
+    """
+    Token bucket allowing ``rate`` requests per second on average,
+    with bursts of up to ``burst`` requests.
+
+    Callers reserve a token and are told how long to wait for it, so waiting
+    callers are served in order and throughput holds steady at ``rate``
+    instead of oscillating.
+    """
+
+    def __init__(self, rate, burst=1, clock=time.time):
+        if rate <= 0:
+            raise ValueError('rate must be greater than zero')
+
+        self.rate = float(rate)
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        "Take ``tokens`` from the bucket, returning how many seconds to wait before using them"
+        with self.lock:
+            self.refill()
+            self.tokens -= tokens
+
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self, tokens=1):
+        "Block until ``tokens`` are available"
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        "Hold off every caller for at least ``seconds``, as when the API says to retry later"
+        with self.lock:
+            # bring the bucket up to now first, so time that's already
+            # passed isn't credited against the pause later
+            self.refill()
+            # the next token comes due ``seconds`` from now
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def refill(self):
+        "Add the tokens earned since the last update. Call with the lock held."
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class Retry(object):
+    """
+    Retry policy for throttled (429) and server error (5xx) responses.
+
+    Waits grow exponentially from ``backoff`` seconds, capped at
+    ``max_backoff``, with full jitter so concurrent workers don't retry
+    in lockstep. A ``Retry-After`` header, when present, is honored instead.
+    """
+
+    STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, total=3, backoff=0.5, max_backoff=60, statuses=STATUSES):
+        self.total = total
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+
+    def delay(self, resp, attempt):
+        """
+        Return how long to wait before retrying a request that got ``resp``
+        on its ``attempt``-th try (counting from zero), or None
+        if it shouldn't be retried.
+        """
+        if attempt >= self.total or get_status(resp) not in self.statuses:
+            return None
+
+        wait = retry_after(resp)
+        if wait is not None:
+            return min(wait, self.max_backoff)
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+
+def get_status(resp):
+    "HTTP status of an httplib2 or aiohttp response"
+    status = getattr(resp, 'status', None)
+    if status is None and hasattr(resp, 'get'):
+        status = resp.get('status')
+
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after(resp):
+    "Seconds to wait according to a response's Retry-After header, if it has one"
+    headers = getattr(resp, 'headers', resp)
+    value = headers.get('retry-after') or headers.get('Retry-After')
+    if not value:
+        return None
+
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+
+    date = email.utils.parsedate(value)
+    if date is None:
+        return None
+
+    return max(0, calendar.timegm(date) - time.time())
@@ -0,0 +1,254 @@
+"""
+Quota tracking and prioritized request scheduling
+
+The API allows a fixed number of requests per day for each key. A ``Quota``
+counts requests that actually reach the API (cache hits are free), and a
+``Scheduler`` runs prioritized jobs against it, holding back low-priority
+work when the remaining budget runs low, so interactive requests
+always have something left.
+
+::
+
+    >>> from congress import Congress
+    >>> from congress.scheduler import Quota, Scheduler, HIGH, LOW
+    >>> congress = Congress(API_KEY, quota=Quota(5000))
+    >>> scheduler = Scheduler(congress, reserves={LOW: 1000})
+    >>> backfill = [scheduler.submit(LOW, congress.votes.get, 'senate', n, 1, 115)
+    ...             for n in range(1, 300)]
+    >>> pelosi = scheduler.submit(HIGH, congress.members.get, 'P000197').result()
+
+"""
+import heapq
+import itertools
+import threading
+import time
+
+from concurrent.futures import Future
+
+from .client import only_cached
+from .utils import CongressError, NotCached
+
+# priorities: lower numbers run first
+HIGH = 0
+NORMAL = 5
+LOW = 10
+
+
+class QuotaExceeded(CongressError):
+    """
+    Exception for jobs that couldn't run within the request quota
+    """
+
+
+class Quota(object):
+    """
+    Counts requests against a limit that resets every ``period`` seconds,
+    daily by default. Periods are aligned to the epoch, so a daily quota
+    resets at midnight UTC.
+
+    Pass ``used`` to pick up a count from a previous process.
+    """
+
+    def __init__(self, limit, period=86400, used=0, clock=time.time):
+        self.limit = limit
+        self.period = period
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.window = self._window()
+        self.used = used
+
+    def _window(self):
+        return int(self.clock() // self.period)
+
+    def _roll(self):
+        window = self._window()
+        if window != self.window:
+            self.window = window
+            self.used = 0
+
+    def consume(self, n=1):
+        "Count ``n`` requests against the quota"
+        with self.lock:
+            self._roll()
+            self.used += n
+
+    @property
+    def remaining(self):
+        "Requests left in the current period"
+        with self.lock:
+            self._roll()
+            return max(0, self.limit - self.used)
+
+    def reset_in(self):
+        "Seconds until the quota resets"
+        return (self._window() + 1) * self.period - self.clock()
+
+
+class Job(object):
+    "A scheduled call and the future holding its result"
+
+    def __init__(self, priority, func, args, kwargs):
+        self.priority = priority
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+    def run(self, cache_only=False):
+        try:
+            if cache_only:
+                with only_cached():
+                    result = self.func(*self.args, **self.kwargs)
+            else:
+                result = self.func(*self.args, **self.kwargs)
+        except NotCached as e:
+            # a cache-only miss goes back to the scheduler to defer the job;
+            # otherwise it's just this job's result, e.g. from an offline client
+            if cache_only:
+                raise
+            self.future.set_exception(e)
+        except Exception as e:
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(result)
+
+
+class Scheduler(object):
+    """
+    Runs client calls on a pool of ``workers`` threads, most urgent first.
+
+    ``reserves`` maps a priority to the number of requests that must be left
+    in the quota for jobs of that priority (or anything less urgent) to spend
+    it. When a job would dip into the reserve, it's tried against the cache
+    instead, and if that misses, it's deferred until the quota resets.
+    By default, ``NORMAL`` jobs leave 10% of the quota and ``LOW`` jobs
+    leave 25%, while ``HIGH`` jobs can use all of it.
+
+    Since several workers may be mid-request at once, the quota can be
+    overspent by at most ``workers`` requests.
+    """
+
+    def __init__(self, client, quota=None, workers=4, reserves=None):
+        self.client = client
+        self.quota = quota or client.quota
+        if self.quota is None:
+            raise ValueError('Scheduler needs a Quota, on the client or passed in')
+
+        if reserves is None:
+            reserves = {NORMAL: self.quota.limit // 10, LOW: self.quota.limit // 4}
+        self.reserves = dict(reserves)
+        self.reserves.setdefault(HIGH, 0)
+
+        self.queue = []
+        self.deferred = []
+        self.in_flight = 0
+        self.closed = False
+        self.counter = itertools.count()
+        self.cond = threading.Condition()
+
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._work, name='congress-scheduler-%d' % i)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, priority, func, *args, **kwargs):
+        """
+        Schedule ``func(*args, **kwargs)``, usually a client method,
+        returning a ``concurrent.futures.Future`` for its result.
+        """
+        job = Job(priority, func, args, kwargs)
+        with self.cond:
+            if self.closed:
+                raise RuntimeError('Cannot submit jobs after shutdown')
+            self._push(job)
+            self.cond.notify()
+        return job.future
+
+    def reserve_for(self, priority):
+        "Requests that must remain in the quota for a job at ``priority`` to spend it"
+        levels = [level for level in self.reserves if level <= priority]
+        if not levels:
+            return 0
+        return self.reserves[max(levels)]
+
+    def affordable(self, job):
+        return self.quota.remaining - self.in_flight > self.reserve_for(job.priority)
+
+    def shutdown(self, wait=True):
+        """
+        Stop accepting jobs. Queued jobs still run, but deferred jobs
+        fail with ``QuotaExceeded``.
+        """
+        with self.cond:
+            self.closed = True
+            deferred, self.deferred = self.deferred, []
+            self.cond.notify_all()
+
+        for job in deferred:
+            job.future.set_exception(QuotaExceeded('Request quota exhausted'))
+
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+    def _push(self, job):
+        heapq.heappush(self.queue, (job.priority, next(self.counter), job))
+
+    def _next(self):
+        "Wait for the next job we can afford, or None once shut down"
+        with self.cond:
+            while True:
+                if self.deferred:
+                    waiting, self.deferred = self.deferred, []
+                    for job in waiting:
+                        if self.affordable(job):
+                            self._push(job)
+                        else:
+                            self.deferred.append(job)
+
+                if self.queue:
+                    job = heapq.heappop(self.queue)[2]
+                    affordable = self.affordable(job)
+                    if affordable:
+                        self.in_flight += 1
+                    return job, affordable
+
+                if self.closed:
+                    return None, False
+
+                timeout = self.quota.reset_in() if self.deferred else None
+                self.cond.wait(timeout)
+
+    def _work(self):
+        while True:
+            job, affordable = self._next()
+            if job is None:
+                return
+
+            # a deferred job was already marked running the first time round
+            if not job.future.running() and not job.future.set_running_or_notify_cancel():
+                # cancelled while queued: don't spend a request on it
+                if affordable:
+                    with self.cond:
+                        self.in_flight -= 1
+                continue
+
+            if affordable:
+                try:
+                    job.run()
+                finally:
+                    with self.cond:
+                        self.in_flight -= 1
+                continue
+
+            # over budget: serve it from the cache, or wait for the quota to reset
+            try:
+                job.run(cache_only=True)
+            except NotCached:
+                with self.cond:
+                    if self.closed:
+                        job.future.set_exception(QuotaExceeded('Request quota exhausted'))
+                    else:
+                        self.deferred.append(job)
@@ -0,0 +1,67 @@
+"""
+Request coalescing
+
+When several threads ask for the same thing at once, ``SingleFlight`` lets
+the first one do the work while the rest wait for its result, so a burst of
+identical requests (say, after a deploy empties the cache) costs one API
+call instead of one each.
+"""
+import threading
+
+
+class Call(object):
+    "One in-flight call, and everyone waiting on it"
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls with the same key.
+
+    ``do(key, func)`` returns ``(result, shared)``. ``shared`` is true if the
+    result went to more than one caller, in which case callers shouldn't
+    modify it without copying it first. If ``func`` raises, every caller
+    waiting on it gets the same exception.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, func):
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self.calls[key] = Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # nobody can join once we're out of the table,
+            # so the waiter count is final
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+        return call.result, call.waiters > 0
+
+    def __len__(self):
+        return len(self.calls)
@@ -0,0 +1,242 @@
+"""
+Streaming JSON parsing
+
+A full House member list, or a roll call with every member's position,
+normally decodes into one big tree of dicts and lists, on top of the
+response body it came from. ``ArrayParser`` parses a response as it
+arrives instead, and hands back the elements of one array inside it as
+each is completed, so only the current chunk and the current element need
+be in memory::
+
+    >>> for position in congress.votes.iter_positions('house', 1, 1, 115):
+    ...     print(position['member_id'], position['vote_position'])
+
+Streamed responses skip the result cache and request coalescing.
+Only the ``Urllib3Transport`` and async clients read the body
+incrementally from the network; with other transports, the raw body is
+still read in one piece, but never decoded all at once.
+"""
+import codecs
+import json
+import re
+
+CHUNK_SIZE = 65536
+SPACE = re.compile(r'[ \t\n\r]*')
+DELIMITERS = ',]} \t\n\r'
+
+# what the parser gets when a value isn't all here yet
+MORE = object()
+
+decoder = json.JSONDecoder()
+
+
+# what the parser is looking at: the start of a container on the way to
+# the array, an object's next key or value, a list's next element on the
+# way, or the array's next element
+OPEN, KEY, VALUE, INDEX, ITEMS = range(5)
+
+
+class ArrayParser(object):
+    """
+    Finds the array at ``keys``, a sequence of object keys and list
+    indexes, in a JSON document fed to it in chunks, and parses the
+    array's elements one at a time::
+
+        >>> parser = ArrayParser(('results', 0, 'members'))
+        >>> parser.feed(b'{"status": "OK", "results": [{"members": [{"id": "A0')
+        []
+        >>> parser.feed(b'00001"}, {"id": "B000002"}]}]}')
+        [{'id': 'A000001'}, {'id': 'B000002'}]
+
+    ``feed(data)`` returns the elements that chunk completed, and
+    ``close()`` any left at the end of the document. Top-level values
+    passed over on the way, such as ``status``, are kept in ``header``.
+    ``found`` is true once the array has turned up, and ``done`` once it
+    has been read to the end, or found to be missing.
+    """
+
+    def __init__(self, keys):
+        self.keys = tuple(keys)
+        self.header = {}
+        self.found = False
+        self.done = False
+        self.eof = False
+        self.buffer = ''
+        self.pos = 0
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+
+        self.state = OPEN
+        self.depth = 0
+        self.index = 0
+        self.name = None
+        # unread characters needed before it's worth trying again
+        self.need = 0
+
+    def feed(self, data):
+        if isinstance(data, bytes):
+            data = self.decoder.decode(data)
+        return self.push(data)
+
+    def close(self):
+        "Signal the end of the document, raising ``ValueError`` if it was cut short"
+        self.eof = True
+        items = self.push(self.decoder.decode(b'', final=True))
+        if not self.done:
+            raise ValueError('Incomplete JSON document')
+        return items
+
+    def push(self, text):
+        if self.done:
+            return []
+
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+
+        items = []
+        while not self.done:
+            if len(self.buffer) - self.pos < self.need and not self.eof:
+                break
+            if not self.step(items):
+                break
+            self.need = 0
+        return items
+
+    def peek(self):
+        "The next character that isn't whitespace, or None if there's none yet"
+        self.pos = SPACE.match(self.buffer, self.pos).end()
+        if self.pos < len(self.buffer):
+            return self.buffer[self.pos]
+        if self.eof:
+            raise ValueError('Incomplete JSON document')
+        self.need = 1
+        return None
+
+    def value(self):
+        "Decode the next complete value, or return MORE if it isn't all here yet"
+        try:
+            value, end = decoder.raw_decode(self.buffer, self.pos)
+        except ValueError:
+            if self.eof:
+                raise
+        else:
+            # a number is only finished once something else follows it
+            if (self.eof or self.buffer[self.pos] in '"[{'
+                    or end < len(self.buffer) and self.buffer[end] in DELIMITERS):
+                self.pos = end
+                return value
+
+        # wait for the unread part to double, so a long value isn't
+        # decoded over and over, once per chunk
+        self.need = 2 * (len(self.buffer) - self.pos) + 1
+        return MORE
+
+    def step(self, items):
+        "Take one step through the document, returning False if it needs more input"
+        c = self.peek()
+        if c is None:
+            return False
+
+        if self.state == OPEN:
+            self.pos += 1
+            if self.depth == len(self.keys):
+                expected, self.state = '[', ITEMS
+            elif isinstance(self.keys[self.depth], int):
+                expected, self.state, self.index = '[', INDEX, 0
+            else:
+                expected, self.state = '{', KEY
+
+            if c != expected:
+                # not the container we were looking for
+                self.done = True
+            elif self.state == ITEMS:
+                self.found = True
+            return True
+
+        if self.state == VALUE:
+            value = self.value()
+            if value is MORE:
+                return False
+            if self.depth == 0:
+                self.header[self.name] = value
+            self.state = KEY
+            return True
+
+        if c == ',':
+            self.pos += 1
+            return True
+
+        if c in ']}':
+            # the end of the array, or of a container without what we wanted
+            self.pos += 1
+            self.done = True
+            return True
+
+        if self.state == KEY:
+            start = self.pos
+            name = self.value()
+            if name is MORE:
+                return False
+
+            c = self.peek()
+            if c is None:
+                self.pos = start
+                return False
+            if c != ':':
+                raise ValueError('Expected ":" after %r' % name)
+            self.pos += 1
+
+            if name == self.keys[self.depth]:
+                self.depth += 1
+                self.state = OPEN
+            else:
+                self.name = name
+                self.state = VALUE
+            return True
+
+        if self.state == INDEX:
+            if self.index == self.keys[self.depth]:
+                self.depth += 1
+                self.state = OPEN
+                return True
+            if self.value() is MORE:
+                return False
+            self.index += 1
+            return True
+
+        item = self.value()
+        if item is MORE:
+            return False
+        items.append(item)
+        return True
+
+
+def chunked(content, size=CHUNK_SIZE):
+    "Split a body that's already been read into chunks"
+    for start in range(0, len(content), size):
+        yield content[start:start + size]
+
+
+def dig(content, keys):
+    "Follow ``keys`` into decoded JSON, or return None if they lead nowhere"
+    for key in keys:
+        try:
+            content = content[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return content
+
+
+def items(chunks, keys):
+    """
+    Yield the elements of the array at ``keys`` in a JSON document
+    read from an iterable of chunks, as they're parsed.
+    """
+    parser = ArrayParser(keys)
+    for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield item
+        if parser.done:
+            return
+
+    for item in parser.close():
+        yield item
@@ -0,0 +1,242 @@
+"""
+Incremental sync of votes and bills to a local store
+
+``Sync`` keeps a local mirror current by polling the recent votes and updated
+bills endpoints, and fetching details only for roll calls it hasn't seen and
+bills whose latest major action has changed. A watermark for each chamber
+and Congress is saved with the data, so a run that finds nothing new costs
+a request or two per chamber::
+
+    >>> from congress import Congress
+    >>> from congress.sync import Sync, SQLiteStore
+    >>> sync = Sync(Congress(API_KEY), SQLiteStore('mirror.sqlite'))
+    >>> sync.run()
+    {'votes': {'house': 3, 'senate': 0}, 'bills': {'house': 12, 'senate': 4}}
+
+"""
+import json
+import logging
+import sqlite3
+import threading
+
+from .models import unconvert
+from .utils import CURRENT_CONGRESS, check_chamber
+
+log = logging.getLogger('congress')
+
+# what SQLiteStore.bill_action_date gives for a bill it doesn't have,
+# so a new bill without a date still counts as changed
+NOT_STORED = object()
+
+
+def dumps(data):
+    return json.dumps(unconvert(data), default=str)
+
+
+class SQLiteStore(object):
+    """
+    Keeps synced votes, bills and watermarks in a SQLite database.
+    Each record's full detail response is stored as JSON.
+    """
+
+    def __init__(self, filename='congress.sqlite'):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS votes (
+                    congress INTEGER NOT NULL,
+                    chamber TEXT NOT NULL,
+                    session INTEGER NOT NULL,
+                    roll_call INTEGER NOT NULL,
+                    date TEXT,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (congress, chamber, session, roll_call)
+                );
+                CREATE TABLE IF NOT EXISTS bills (
+                    bill_id TEXT PRIMARY KEY,
+                    congress INTEGER,
+                    latest_major_action_date TEXT,
+                    data TEXT NOT NULL
+                );
+            """)
+
+    def get_watermark(self, name):
+        with self.lock:
+            row = self.db.execute('SELECT value FROM watermarks WHERE name = ?', (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_watermark(self, name, value):
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO watermarks (name, value) VALUES (?, ?)',
+                            (name, json.dumps(value)))
+
+    def save_vote(self, chamber, vote):
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO votes (congress, chamber, session, roll_call, date, data) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (int(vote['congress']), chamber, int(vote['session']), int(vote['roll_call']),
+                 str(vote.get('date')), dumps(vote)))
+
+    def get_vote(self, congress, chamber, session, roll_call):
+        with self.lock:
+            row = self.db.execute(
+                'SELECT data FROM votes WHERE congress = ? AND chamber = ? AND session = ? '
+                'AND roll_call = ?', (congress, chamber, session, roll_call)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def bill_action_date(self, bill_id, default=None):
+        """
+        The latest major action date we have for a bill, None if it had
+        none, or ``default`` if we don't have the bill at all
+        """
+        with self.lock:
+            row = self.db.execute('SELECT latest_major_action_date FROM bills WHERE bill_id = ?',
+                                  (bill_id,)).fetchone()
+        return row[0] if row else default
+
+    def save_bill(self, bill):
+        date = bill.get('latest_major_action_date')
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO bills (bill_id, congress, latest_major_action_date, data) '
+                'VALUES (?, ?, ?, ?)',
+                (bill['bill_id'], bill.get('congress'), str(date) if date is not None else None,
+                 dumps(bill)))
+
+    def get_bill(self, bill_id):
+        with self.lock:
+            row = self.db.execute('SELECT data FROM bills WHERE bill_id = ?', (bill_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        self.db.close()
+
+
+def vote_key(vote):
+    return (int(vote['congress']), int(vote['session']), int(vote['roll_call']))
+
+
+class Sync(object):
+    """
+    Pulls new roll calls and changed bills from ``client``, a ``Congress``
+    instance, into ``store``, fetching details ``max_workers`` at a time.
+    """
+
+    def __init__(self, client, store, max_workers=4):
+        self.client = client
+        self.store = store
+        self.max_workers = max_workers
+
+    def _map(self, func, items):
+        "Call func on each item concurrently, returning results or exceptions in order"
+        from concurrent.futures import ThreadPoolExecutor
+
+        def call(item):
+            try:
+                return func(item)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(call, items))
+
+    def votes(self, chamber, congress=CURRENT_CONGRESS):
+        """
+        Fetch and store roll calls in ``congress`` newer than the watermark
+        for this chamber and Congress, returning how many were stored.
+
+        The watermark only moves past roll calls that were stored, so a
+        failed detail request is retried on the next run.
+        """
+        check_chamber(chamber)
+        congress = int(congress)
+        name = 'votes/%s/%s' % (congress, chamber)
+        watermark = self.store.get_watermark(name)
+        watermark = tuple(watermark) if watermark else None
+
+        # recent votes come newest first, so stop at the watermark,
+        # or at the end of this Congress on a first run
+        new = []
+        for vote in self.client.votes.iter_recent(chamber):
+            key = vote_key(vote)
+            if key[0] < congress or watermark is not None and key <= watermark:
+                break
+            if key[0] == congress:
+                new.append(key)
+
+        if not new:
+            return 0
+
+        new.sort()
+
+        def fetch(key):
+            congress, session, roll_call = key
+            return self.client.votes.get(chamber, roll_call, session, congress)['votes']['vote']
+
+        stored = 0
+        for key, vote in zip(new, self._map(fetch, new)):
+            if isinstance(vote, Exception):
+                log.warning('Could not fetch %s vote %s: %s', chamber, key, vote)
+                break
+            self.store.save_vote(chamber, vote)
+            self.store.set_watermark(name, key)
+            stored += 1
+
+        return stored
+
+    def bills(self, chamber, congress=CURRENT_CONGRESS):
+        """
+        Fetch and store bills whose latest major action changed since
+        the last run, returning how many were stored.
+        """
+        check_chamber(chamber)
+        name = 'bills/%s/%s' % (congress, chamber)
+        watermark = self.store.get_watermark(name)
+
+        # updated bills come most recently acted on first
+        changed, latest = [], watermark
+        for bill in self.client.bills.iter_recent(chamber, congress, 'updated'):
+            date = bill.get('latest_major_action_date')
+            if date is not None:
+                # a bill without a date can't move the watermark, or stop us
+                date = str(date)
+                if watermark is not None and date < watermark:
+                    break
+                latest = max(latest, date) if latest else date
+
+            if self.store.bill_action_date(bill['bill_id'], default=NOT_STORED) != date:
+                changed.append(bill)
+
+        def fetch(bill):
+            slug = bill.get('bill_slug') or bill['bill_id'].split('-')[0]
+            return self.client.bills.get(slug, congress)
+
+        failed = False
+        stored = 0
+        for bill, detail in zip(changed, self._map(fetch, changed)):
+            if isinstance(detail, Exception):
+                log.warning('Could not fetch bill %s: %s', bill['bill_id'], detail)
+                failed = True
+                continue
+            self.store.save_bill(detail)
+            stored += 1
+
+        # on failure, keep the old watermark so missed bills are retried
+        if latest and not failed:
+            self.store.set_watermark(name, latest)
+
+        return stored
+
+    def run(self, chambers=('house', 'senate'), congress=CURRENT_CONGRESS):
+        "Sync votes and bills for each chamber, returning counts stored"
+        return {
+            'votes': dict((chamber, self.votes(chamber, congress)) for chamber in chambers),
+            'bills': dict((chamber, self.bills(chamber, congress)) for chamber in chambers),
+        }
@@ -0,0 +1,412 @@
+"""
+Record, replay and serve API responses, without the live API
+
+Record a cassette of real responses once, with an API key, from a sample
+call to every subclient endpoint::
+
+    python -m congress.testing record cassette.json
+
+then replay it in-process, with no sockets at all::
+
+    >>> from congress import Congress
+    >>> from congress.testing import Cassette, ReplayTransport
+    >>> congress = Congress(transport=ReplayTransport(Cassette.load('cassette.json')))
+
+or serve it over HTTP from a local stand-in for the API, slowed down and
+made unreliable on purpose, for load tests::
+
+    >>> from congress.testing import StandInServer
+    >>> with StandInServer(cassette, latency=0.05, error_rate=0.01, throttle_rate=0.05) as server:
+    ...     congress = Congress(API_KEY, base_uri=server.base_uri)
+
+The same server runs from the command line::
+
+    python -m congress.testing serve cassette.json --port 8000 --latency 0.05
+
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+
+from .client import Client
+from .transport import Response
+
+log = logging.getLogger('congress')
+
+NOT_FOUND = b'{"status": "ERROR", "errors": [{"error": "Record not found"}]}'
+
+# (subclient, method, args, kwargs): one call for each endpoint, used by record
+SAMPLE_CALLS = (
+    ('members', 'list_chamber', ('house', 115), {}),
+    ('members', 'list_chamber', ('senate', 115), {}),
+    ('members', 'get', ('P000197',), {}),
+    ('members', 'filter', ('house', 115), {'state': 'RI'}),
+    ('members', 'filter', ('house', 115), {'state': 'RI', 'district': 1}),
+    ('members', 'bills', ('P000197',), {}),
+    ('members', 'iter_bills', ('P000197',), {}),
+    ('members', 'new', (), {}),
+    ('members', 'departing', ('house', 115), {}),
+    ('members', 'compare', ('P000197', 'S000033', 'house', 'votes', 115), {}),
+    ('members', 'party', (), {}),
+    ('bills', 'by_member', ('P000197',), {}),
+    ('bills', 'get', ('hr21', 115), {}),
+    ('bills', 'amendments', ('hr21', 115), {}),
+    ('bills', 'related', ('hr21', 115), {}),
+    ('bills', 'subjects', ('hr21', 115), {}),
+    ('bills', 'cosponsors', ('hr21', 115), {}),
+    ('bills', 'introduced', ('house', 115), {}),
+    ('bills', 'updated', ('house', 115), {}),
+    ('bills', 'passed', ('house', 115), {}),
+    ('bills', 'major', ('house', 115), {}),
+    ('bills', 'iter_recent', ('house', 115), {}),
+    ('bills', 'upcoming', ('house',), {}),
+    ('votes', 'by_month', ('house', 2017, 1), {}),
+    ('votes', 'by_date', ('house', '2017-01-03'), {}),
+    ('votes', 'recent', ('house',), {}),
+    ('votes', 'iter_recent', ('house',), {}),
+    ('votes', 'get', ('house', 1, 1, 115), {}),
+    ('votes', 'get', ('senate', 1, 1, 115), {}),
+    ('votes', 'missed', ('house', 115), {}),
+    ('votes', 'party', ('house', 115), {}),
+    ('votes', 'loneno', ('house', 115), {}),
+    ('votes', 'perfect', ('house', 115), {}),
+    ('votes', 'nominations', (115,), {}),
+    ('committees', 'filter', ('house', 115), {}),
+    ('committees', 'get', ('house', 'HSAG', 115), {}),
+    ('nominations', 'filter', ('received', 115), {}),
+    ('nominations', 'get', ('PN4', 115), {}),
+    ('nominations', 'by_state', ('RI', 115), {}),
+)
+
+
+class Cassette(object):
+    """
+    Recorded responses, keyed on their path and query string relative to
+    ``base_uri``. Bodies are kept byte for byte.
+    """
+
+    def __init__(self, responses=None, base_uri=Client.BASE_URI):
+        self.responses = responses if responses is not None else {}
+        self.base_uri = base_uri
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, filename):
+        with io.open(filename, encoding='utf-8') as f:
+            data = json.load(f)
+
+        responses = dict((path, (r['status'], r['body'].encode('utf-8')))
+                         for path, r in data['responses'].items())
+        return cls(responses, data.get('base_uri', Client.BASE_URI))
+
+    def save(self, filename):
+        with self.lock:
+            responses = dict((path, {'status': status, 'body': body.decode('utf-8')})
+                             for path, (status, body) in self.responses.items())
+
+        data = {'base_uri': self.base_uri, 'responses': responses}
+        with io.open(filename, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, indent=1, sort_keys=True))
+
+    def path(self, url):
+        "The key for a URL: its path and query relative to ``base_uri``"
+        if url.startswith(self.base_uri):
+            return url[len(self.base_uri):]
+        return url
+
+    def add(self, path, status, body):
+        with self.lock:
+            self.responses[path] = (status, body)
+
+    def get(self, path):
+        """
+        Return ``(status, body)`` for a path and query string, or None.
+        There's no falling back to the bare path, or a page that wasn't
+        recorded would replay the first page, and paging would never end.
+        """
+        return self.responses.get(path)
+
+    def __len__(self):
+        return len(self.responses)
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+
+class RecordingTransport(object):
+    "Wraps another transport, saving every successful response to ``cassette``"
+
+    def __init__(self, transport, cassette):
+        self.transport = transport
+        self.cassette = cassette
+
+    @property
+    def http(self):
+        return getattr(self.transport, 'http', None)
+
+    def request(self, url, headers):
+        resp, content = self.transport.request(url, headers)
+        if resp.status == 200:
+            self.cassette.add(self.cassette.path(url), resp.status, content)
+        return resp, content
+
+
+class ReplayTransport(object):
+    """
+    Serves responses from a ``Cassette``, in-process. Paths that weren't
+    recorded get the API's "Record not found" error.
+    """
+
+    def __init__(self, cassette):
+        self.cassette = cassette
+        self.requests = []
+
+    def request(self, url, headers):
+        if 'only-if-cached' in headers.get('cache-control', ''):
+            return Response(504), b''
+
+        self.requests.append(url)
+        response = self.cassette.get(self.cassette.path(url))
+        if response is None:
+            return Response(404), NOT_FOUND
+
+        status, body = response
+        return Response(status, {'content-type': 'application/json'}), body
+
+
+def record(apikey=None, cassette=None, calls=SAMPLE_CALLS, max_items=60, **kwargs):
+    """
+    Make each sample call with a real ``Congress`` client, bypassing any
+    cache, and return a ``Cassette`` of everything it got back. Iterators
+    are followed for up to ``max_items`` items. Failed calls are logged
+    and skipped.
+    """
+    from . import Congress
+    from .transport import Httplib2Transport
+
+    import httplib2
+
+    cassette = cassette if cassette is not None else Cassette()
+    transport = RecordingTransport(Httplib2Transport(httplib2.Http(None)), cassette)
+    congress = Congress(apikey, transport=transport, **kwargs)
+
+    for name, method, args, kw in calls:
+        try:
+            result = getattr(getattr(congress, name), method)(*args, **kw)
+            if hasattr(result, '__next__') or hasattr(result, 'next'):
+                for _ in itertools.islice(result, max_items):
+                    pass
+        except Exception as e:
+            log.warning('Could not record %s.%s%r: %s', name, method, args, e)
+
+    return cassette
+
+
+class StandInServer(object):
+    """
+    A local HTTP server that answers like the API, from a ``Cassette``.
+
+    Every response waits ``latency`` seconds, plus up to ``jitter`` more.
+    A fraction ``throttle_rate`` of requests get a 429 with a
+    ``Retry-After`` of ``retry_after`` seconds, and a fraction
+    ``error_rate`` get one of ``error_statuses``. Pass a ``seed`` to make
+    the faults repeatable.
+
+    Responses carry an ETag, answer ``If-None-Match`` with a 304, are
+    fresh for ``max_age`` seconds, and are gzipped if the client asks.
+    ``stats`` counts requests and each kind of fault.
+    """
+
+    PREFIX = '/congress/v1/'
+
+    def __init__(self, cassette, host='127.0.0.1', port=0, latency=0, jitter=0,
+                 error_rate=0, throttle_rate=0, retry_after=1, error_statuses=(500, 502, 503),
+                 max_age=0, seed=None):
+        self.cassette = cassette
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.error_statuses = tuple(error_statuses)
+        self.max_age = max_age
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = dict.fromkeys(('requests', 'ok', 'not_modified', 'not_found',
+                                    'throttled', 'errors'), 0)
+        self.server = None
+        self.thread = None
+
+    @property
+    def base_uri(self):
+        return 'http://%s:%d%s' % (self.host, self.port, self.PREFIX)
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def fault(self):
+        "Pick a fault for the next request: a status code, or None"
+        with self.lock:
+            roll = self.random.random()
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+            if roll < self.throttle_rate:
+                return delay, 429
+            if roll < self.throttle_rate + self.error_rate:
+                return delay, self.random.choice(self.error_statuses)
+            return delay, None
+
+    def respond(self, path, headers):
+        "Return ``(status, headers, body)`` for a request path and its headers"
+        self.count('requests')
+        delay, status = self.fault()
+        if delay:
+            time.sleep(delay)
+
+        if status == 429:
+            self.count('throttled')
+            return 429, {'Retry-After': str(self.retry_after)}, b'{"status": "ERROR"}'
+
+        if status is not None:
+            self.count('errors')
+            return status, {}, b'Server Error'
+
+        if not path.startswith(self.PREFIX):
+            self.count('not_found')
+            return 404, {}, NOT_FOUND
+
+        response = self.cassette.get(path[len(self.PREFIX):])
+        if response is None:
+            self.count('not_found')
+            return 404, {}, NOT_FOUND
+
+        status, body = response
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        out = {'ETag': etag, 'Cache-Control': 'max-age=%d' % self.max_age,
+               'Content-Type': 'application/json; charset=utf-8'}
+
+        if headers.get('If-None-Match') == etag:
+            self.count('not_modified')
+            return 304, out, b''
+
+        if 'gzip' in headers.get('Accept-Encoding', ''):
+            out['Content-Encoding'] = 'gzip'
+            body = compress(body)
+
+        self.count('ok')
+        return status, out, body
+
+    def start(self):
+        "Start serving on a background thread. With ``port=0``, a free port is picked."
+        try:
+            from http.server import BaseHTTPRequestHandler, HTTPServer
+            from socketserver import ThreadingMixIn
+        except ImportError:
+            from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+            from SocketServer import ThreadingMixIn
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                status, headers, body = stand_in.respond(self.path, self.headers)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self.server = Server((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05},
+                                       name='congress-stand-in')
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def compress(body):
+    out = io.BytesIO()
+    with gzip.GzipFile(fileobj=out, mode='wb') as f:
+        f.write(body)
+    return out.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Record or serve Congress API responses')
+    commands = parser.add_subparsers(dest='command')
+
+    rec = commands.add_parser('record', help='record sample responses from the live API')
+    rec.add_argument('cassette')
+    rec.add_argument('--apikey', help='defaults to PROPUBLICA_API_KEY')
+
+    serve = commands.add_parser('serve', help='serve a cassette from a local stand-in server')
+    serve.add_argument('cassette')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8000)
+    serve.add_argument('--latency', type=float, default=0)
+    serve.add_argument('--jitter', type=float, default=0)
+    serve.add_argument('--error-rate', type=float, default=0)
+    serve.add_argument('--throttle-rate', type=float, default=0)
+    serve.add_argument('--retry-after', type=float, default=1)
+    serve.add_argument('--max-age', type=int, default=0)
+    serve.add_argument('--seed', type=int)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'record':
+        cassette = record(args.apikey)
+        cassette.save(args.cassette)
+        log.info('Recorded %d responses to %s', len(cassette), args.cassette)
+
+    elif args.command == 'serve':
+        server = StandInServer(
+            Cassette.load(args.cassette), args.host, args.port, latency=args.latency,
+            jitter=args.jitter, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+            retry_after=args.retry_after, max_age=args.max_age, seed=args.seed)
+        server.start()
+        log.info('Serving %s at %s', args.cassette, server.base_uri)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.stop()
+
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
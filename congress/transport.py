@@ -0,0 +1,213 @@
+"""
+Pluggable HTTP transports
+
+A transport makes the actual HTTP request for a client. Anything with a
+``request(url, headers)`` method returning ``(response, content)`` works,
+as long as the response has a ``status``, a dict-like ``get`` for headers
+and a ``fromcache`` flag.
+
+``Httplib2Transport`` is the default and behaves as the client always has,
+with httplib2's HTTP cache. ``Urllib3Transport`` keeps a pool of
+keep-alive connections per host, for high request rates::
+
+    >>> from congress import Congress
+    >>> from congress.transport import Urllib3Transport
+    >>> congress = Congress(API_KEY, transport=Urllib3Transport(pool_size=20))
+
+``FakeTransport`` serves canned responses from memory, for tests.
+
+A transport may also have a ``stream(url, headers)`` method, returning the
+body as an iterable of chunks read as they're needed, for
+``Client.stream``. Without one, the whole body is read first.
+"""
+import copy
+import json
+import threading
+
+
+class Response(dict):
+    """
+    A minimal response, in the shape of ``httplib2.Response``: a dict of
+    lower-cased headers, with ``status`` and ``fromcache`` attributes.
+    """
+    fromcache = False
+    reason = ''
+
+    def __init__(self, status, headers=None, reason=''):
+        super(Response, self).__init__()
+        for key, value in (headers or {}).items():
+            self[key.lower()] = value
+        self.status = int(status)
+        self.reason = reason
+        self['status'] = str(self.status)
+
+
+def only_if_cached(headers):
+    return 'only-if-cached' in headers.get('cache-control', '')
+
+
+class Httplib2Transport(object):
+    """
+    Requests with ``httplib2``, caching responses in ``cache``
+    (or ``http.cache``, if you pass an ``httplib2.Http``).
+
+    ``httplib2.Http`` isn't thread-safe, so threads other than the one that
+    created the transport each get their own copy of ``http``, sharing the
+    same cache.
+    """
+
+    def __init__(self, http=None, cache='.cache'):
+        self.cache = cache
+        self._http = http
+        self._thread = threading.current_thread()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def http(self):
+        "The ``httplib2.Http``, created (and httplib2 imported) on first use"
+        if self._http is None:
+            with self._lock:
+                if self._http is None:
+                    import httplib2
+                    self._http = httplib2.Http(self.cache)
+        return self._http
+
+    def get_http(self):
+        "Return an ``httplib2.Http`` that's safe to use from the current thread"
+        if threading.current_thread() is self._thread:
+            return self.http
+
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            # same settings and cache, but no shared sockets
+            http = copy.copy(self.http)
+            http.connections = {}
+            self._local.http = http
+
+        return http
+
+    def request(self, url, headers):
+        return self.get_http().request(url, headers=headers)
+
+
+class Urllib3Transport(object):
+    """
+    Requests with a pooled ``urllib3.PoolManager``, which is thread-safe
+    and reuses up to ``pool_size`` keep-alive connections per host.
+
+    With ``gzip=True``, responses are requested compressed. ``timeout`` is
+    in seconds. There's no HTTP cache here: cache-only requests always
+    miss, so pair this with a ``congress.cache.ResultCache``.
+
+    Requires urllib3, which is not installed by default.
+    """
+
+    def __init__(self, pool_size=10, keep_alive=True, gzip=True, timeout=30, num_pools=4,
+                 block=False, **kwargs):
+        import urllib3
+
+        headers = {}
+        if gzip:
+            headers['Accept-Encoding'] = 'gzip'
+        if not keep_alive:
+            headers['Connection'] = 'close'
+
+        self.headers = headers
+        self.pool = urllib3.PoolManager(
+            num_pools=num_pools, maxsize=pool_size, block=block,
+            timeout=urllib3.Timeout(total=timeout), retries=False, **kwargs)
+
+    def request(self, url, headers):
+        if only_if_cached(headers):
+            return Response(504), b''
+
+        headers = dict(self.headers, **headers)
+        resp = self.pool.request('GET', url, headers=headers, preload_content=True)
+        return Response(resp.status, resp.headers, resp.reason), resp.data
+
+    def stream(self, url, headers, chunk_size=65536):
+        """
+        Like ``request``, but the body is a ``StreamedBody``, read from the
+        connection a chunk at a time as it's iterated over.
+        """
+        if only_if_cached(headers):
+            return Response(504), StreamedBody(None, chunk_size)
+
+        headers = dict(self.headers, **headers)
+        resp = self.pool.request('GET', url, headers=headers, preload_content=False)
+        return Response(resp.status, resp.headers, resp.reason), StreamedBody(resp, chunk_size)
+
+    def close(self):
+        self.pool.clear()
+
+
+class StreamedBody(object):
+    """
+    The body of a streamed ``urllib3`` response, as an iterator of
+    chunks. ``close()`` releases the connection; if the body wasn't read
+    to the end, the connection is closed rather than reused.
+    """
+
+    def __init__(self, resp, chunk_size):
+        self.resp = resp
+        self.chunks = iter(()) if resp is None else resp.stream(chunk_size, decode_content=True)
+        self.finished = resp is None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            self.finished = True
+            raise
+
+    next = __next__
+
+    def close(self):
+        if self.resp is None:
+            return
+        if not self.finished:
+            self.resp.close()
+        self.resp.release_conn()
+
+
+class FakeTransport(object):
+    """
+    Serves responses from memory, keyed by URL. A value can be decoded
+    JSON, a ``bytes`` body, or a ``(status, body)`` pair. URLs without a
+    response get a 404. Every URL requested is appended to ``requests``.
+
+    URLs in ``cached`` come back as if from the HTTP cache, and are the
+    only ones that answer cache-only requests.
+    """
+
+    def __init__(self, responses=None, cached=()):
+        self.responses = responses if responses is not None else {}
+        self.cached = set(cached)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def request(self, url, headers):
+        fromcache = url in self.cached
+        if only_if_cached(headers) and not fromcache:
+            return Response(504), b''
+
+        if not fromcache:
+            with self.lock:
+                self.requests.append(url)
+
+        status, body = 200, self.responses.get(url)
+        if body is None:
+            status, body = 404, {'status': '404', 'errors': [{'error': 'Record not found'}]}
+        elif isinstance(body, tuple):
+            status, body = body
+
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+
+        resp = Response(status, {'content-type': 'application/json'})
+        resp.fromcache = fromcache
+        return resp, body
@@ -2,8 +2,14 @@
 Utility functions and error classes used throughout client classes
 """
 import datetime
+import json
 import math
-import six
+import sys
+
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:
+    from collections import Mapping, Sequence
 
 
 class CongressError(Exception):
@@ -23,6 +29,12 @@ class NotFound(CongressError):
     """
 
 
+class NotCached(CongressError):
+    """
+    Exception for cache-only requests that miss the cache
+    """
+
+
 def check_chamber(chamber):
     "Validate that chamber is house or senate"
     if str(chamber).lower() not in ('house', 'senate'):
@@ -37,24 +49,131 @@ def get_congress(year):
     return int(math.floor((year - 1789) / 2 + 1))
 
 
+def get_date_parser():
+    "Return dateutil.parser.parse if available, or a strptime fallback"
+    try:
+        from dateutil.parser import parse
+    except ImportError:
+        parse = lambda d: datetime.datetime.strptime(d, "%Y-%m-%d")
+    return parse
+
+
+# resolved on first use, see parse_date
+date_parser = None
+
+
 def parse_date(s):
     """
     Parse a date using dateutil.parser.parse if available,
     falling back to datetime.datetime.strptime if not
     """
+    global date_parser
     if isinstance(s, (datetime.datetime, datetime.date)):
         return s
+    if date_parser is None:
+        date_parser = get_date_parser()
+    return date_parser(s)
+
+
+def copy_json(obj):
+    """
+    Copy decoded JSON: nested dicts and lists are copied, everything else
+    (strings, numbers, None) is immutable and shared. Much faster than
+    ``copy.deepcopy`` for API responses.
+    """
+    if isinstance(obj, dict):
+        return dict((k, copy_json(v)) for k, v in obj.items())
+
+    if isinstance(obj, list):
+        return [copy_json(v) for v in obj]
+
+    return obj
+
+
+class StaleDict(dict):
+    "A dict result served from the cache after the API failed"
+    stale = True
+
+
+class StaleList(list):
+    "A list result served from the cache after the API failed"
+    stale = True
+
+
+def mark_stale(result):
+    """
+    Flag a result as stale, so callers can tell with ``is_stale``.
+    Dicts and lists, and read-only views of them, become ``StaleDict`` and
+    ``StaleList``; other results, such as models, are flagged if they'll
+    take a ``stale`` attribute.
+    """
+    if isinstance(result, (dict, Mapping)):
+        return StaleDict(result)
+    if isinstance(result, list) or isinstance(result, Sequence) and not isinstance(result, str):
+        return StaleList(result)
+
     try:
-        from dateutil.parser import parse
-    except ImportError:
-        parse = lambda d: datetime.datetime.strptime(d, "%Y-%m-%d")
-    return parse(s)
+        result.stale = True
+    except (AttributeError, TypeError):
+        pass
+    return result
+
+
+def is_stale(result):
+    "Was this result served from the cache because the API failed?"
+    return getattr(result, 'stale', False) is True
+
+
+def get_json_backend(name=None):
+    """
+    Return a ``(name, loads)`` pair for the fastest JSON library installed,
+    trying orjson, then ujson, then falling back to the standard library.
+    Pass a name to ask for one in particular.
+    """
+    names = [name] if name else ['orjson', 'ujson', 'json']
+    for name in names:
+        if name == 'json':
+            return name, json.loads
+        try:
+            module = __import__(name)
+        except ImportError:
+            continue
+        return name, module.loads
+
+    raise ImportError('JSON backend %s is not installed' % name)
+
+
+# (name, loads) for the JSON library we decode with, chosen on first use
+json_backend = None
+
+
+def loads(content, normalize_newlines=False):
+    """
+    Decode a JSON response body, straight from bytes where possible.
+
+    Unlike ``u``, this doesn't copy the body to normalize line endings
+    unless asked, since whitespace between JSON tokens doesn't change
+    what it decodes to.
+    """
+    global json_backend
+    if json_backend is None:
+        json_backend = get_json_backend()
+
+    name, json_loads = json_backend
+    if normalize_newlines:
+        content = u(content)
+    elif name == 'json' and (3, 0) <= sys.version_info < (3, 6) \
+            and isinstance(content, bytes):
+        # the stdlib decoder only takes bytes from Python 3.6
+        content = content.decode('utf-8')
+
+    return json_loads(content)
 
 
 def u(text, encoding='utf-8'):
     "Return unicode text, no matter what"
 
-    if isinstance(text, six.binary_type):
+    if isinstance(text, bytes):
         text = text.decode(encoding)
 
     # it's already unicode
@@ -62,4 +181,5 @@ def u(text, encoding='utf-8'):
     return text
 
 
+# cheap enough to compute at import, and used as a default argument throughout
 CURRENT_CONGRESS = get_congress(datetime.datetime.now().year)
@@ -1,11 +1,62 @@
 import datetime
+import itertools
 
 from .client import Client
+from .models import Vote
 from .utils import CURRENT_CONGRESS, check_chamber, parse_date
 
 
+def month_windows(start, end):
+    """
+    Split a date range into consecutive (start, end) windows that
+    each fall within one calendar month, the most ``by_range`` accepts.
+    """
+    start, end = parse_date(start), parse_date(end)
+    if isinstance(start, datetime.datetime):
+        start = start.date()
+    if isinstance(end, datetime.datetime):
+        end = end.date()
+    if start > end:
+        start, end = end, start
+
+    while start <= end:
+        if start.month == 12:
+            next_month = datetime.date(start.year + 1, 1, 1)
+        else:
+            next_month = datetime.date(start.year, start.month + 1, 1)
+
+        window_end = min(end, next_month - datetime.timedelta(days=1))
+        yield start, window_end
+        start = next_month
+
+
+def vote_key(vote):
+    "A roll call's identity: (congress, session, roll_call)"
+    return (vote.get('congress'), vote.get('session'), vote.get('roll_call'))
+
+
+def unique_votes(votes, previous):
+    """
+    Sort one window's votes oldest first, dropping any already seen in
+    ``previous``, the keys from the window before. Returns the votes and
+    this window's keys.
+    """
+    votes = sorted(votes, key=lambda v: (v.get('date') or '', v.get('time') or '',
+                                         int(v.get('roll_call') or 0)))
+    unique, keys = [], set()
+    for vote in votes:
+        key = vote_key(vote)
+        if key not in previous and key not in keys:
+            keys.add(key)
+            unique.append(vote)
+
+    return unique, keys
+
+
 class VotesClient(Client):
 
+    model = Vote
+
     # date-based queries
     def by_month(self, chamber, year=None, month=None):
         """
@@ -24,7 +75,7 @@ class VotesClient(Client):
     def by_range(self, chamber, start, end):
         """
         Return votes cast in a chamber between two dates,
-        up to one month apart.
+        up to one month apart. For longer ranges, use ``iter_range``.
         """
         check_chamber(chamber)
 
@@ -36,6 +87,40 @@ class VotesClient(Client):
             chamber=chamber, start=start, end=end)
         return self.fetch(path, parse=lambda r: r['results'])
 
+    def iter_range(self, chamber, start, end, max_workers=4):
+        """
+        Lazily yield votes cast in a chamber between any two dates,
+        oldest first.
+
+        The range is split into month-sized windows, which are fetched
+        concurrently, up to ``max_workers`` at a time. Roll calls that
+        show up in two adjacent windows are only yielded once.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        check_chamber(chamber)
+        windows = month_windows(start, end)
+
+        def fetch(window):
+            return self.by_range(chamber, *window)['votes']
+
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            # keep at most max_workers windows in flight, yielding in order
+            pending = [pool.submit(fetch, w) for w in itertools.islice(windows, max_workers)]
+            previous = set()
+            while pending:
+                votes = pending.pop(0).result()
+                for window in windows:
+                    pending.append(pool.submit(fetch, window))
+                    break
+
+                votes, previous = unique_votes(votes, previous)
+                for vote in votes:
+                    yield vote
+        finally:
+            pool.shutdown(wait=False)
+
     def by_date(self, chamber, date):
         "Return votes cast in a chamber on a single day"
         date = parse_date(date)
@@ -45,7 +130,13 @@ class VotesClient(Client):
         "Return recent roll call votes for a given chamber. Also helpful if trying to find current session."
         check_chamber(chamber)
         path = "{chamber}/votes/recent.json".format(chamber=chamber)
-        return self.fetch(path, parse=lambda r: r['results']) 
+        return self.fetch(path, parse=lambda r: r['results'])
+
+    def iter_recent(self, chamber, prefetch=False):
+        "Lazily yield recent roll call votes, newest first, across every page"
+        check_chamber(chamber)
+        path = "{chamber}/votes/recent.json".format(chamber=chamber)
+        return self.paginate(path, 'votes', parse=lambda r: r['results'], prefetch=prefetch)
 
     def today(self, chamber):
         "Return today's votes in a given chamber"
@@ -53,17 +144,41 @@ class VotesClient(Client):
         return self.by_range(chamber, now, now)
 
     # detail response
+    ROLLCALL_PATH = "{congress}/{chamber}/sessions/{session}/votes/{rollcall_num}.json"
+
     def get(self, chamber, rollcall_num, session, congress=CURRENT_CONGRESS):
         ("Return a specific roll-call vote, "
          "including a complete list of member positions")
         check_chamber(chamber)
 
-        path = ("{congress}/{chamber}/sessions/{session}"
-                "/votes/{rollcall_num}.json")
-        path = path.format(congress=congress, chamber=chamber,
-                           session=session, rollcall_num=rollcall_num)
+        path = self.ROLLCALL_PATH.format(congress=congress, chamber=chamber,
+                                         session=session, rollcall_num=rollcall_num)
         return self.fetch(path, parse=lambda r: r['results'])
 
+    def iter_positions(self, chamber, rollcall_num, session, congress=CURRENT_CONGRESS):
+        """
+        Like ``get``, but yields each member's position as the response is
+        parsed, without decoding the whole roll call at once
+        """
+        check_chamber(chamber)
+
+        path = self.ROLLCALL_PATH.format(congress=congress, chamber=chamber,
+                                         session=session, rollcall_num=rollcall_num)
+        return self.stream(path, ('results', 'votes', 'vote', 'positions'))
+
+    def get_many(self, chamber, rollcall_nums, session, congress=CURRENT_CONGRESS, max_workers=8):
+        """
+        Fetch many roll-call votes concurrently, in the order given.
+        Votes that fail have their exception in place of a result,
+        as with ``Client.fetch_many``.
+        """
+        check_chamber(chamber)
+
+        paths = [self.ROLLCALL_PATH.format(congress=congress, chamber=chamber,
+                                           session=session, rollcall_num=num)
+                 for num in rollcall_nums]
+        return self.fetch_many(paths, parse=lambda r: r['results'], max_workers=max_workers)
+
     # votes by type
     def by_type(self, chamber, type, congress=CURRENT_CONGRESS):
         "Return votes by type: missed, party, lone no, perfect"
@@ -73,6 +188,14 @@ class VotesClient(Client):
             congress=congress, chamber=chamber, type=type)
         return self.fetch(path)
 
+    def iter_by_type(self, chamber, type, congress=CURRENT_CONGRESS, prefetch=False):
+        "Like ``by_type``, but lazily yields every member, across every page"
+        check_chamber(chamber)
+
+        path = "{congress}/{chamber}/votes/{type}.json".format(
+            congress=congress, chamber=chamber, type=type)
+        return self.paginate(path, 'members', prefetch=prefetch)
+
     def missed(self, chamber, congress=CURRENT_CONGRESS):
         "Missed votes by member"
         return self.by_type(chamber, 'missed', congress)
@@ -10,14 +10,14 @@ VERSION = "0.3.5"
 
 setup(
     name = "python-congress",
-    packages=find_packages(exclude=['docs']),
+    packages=find_packages(exclude=['docs', 'benchmarks']),
     version = VERSION,
     description = "A Python client for the ProPublica Congress API",
     long_description = README,
     author = "Chris Amico",
     author_email = "eyeseast@gmail.com",
     url = 'https://github.com/eyeseast/propublica-congress',
-    install_requires = ['httplib2', 'six'],
+    install_requires = ['httplib2', 'futures; python_version < "3"'],
     classifiers = [
         "Intended Audience :: Developers",
         "License :: OSI Approved :: MIT License",
@@ -4,16 +4,30 @@ import datetime
 import json
 import logging
 import os
+import socket
+import sys
 import time
 import urllib
 import unittest
 
 import httplib2
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import urllib3
+except ImportError:
+    urllib3 = None
+
 from congress import Congress
-from congress.utils import CongressError, NotFound, get_congress, u
+from congress.utils import CongressError, NotFound, NotCached, get_congress, u
+
+from test_helpers import (API_KEY, FakeHttp, PaginationFixtures, SingleFlightFixtures,
+                          SlowHttp, StreamFixtures, VoteRangeFixtures)
 
-API_KEY = os.environ['PROPUBLICA_API_KEY']
 LOG_LEVEL = getattr(logging, os.environ.get('CONGRESS_LOG_LEVEL', 'INFO').upper(), logging.INFO)
 
 logging.basicConfig(level=LOG_LEVEL)
@@ -24,6 +38,7 @@ def close_connections(http):
         conn.close()
 
 
+@unittest.skipUnless('PROPUBLICA_API_KEY' in os.environ, 'live API tests need PROPUBLICA_API_KEY')
 class APITest(unittest.TestCase):
     
     def check_response(self, result, url, parse=lambda r: r['results'][0]):
@@ -243,6 +258,1344 @@ class UtilTest(unittest.TestCase):
         self.assertEqual(get_congress(2009), 111)
         self.assertEqual(get_congress(2010), 111)
 
+    def test_loads(self):
+        from congress.utils import loads, get_json_backend
+        body = b'{\r\n  "status": "OK",\r\n  "name": "Nancy Pelosi\\r\\n"\r\n}'
+        expected = json.loads(u(body))
+
+        self.assertEqual(loads(body), expected)
+        self.assertEqual(loads(body, normalize_newlines=True), expected)
+
+        name, stdlib = get_json_backend('json')
+        self.assertIs(stdlib, json.loads)
+
+class FetchManyTest(unittest.TestCase):
+
+    def setUp(self):
+        base = "https://api.propublica.org/congress/v1/"
+        self.paths = ["115/senate/sessions/1/votes/%d.json" % n for n in range(1, 21)]
+        self.http = FakeHttp(dict(
+            (base + path, {'status': 'OK', 'results': {'roll_call': n}})
+            for n, path in enumerate(self.paths, 1)))
+        self.congress = Congress(API_KEY, http=self.http)
+
+    def test_order_preserved(self):
+        votes = self.congress.fetch_many(self.paths, parse=lambda r: r['results'], max_workers=4)
+        self.assertEqual([v['roll_call'] for v in votes], list(range(1, 21)))
+
+    def test_errors_in_place(self):
+        results = self.congress.votes.fetch_many(['members/notamember.json'] + self.paths[:1])
+        self.assertIsInstance(results[0], NotFound)
+
+        with self.assertRaises(NotFound):
+            self.congress.fetch_many(['members/notamember.json'], return_exceptions=False)
+
+    def test_votes_get_many(self):
+        votes = self.congress.votes.get_many('senate', [3, 1, 2], 1, 115)
+        self.assertEqual([v['roll_call'] for v in votes], [3, 1, 2])
+
+    def test_thread_http(self):
+        import threading
+        https = []
+        thread = threading.Thread(target=lambda: https.append(self.congress.get_http()))
+        thread.start()
+        thread.join()
+
+        self.assertIs(self.congress.get_http(), self.congress.http)
+        self.assertIsNot(https[0], self.congress.http)
+        self.assertIs(https[0].cache, self.congress.http.cache)
+
+
+class PaginationTest(PaginationFixtures, unittest.TestCase):
+
+    def test_iter_recent(self):
+        bills = list(self.congress.bills.iter_recent('house', 115))
+        self.assertEqual(len(bills), 45)
+        self.assertEqual(bills[-1]['bill_id'], 'hr45-115')
+        self.assertEqual(len(self.http.requests), 3)
+
+    def test_iter_is_lazy(self):
+        bills = self.congress.bills.iter_recent('house', 115)
+        self.assertEqual(next(bills)['bill_id'], 'hr1-115')
+        self.assertEqual(len(self.http.requests), 1)
+
+    def test_prefetch(self):
+        bills = list(self.congress.bills.iter_recent('house', 115, prefetch=True))
+        self.assertEqual([b['bill_id'] for b in bills], ['hr%d-115' % n for n in range(1, 46)])
+
+
+class VoteRangeTest(VoteRangeFixtures, unittest.TestCase):
+
+    def test_month_windows(self):
+        from congress.votes import month_windows
+        windows = list(month_windows('2016-12-20', '2017-02-03'))
+        self.assertEqual(windows, [
+            (datetime.date(2016, 12, 20), datetime.date(2016, 12, 31)),
+            (datetime.date(2017, 1, 1), datetime.date(2017, 1, 31)),
+            (datetime.date(2017, 2, 1), datetime.date(2017, 2, 3)),
+        ])
+
+    def test_iter_range(self):
+        votes = self.congress.votes.iter_range('house', datetime.date(2017, 3, 5),
+                                               datetime.date(2017, 1, 15), max_workers=2)
+        self.assertEqual([v['roll_call'] for v in votes], [1, 2, 3, 4])
+
+
+class FlakyHttp(FakeHttp):
+    "A FakeHttp that's throttled for the first few requests"
+
+    def __init__(self, responses, failures=2, retry_after='0'):
+        super(FlakyHttp, self).__init__(responses)
+        self.failures = failures
+        self.retry_after = retry_after
+
+    def request(self, url, headers=None):
+        if self.failures:
+            self.failures -= 1
+            self.requests.append(url)
+            return httplib2.Response({'status': 429, 'retry-after': self.retry_after}), b'Too Many Requests'
+        return super(FlakyHttp, self).request(url, headers)
+
+
+class RateLimitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.url = "https://api.propublica.org/congress/v1/members/P000197.json"
+        self.responses = {self.url: {'status': 'OK', 'results': [{'id': 'P000197'}]}}
+
+    def test_token_bucket(self):
+        from congress.ratelimit import RateLimiter
+        now = [0.0]
+        limiter = RateLimiter(2, burst=2, clock=lambda: now[0])
+
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertAlmostEqual(limiter.reserve(), 0.5)
+        self.assertAlmostEqual(limiter.reserve(), 1.0)
+
+        now[0] = 10.0
+        self.assertEqual(limiter.reserve(), 0)
+
+    def test_pause(self):
+        from congress.ratelimit import RateLimiter
+        now = [0.0]
+        limiter = RateLimiter(1, clock=lambda: now[0])
+
+        self.assertEqual(limiter.reserve(), 0)
+        now[0] = 5.0
+        limiter.pause(10)
+        # the time before the pause doesn't count towards it
+        self.assertAlmostEqual(limiter.reserve(), 10.0)
+
+    def test_retry_after(self):
+        from congress.ratelimit import Retry
+        retry = Retry(total=3, backoff=1)
+        resp = httplib2.Response({'status': 429, 'retry-after': '7'})
+        self.assertEqual(retry.delay(resp, 0), 7)
+        self.assertIsNone(retry.delay(resp, 3))
+        self.assertIsNone(retry.delay(httplib2.Response({'status': 404}), 0))
+
+        backoff = retry.delay(httplib2.Response({'status': 503}), 2)
+        self.assertTrue(0 <= backoff <= 4)
+
+    def test_retries_throttled_requests(self):
+        from congress.ratelimit import RateLimiter, Retry
+        http = FlakyHttp(self.responses, failures=2)
+        congress = Congress(API_KEY, http=http, rate_limiter=RateLimiter(1000, burst=10), retry=Retry(3))
+
+        self.assertIs(congress.members.rate_limiter, congress.rate_limiter)
+        self.assertEqual(congress.members.get('P000197')['id'], 'P000197')
+        self.assertEqual(len(http.requests), 3)
+
+    def test_gives_up(self):
+        from congress.ratelimit import Retry
+        congress = Congress(API_KEY, http=FlakyHttp(self.responses, failures=5), retry=Retry(1))
+        with self.assertRaises(CongressError):
+            congress.members.get('P000197')
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        base = "https://api.propublica.org/congress/v1/"
+        self.responses = dict(
+            (base + "members/M%03d.json" % n, {'status': 'OK', 'results': [{'id': 'M%03d' % n}]})
+            for n in range(10))
+
+    def test_quota_counts_network_requests(self):
+        from congress.scheduler import Quota
+        base = "https://api.propublica.org/congress/v1/"
+        congress = Congress(API_KEY, http=FakeHttp(self.responses, cached=[base + "members/M000.json"]),
+                            quota=Quota(100))
+
+        congress.members.get('M000')
+        congress.members.get('M001')
+        self.assertEqual(congress.quota.used, 1)
+        self.assertEqual(congress.quota.remaining, 99)
+
+    def test_quota_resets(self):
+        from congress.scheduler import Quota
+        now = [0.0]
+        quota = Quota(10, period=60, clock=lambda: now[0])
+        quota.consume(10)
+        self.assertEqual(quota.remaining, 0)
+
+        now[0] = 61.0
+        self.assertEqual(quota.remaining, 10)
+
+    def test_only_cached(self):
+        from congress.client import only_cached
+        base = "https://api.propublica.org/congress/v1/"
+        congress = Congress(API_KEY, http=FakeHttp(self.responses, cached=[base + "members/M000.json"]))
+
+        with only_cached():
+            self.assertEqual(congress.members.get('M000')['id'], 'M000')
+            with self.assertRaises(NotCached):
+                congress.members.get('M001')
+
+    def test_low_priority_deferred(self):
+        from congress.scheduler import Quota, Scheduler, QuotaExceeded, HIGH, LOW
+        base = "https://api.propublica.org/congress/v1/"
+        http = FakeHttp(self.responses, cached=[base + "members/M009.json"])
+        congress = Congress(API_KEY, http=http, quota=Quota(5))
+        scheduler = Scheduler(congress, workers=1, reserves={LOW: 3})
+
+        high = scheduler.submit(HIGH, congress.members.get, 'M008')
+        self.assertEqual(high.result(timeout=5)['id'], 'M008')
+
+        low = [scheduler.submit(LOW, congress.members.get, 'M%03d' % n) for n in range(4)]
+        cached = scheduler.submit(LOW, congress.members.get, 'M009')
+
+        self.assertEqual(cached.result(timeout=5)['id'], 'M009')
+        self.assertEqual(low[0].result(timeout=5)['id'], 'M000')
+
+        scheduler.shutdown()
+        self.assertEqual(congress.quota.used, 2)
+        with self.assertRaises(QuotaExceeded):
+            low[-1].result(timeout=5)
+
+
+    def test_offline_client(self):
+        from congress.scheduler import Quota, Scheduler, HIGH
+        base = "https://api.propublica.org/congress/v1/"
+        http = FakeHttp(self.responses, cached=[base + "members/M000.json"])
+        congress = Congress(API_KEY, http=http, quota=Quota(100), offline=True)
+        scheduler = Scheduler(congress, workers=1)
+
+        missing = scheduler.submit(HIGH, congress.members.get, 'M001')
+        with self.assertRaises(NotCached):
+            missing.result(timeout=5)
+
+        # the worker survived
+        cached = scheduler.submit(HIGH, congress.members.get, 'M000')
+        self.assertEqual(cached.result(timeout=5)['id'], 'M000')
+        scheduler.shutdown()
+
+    def test_cancelled_job(self):
+        import threading
+        from congress.scheduler import Quota, Scheduler, HIGH
+        base = "https://api.propublica.org/congress/v1/"
+        congress = Congress(API_KEY, http=FakeHttp(self.responses), quota=Quota(100))
+        scheduler = Scheduler(congress, workers=1)
+
+        release = threading.Event()
+        blocker = scheduler.submit(HIGH, release.wait, 5)
+        cancelled = scheduler.submit(HIGH, congress.members.get, 'M001')
+        self.assertTrue(cancelled.cancel())
+        later = scheduler.submit(HIGH, congress.members.get, 'M002')
+        release.set()
+
+        self.assertTrue(blocker.result(timeout=5))
+        self.assertEqual(later.result(timeout=5)['id'], 'M002')
+        self.assertEqual(congress.http.requests, [base + "members/M002.json"])
+        scheduler.shutdown()
+
+
+class SQLiteCacheTest(unittest.TestCase):
+
+    base = "https://api.propublica.org/congress/v1/"
+
+    def setUp(self):
+        import tempfile
+        from congress.cache import SQLiteCache
+        self.tmp = tempfile.mkdtemp()
+        self.now = [1500000000.0]
+        self.cache = SQLiteCache(os.path.join(self.tmp, 'cache.sqlite'), max_entries=3, ttl=[
+            ('members/*.json', 86400),
+            ('*/votes/recent.json', 0),
+        ], clock=lambda: self.now[0])
+
+    def tearDown(self):
+        import shutil
+        self.cache.close()
+        shutil.rmtree(self.tmp)
+
+    def response(self, body=b'{}'):
+        return b'status: 200\r\ncache-control: no-cache\r\ncontent-type: application/json\r\n\r\n' + body
+
+    def test_get_set_delete(self):
+        url = self.base + "115/bills/hr21.json"
+        self.assertTrue(self.cache) # even when empty, or httplib2 won't use it
+        self.assertIsNone(self.cache.get(url))
+
+        self.cache.set(url, self.response())
+        self.assertEqual(self.cache.get(url), self.response())
+        self.assertEqual(len(self.cache), 1)
+
+        self.cache.delete(url)
+        self.assertIsNone(self.cache.get(url))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_ttl_rules(self):
+        import email
+        url = self.base + "members/P000197.json"
+        self.cache.set(url, self.response(b'{"status": "OK"}'))
+
+        head, body = self.cache.get(url).split(b'\r\n\r\n', 1)
+        headers = email.message_from_bytes(head)
+        self.assertEqual(headers['cache-control'], 'max-age=86400')
+        self.assertEqual(body, b'{"status": "OK"}')
+
+        self.cache.set(self.base + "house/votes/recent.json", self.response())
+        self.assertNotIn(self.base + "house/votes/recent.json", self.cache)
+
+    def test_lru_eviction(self):
+        urls = [self.base + "115/bills/hr%d.json" % n for n in range(4)]
+        for url in urls[:3]:
+            self.now[0] += 1
+            self.cache.set(url, self.response())
+
+        self.now[0] += 1
+        self.cache.get(urls[0])
+
+        self.now[0] += 1
+        self.cache.set(urls[3], self.response())
+
+        self.assertIn(urls[0], self.cache)
+        self.assertNotIn(urls[1], self.cache)
+        self.assertEqual(len(self.cache), 3)
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        from congress.cache import ResultCache
+        base = "https://api.propublica.org/congress/v1/"
+        self.http = FakeHttp({
+            base + "115/house/members.json": {'status': 'OK', 'results': [
+                {'chamber': 'House', 'members': [{'id': 'P000197', 'party': 'D'}]}]},
+        })
+        self.now = [0.0]
+        self.results = ResultCache(ttl=60, clock=lambda: self.now[0])
+        self.congress = Congress(API_KEY, http=self.http, result_cache=self.results)
+
+    def test_skips_request(self):
+        first = self.congress.members.list_chamber('house', 115)
+        second = self.congress.members.list_chamber('house', 115)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.http.requests), 1)
+        self.assertEqual(self.results.hits, 1)
+
+    def test_copy_on_return(self):
+        self.results.copy = True
+        first = self.congress.members.list_chamber('house', 115)
+        first['members'].pop()
+
+        second = self.congress.members.list_chamber('house', 115)
+        self.assertEqual(len(second['members']), 1)
+
+    def test_read_only(self):
+        self.congress.members.list_chamber('house', 115)
+        house = self.congress.members.list_chamber('house', 115)
+
+        self.assertEqual(house['members'][0]['party'], 'D')
+        with self.assertRaises(TypeError):
+            house['members'][0]['party'] = 'R'
+
+    def test_ttl(self):
+        self.congress.members.list_chamber('house', 115)
+        self.now[0] = 61
+        self.congress.members.list_chamber('house', 115)
+        self.assertEqual(len(self.http.requests), 2)
+
+    def test_stale_while_revalidate(self):
+        url = self.congress.BASE_URI + "115/house/members.json"
+        self.results.stale = [('*/members.json', 3600)]
+        self.congress.members.list_chamber('house', 115)
+        self.http.responses[url]['results'][0]['members'][0]['party'] = 'R'
+
+        # expired, but within the stale window: served now, refreshed in the background
+        self.now[0] = 61
+        house = self.congress.members.list_chamber('house', 115)
+        self.assertEqual(house['members'][0]['party'], 'D')
+        self.assertEqual(self.results.stale_hits, 1)
+
+        while self.results.refreshing or len(self.http.requests) < 2:
+            time.sleep(0.001)
+
+        house = self.congress.members.list_chamber('house', 115)
+        self.assertEqual(house['members'][0]['party'], 'R')
+        self.assertEqual(len(self.http.requests), 2)
+
+        # past the stale window, it's a plain miss
+        self.now[0] = 61 + 61 + 3600
+        self.assertEqual(self.results.lookup(url), (None, False))
+
+    def test_refresh(self):
+        self.congress.members.list_chamber('house', 115)
+        self.congress.fetch('115/house/members.json', refresh=True)
+        self.assertEqual(len(self.http.requests), 2)
+
+        from congress.client import refreshing
+        with refreshing():
+            self.congress.members.list_chamber('house', 115)
+        self.assertEqual(len(self.http.requests), 3)
+
+    def test_max_bytes(self):
+        from congress.cache import ResultCache
+        results = ResultCache(max_bytes=10)
+        results.set('a', {}, 6)
+        results.set('b', {}, 6)
+        self.assertNotIn('a', results)
+        self.assertIn('b', results)
+
+
+class ModelTest(unittest.TestCase):
+
+    def setUp(self):
+        base = "https://api.propublica.org/congress/v1/"
+        self.http = FakeHttp({
+            base + "members/P000197.json": {'status': 'OK', 'results': [
+                {'id': 'P000197', 'last_name': 'Pelosi', 'date_of_birth': '1940-03-26',
+                 'current_party': 'D', 'most_recent_vote': '2018-01-01'}]},
+            base + "115/senate/sessions/2/votes/17.json": {'status': 'OK', 'results': {'votes': {'vote': {
+                'congress': 115, 'session': 2, 'chamber': 'Senate', 'roll_call': 17, 'date': '2018-01-22',
+                'positions': [
+                    {'member_id': 'A000360', 'party': 'R', 'state': 'TN', 'vote_position': 'Yes'},
+                    {'member_id': 'B001230', 'party': 'D', 'state': 'WI', 'vote_position': 'Yes'},
+                ]}}}},
+        })
+
+    def test_client_models(self):
+        from congress.models import Member, Vote, Position
+        congress = Congress(API_KEY, http=self.http, models=True)
+
+        pelosi = congress.members.get('P000197')
+        self.assertIsInstance(pelosi, Member)
+        self.assertEqual(pelosi.last_name, 'Pelosi')
+        self.assertEqual(pelosi['date_of_birth'], datetime.date(1940, 3, 26))
+        self.assertEqual(pelosi.most_recent_vote, '2018-01-01')
+        self.assertIsNone(pelosi.district)
+
+        vote = congress.votes.get('senate', 17, 2, 115)['votes']['vote']
+        self.assertIsInstance(vote, Vote)
+        self.assertIsInstance(vote.positions[0], Position)
+        self.assertIs(vote.positions[0].vote_position, vote.positions[1].vote_position)
+
+    def test_read_only_result_cache(self):
+        from congress.cache import ResultCache
+        from congress.models import Member
+        congress = Congress(API_KEY, http=self.http, models=True,
+                            result_cache=ResultCache(copy=False))
+
+        self.assertIsInstance(congress.members.get('P000197'), Member)
+        cached = congress.members.get('P000197')
+        self.assertIsInstance(cached, Member)
+        self.assertEqual(cached.last_name, 'Pelosi')
+        self.assertEqual(len(self.http.requests), 1)
+
+    def test_convert(self):
+        from congress.models import convert, unconvert
+        congress = Congress(API_KEY, http=self.http)
+        pelosi = congress.members.get('P000197')
+
+        self.assertEqual(unconvert(convert(pelosi, congress.members.model))['last_name'], 'Pelosi')
+        self.assertIsInstance(congress.members.get('P000197'), dict)
+
+
+def rollcall(n, positions, date='2017-01-03', session=1):
+    "A VotesClient.get result, with positions as {member_id: (party, position)}"
+    return {'votes': {'vote': {
+        'congress': 115, 'session': session, 'chamber': 'House', 'roll_call': n, 'date': date,
+        'positions': [{'member_id': m, 'party': party, 'vote_position': position}
+                      for m, (party, position) in sorted(positions.items())],
+    }}}
+
+
+@unittest.skipUnless(numpy, 'analysis needs numpy')
+class VoteMatrixTest(unittest.TestCase):
+
+    def test_add(self):
+        from congress import analysis
+        matrix = analysis.VoteMatrix(members=2, rollcalls=1)
+        matrix.add(rollcall(1, {'A': ('D', 'Yes'), 'B': ('R', 'No')}))
+        matrix.add(rollcall(2, {'A': ('D', 'Not Voting'), 'B': ('R', 'Yes'), 'C': ('R', 'Present')},
+                            date='2017-02-01'))
+
+        self.assertEqual(matrix.matrix.shape, (3, 2))
+        self.assertEqual(list(matrix.member_ids), ['A', 'B', 'C'])
+        self.assertEqual(matrix.matrix.tolist(), [
+            [analysis.YES, analysis.NOT_VOTING],
+            [analysis.NO, analysis.YES],
+            [analysis.ABSENT, analysis.PRESENT],
+        ])
+        self.assertEqual(matrix.rollcall_ids.tolist(), [[115, 1, 1], [115, 1, 2]])
+        self.assertEqual(list(matrix.mask(start='2017-01-15')), [False, True])
+
+    def test_replace_rollcall(self):
+        from congress import analysis
+        matrix = analysis.VoteMatrix()
+        matrix.add(rollcall(1, {'A': ('D', 'Yes')}))
+        matrix.add(rollcall(1, {'A': ('D', 'No')}))
+
+        self.assertEqual(matrix.matrix.tolist(), [[analysis.NO]])
+
+    def test_grows(self):
+        from congress import analysis
+        matrix = analysis.VoteMatrix(members=1, rollcalls=1)
+        for n in range(1, 51):
+            matrix.add(rollcall(n, dict(('M%d' % m, ('D', 'Yes')) for m in range(n))))
+
+        self.assertEqual(matrix.matrix.shape, (50, 50))
+        self.assertEqual(int((matrix.matrix == analysis.YES).sum()), sum(range(51)))
+
+
+@unittest.skipUnless(numpy, 'analysis needs numpy')
+class AgreementTest(unittest.TestCase):
+
+    def setUp(self):
+        from congress.analysis import VoteMatrix
+        self.matrix = VoteMatrix()
+        self.matrix.add(rollcall(1, {'A': ('D', 'Yes'), 'B': ('D', 'Yes'), 'C': ('R', 'No')}))
+        self.matrix.add(rollcall(2, {'A': ('D', 'No'), 'B': ('D', 'Yes'), 'C': ('R', 'Yes')}))
+        self.matrix.add(rollcall(3, {'A': ('D', 'Yes'), 'B': ('D', 'Not Voting'), 'C': ('R', 'No')},
+                                 date='2017-03-01'))
+
+    def test_compare(self):
+        from congress.analysis import agreement
+        result = agreement(self.matrix).compare('A', 'B', 'house', 115)
+
+        self.assertEqual(result['common_votes'], 2)
+        self.assertEqual(result['disagree_votes'], 1)
+        self.assertEqual(result['agree_percent'], 50.0)
+        self.assertEqual(result['chamber'], 'House')
+
+    def test_matches_pairwise_loop(self):
+        from congress.analysis import agreement, YES, NO
+        pairs = agreement(self.matrix)
+        votes = self.matrix.matrix
+
+        for i in range(3):
+            for j in range(3):
+                both = [(a, b) for a, b in zip(votes[i], votes[j]) if a in (YES, NO) and b in (YES, NO)]
+                self.assertEqual(pairs.common[i, j], len(both))
+                self.assertEqual(pairs.disagree[i, j], len([1 for a, b in both if a != b]))
+
+    def test_mask(self):
+        from congress.analysis import agreement
+        mask = self.matrix.mask(end='2017-02-01')
+        self.assertEqual(agreement(self.matrix, mask).compare('A', 'C')['common_votes'], 2)
+
+
+@unittest.skipUnless(numpy, 'analysis needs numpy')
+class VoteStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        from congress.analysis import VoteMatrix, VoteStats
+        self.matrix = VoteMatrix()
+        self.stats = VoteStats(self.matrix)
+        self.matrix.add(rollcall(1, {'A': ('D', 'Yes'), 'B': ('D', 'Yes'), 'C': ('R', 'No'), 'D': ('R', 'Yes')}))
+        self.matrix.add(rollcall(2, {'A': ('D', 'Not Voting'), 'B': ('D', 'No'), 'C': ('R', 'Yes'), 'D': ('R', 'Yes')},
+                                 date='2017-02-01'))
+
+    def test_missed(self):
+        missed = self.stats.missed()
+        self.assertEqual(missed[0]['id'], 'A')
+        self.assertEqual(missed[0]['missed_votes'], 1)
+        self.assertEqual(missed[0]['missed_votes_pct'], 50.0)
+
+        self.assertEqual(self.stats.missed(end='2017-01-31')[0]['missed_votes'], 0)
+
+    def test_perfect(self):
+        self.assertEqual([m['id'] for m in self.stats.perfect()], ['B', 'C', 'D'])
+
+    def test_loneno(self):
+        loneno = self.stats.loneno()
+        self.assertEqual([(m['id'], m['lone_no_votes']) for m in loneno], [('B', 1), ('C', 1)])
+
+    def test_party_updates_incrementally(self):
+        party = dict((m['id'], m['votes_with_party_pct']) for m in self.stats.party())
+        # rollcall 1: R split 1-1, so no party line for C or D
+        self.assertEqual(party, {'A': 100.0, 'B': 100.0, 'C': 100.0, 'D': 100.0})
+
+        self.matrix.add(rollcall(3, {'A': ('D', 'Yes'), 'B': ('D', 'No'), 'C': ('R', 'No'), 'D': ('R', 'No')}))
+        party = dict((m['id'], m['votes_with_party_pct']) for m in self.stats.party())
+        self.assertEqual(party['C'], 100.0)
+        self.assertEqual(party['B'], 100.0)
+
+
+class SyncTest(unittest.TestCase):
+
+    base = "https://api.propublica.org/congress/v1/"
+
+    def setUp(self):
+        import tempfile
+        from congress.sync import Sync, SQLiteStore
+        self.tmp = tempfile.mkdtemp()
+        self.store = SQLiteStore(os.path.join(self.tmp, 'mirror.sqlite'))
+        self.http = FakeHttp({})
+        self.set_votes(2)
+        self.set_bills([('hr1', '2017-03-01'), ('hr2', '2017-02-01')])
+        self.sync = Sync(Congress(API_KEY, http=self.http), self.store)
+
+    def tearDown(self):
+        import shutil
+        self.store.close()
+        shutil.rmtree(self.tmp)
+
+    def set_votes(self, latest, earlier=()):
+        votes = [{'congress': 115, 'session': 1, 'roll_call': n} for n in range(latest, 0, -1)]
+        votes.extend(earlier)
+        self.http.responses[self.base + "house/votes/recent.json?offset=0"] = {
+            'status': 'OK', 'results': {'num_results': len(votes), 'votes': votes}}
+        for vote in votes:
+            self.http.responses[self.base + "115/house/sessions/1/votes/%d.json" % vote['roll_call']] = {
+                'status': 'OK', 'results': {'votes': {'vote': dict(vote, date='2017-01-01')}}}
+
+    def set_bills(self, bills):
+        self.http.responses[self.base + "115/house/bills/updated.json?offset=0"] = {
+            'status': 'OK', 'results': [{'num_results': len(bills), 'bills': [
+                {'bill_id': slug + '-115', 'bill_slug': slug, 'latest_major_action_date': date}
+                for slug, date in bills]}]}
+        for slug, date in bills:
+            self.http.responses[self.base + "115/bills/%s.json" % slug] = {'status': 'OK', 'results': [
+                {'bill_id': slug + '-115', 'congress': '115', 'latest_major_action_date': date}]}
+
+    def test_votes(self):
+        self.assertEqual(self.sync.votes('house', 115), 2)
+        self.assertEqual(self.store.get_watermark('votes/115/house'), [115, 1, 2])
+        self.assertEqual(self.store.get_vote(115, 'house', 1, 2)['roll_call'], 2)
+
+        del self.http.requests[:]
+        self.assertEqual(self.sync.votes('house', 115), 0)
+        self.assertEqual(len(self.http.requests), 1)
+
+        self.set_votes(3)
+        self.assertEqual(self.sync.votes('house', 115), 1)
+
+    def test_votes_stop_at_congress(self):
+        # a first run stops at the previous Congress instead of paging back through it
+        self.set_votes(2, earlier=[{'congress': 114, 'session': 2, 'roll_call': 700}])
+        self.assertEqual(self.sync.run(['house'], congress=115)['votes'], {'house': 2})
+        self.assertIsNone(self.store.get_vote(114, 'house', 2, 700))
+        self.assertNotIn(self.base + "114/house/sessions/2/votes/700.json", self.http.requests)
+
+        # a newer Congress has its own watermark
+        self.assertEqual(self.sync.votes('house', 116), 0)
+        self.assertIsNone(self.store.get_watermark('votes/116/house'))
+
+    def test_bills(self):
+        self.assertEqual(self.sync.bills('house', 115), 2)
+        self.assertEqual(self.store.get_watermark('bills/115/house'), '2017-03-01')
+
+        del self.http.requests[:]
+        self.assertEqual(self.sync.bills('house', 115), 0)
+        self.assertEqual(len(self.http.requests), 1)
+
+        self.set_bills([('hr2', '2017-03-02'), ('hr1', '2017-03-01')])
+        self.assertEqual(self.sync.bills('house', 115), 1)
+        self.assertEqual(self.store.bill_action_date('hr2-115'), '2017-03-02')
+
+    def test_bills_without_dates(self):
+        self.set_bills([('hr3', None), ('hr2', '2017-03-02')])
+        self.assertEqual(self.sync.bills('house', 115), 2)
+        self.assertEqual(self.store.get_watermark('bills/115/house'), '2017-03-02')
+
+        # the undated bill isn't fetched again, and doesn't stall the watermark
+        self.set_bills([('hr4', '2017-03-03'), ('hr3', None), ('hr2', '2017-03-02')])
+        self.assertEqual(self.sync.bills('house', 115), 1)
+        self.assertEqual(self.store.get_watermark('bills/115/house'), '2017-03-03')
+
+
+class MemberIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        from congress.index import MemberIndex
+        base = "https://api.propublica.org/congress/v1/"
+        self.http = FakeHttp({
+            base + "115/house/members.json": {'status': 'OK', 'results': [{'members': [
+                {'id': 'C001084', 'party': 'D', 'state': 'RI', 'district': '1', 'govtrack_id': '412400', 'in_office': True},
+                {'id': 'L000559', 'party': 'D', 'state': 'RI', 'district': '2', 'in_office': True},
+                {'id': 'X000001', 'party': 'R', 'state': 'RI', 'district': '2', 'in_office': False},
+            ]}]},
+            base + "115/senate/members.json": {'status': 'OK', 'results': [{'members': [
+                {'id': 'R000122', 'party': 'D', 'state': 'RI', 'in_office': True},
+                {'id': 'W000802', 'party': 'D', 'state': 'RI', 'in_office': True},
+            ]}]},
+        })
+        self.index = MemberIndex(Congress(API_KEY, http=self.http), congress=115)
+
+    def test_lookups(self):
+        self.assertEqual(self.index.get('R000122')['chamber'], 'senate')
+        self.assertIsNone(self.index.get('notamember'))
+        self.assertEqual(self.index.by_id('govtrack_id', 412400)['id'], 'C001084')
+
+        self.assertEqual([m['id'] for m in self.index.filter('senate', state='ri')], ['R000122', 'W000802'])
+        self.assertEqual([m['id'] for m in self.index.filter('house', state='RI', district='02')], ['L000559'])
+        self.assertEqual(len(self.index.filter('house', state='RI', district=2, current=False)), 2)
+        self.assertEqual(self.index.filter('house', party='R'), [])
+
+        self.assertEqual(len(self.http.requests), 2)
+
+    def test_refresh(self):
+        self.assertEqual(len(self.index), 5)
+        self.index.refresh()
+        self.assertEqual(len(self.http.requests), 4)
+
+
+class SingleFlightTest(SingleFlightFixtures, unittest.TestCase):
+
+    def test_coalesce(self):
+        import threading
+        from congress.singleflight import SingleFlight
+
+        congress = Congress(API_KEY, http=self.http, singleflight=SingleFlight())
+        results = []
+
+        def get():
+            results.append(congress.members.get('P000197'))
+
+        threads = [threading.Thread(target=get) for i in range(5)]
+        for thread in threads:
+            thread.start()
+
+        # wait for everyone to join the leader's call
+        calls = congress.singleflight.calls
+        url = congress.BASE_URI + 'members/P000197.json'
+        while url not in calls or calls[url].waiters < 4:
+            time.sleep(0.001)
+
+        self.http.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.http.requests), 1)
+        self.assertEqual([r['id'] for r in results], ['P000197'] * 5)
+
+        # everyone gets their own copy
+        results[0]['roles'].append('changed')
+        self.assertEqual(results[1]['roles'], [])
+        self.assertEqual(len(set(id(r) for r in results)), 5)
+        self.assertEqual(len(congress.singleflight), 0)
+
+    def test_errors_shared(self):
+        from congress.singleflight import SingleFlight
+
+        self.http.release.set()
+        congress = Congress(API_KEY, http=self.http, singleflight=SingleFlight())
+        with self.assertRaises(NotFound):
+            congress.members.get('notamember')
+        self.assertEqual(len(congress.singleflight), 0)
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        from congress.metrics import Metrics
+        base = "https://api.propublica.org/congress/v1/"
+        self.http = FakeHttp({
+            base + "115/senate/members.json": {'status': 'OK', 'results': [{'members': []}]},
+            base + "116/house/members.json": {'status': 'OK', 'results': [{'members': []}]},
+        }, cached=[base + "116/house/members.json"])
+        self.metrics = Metrics()
+        self.congress = Congress(API_KEY, http=self.http, hooks=[self.metrics])
+
+    def test_endpoint_template(self):
+        from congress.metrics import endpoint_template
+        self.assertEqual(endpoint_template('115/senate/sessions/1/votes/17.json'),
+                         '{congress}/{chamber}/sessions/{session}/votes/{roll_call}.json')
+        self.assertEqual(endpoint_template('members/P000197/bills/introduced.json?offset=20'),
+                         'members/{member_id}/bills/introduced.json')
+        self.assertEqual(endpoint_template('members/house/RI/1/current.json'),
+                         'members/{chamber}/{state}/{district}/current.json')
+        self.assertEqual(endpoint_template('115/bills/hr21/cosponsors.json'),
+                         '{congress}/bills/{bill_id}/cosponsors.json')
+        self.assertEqual(endpoint_template('senate/votes/2017-01-01/2017-01-31.json'),
+                         '{chamber}/votes/{date}/{date}.json')
+
+    def test_snapshot(self):
+        self.congress.members.list_chamber('senate', 115)
+        self.congress.members.list_chamber('house', 116)
+        with self.assertRaises(NotFound):
+            self.congress.members.get('notamember')
+
+        snapshot = self.metrics.snapshot()
+        stats = snapshot['{congress}/{chamber}/members.json']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['cache'], {'miss': 1, 'hit': 1})
+        self.assertEqual(stats['statuses'], {200: 2})
+        self.assertEqual(stats['network']['count'], 2)
+        self.assertEqual(stats['bytes']['count'], 1)
+        self.assertEqual(stats['bytes']['buckets'][-1], (float('inf'), 1))
+        self.assertEqual(snapshot['members/notamember.json']['errors'], {'NotFound': 1})
+
+        text = self.metrics.prometheus()
+        self.assertIn('congress_requests_total{endpoint="{congress}/{chamber}/members.json"} 2', text)
+        self.assertIn('congress_errors_total{endpoint="members/notamember.json",type="NotFound"} 1', text)
+        self.assertIn('# TYPE congress_requests_total counter', text)
+        self.assertIn('# TYPE congress_network_seconds histogram', text)
+
+        # each family's samples form one group, headed by its TYPE line
+        families = []
+        for line in text.splitlines():
+            if line.startswith('# TYPE '):
+                families.append(line.split()[2])
+                continue
+            name = line.split('{')[0]
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and name[:-len(suffix)] == families[-1]:
+                    name = families[-1]
+            self.assertEqual(name, families[-1])
+        self.assertEqual(len(families), len(set(families)))
+
+    def test_revalidated(self):
+        from congress.metrics import Event
+        event = Event('url', 'path')
+        resp = httplib2.Response({'status': '304'})
+        resp.status, resp.fromcache = 200, True
+        event.response(resp, b'{}')
+        self.assertEqual(event.cache, 'revalidated')
+
+    def test_hooks(self):
+        from congress.metrics import Hook
+        calls = []
+
+        class Recorder(Hook):
+            def before_request(self, event):
+                calls.append(('before', event.path))
+
+            def after_response(self, event):
+                calls.append(('after', event.endpoint))
+
+        class Broken(Hook):
+            def after_response(self, event):
+                raise RuntimeError
+
+        logging.disable(logging.CRITICAL)
+        try:
+            self.congress.hooks[:] = [Broken(), Recorder()]
+            self.congress.members.list_chamber('senate', 115)
+        finally:
+            logging.disable(logging.NOTSET)
+
+        self.assertEqual(calls, [('before', '115/senate/members.json'),
+                                 ('after', '{congress}/{chamber}/members.json')])
+
+
+class TransportTest(unittest.TestCase):
+
+    def setUp(self):
+        from congress.transport import FakeTransport
+        base = "https://api.propublica.org/congress/v1/"
+        self.transport = FakeTransport({
+            base + "members/P000197.json": {'status': 'OK', 'results': [{'id': 'P000197'}]},
+            base + "115/bills/hr21.json": (500, b'oops'),
+        }, cached=[base + "115/senate/members.json"])
+        self.congress = Congress(API_KEY, transport=self.transport)
+
+    def test_fake_transport(self):
+        self.assertIs(self.congress.members.transport, self.transport)
+        self.assertIsNone(self.congress.http)
+
+        self.assertEqual(self.congress.members.get('P000197')['id'], 'P000197')
+        self.assertEqual(self.transport.requests, [self.congress.BASE_URI + "members/P000197.json"])
+
+        with self.assertRaises(NotFound):
+            self.congress.members.get('notamember')
+
+        with self.assertRaises(CongressError):
+            self.congress.bills.get('hr21', 115)
+
+        with self.assertRaises(NotCached):
+            self.congress.fetch('members/P000197.json', cache_only=True)
+
+    def test_default_transport(self):
+        from congress.transport import Httplib2Transport
+        http = FakeHttp({})
+        congress = Congress(API_KEY, http=http)
+        self.assertIsInstance(congress.transport, Httplib2Transport)
+        self.assertIs(congress.http, http)
+        self.assertIs(congress.votes.transport, congress.transport)
+
+    @unittest.skipUnless(urllib3, 'needs urllib3')
+    def test_urllib3_transport(self):
+        import gzip
+        import threading
+        from congress.client import Client
+        from congress.transport import Urllib3Transport
+
+        try:
+            from http.server import BaseHTTPRequestHandler, HTTPServer
+            from socketserver import ThreadingMixIn
+        except ImportError:
+            from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+            from SocketServer import ThreadingMixIn
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                body = json.dumps({'status': 'OK', 'results': [{'path': self.path}]}).encode('utf-8')
+                if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body)
+                    self.send_response(200)
+                    self.send_header('Content-Encoding', 'gzip')
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = Server(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            client = Client(API_KEY, transport=Urllib3Transport(pool_size=2))
+            client.BASE_URI = 'http://127.0.0.1:%d/' % server.server_port
+            results = client.fetch_many(['a.json', 'b.json', 'c.json'], max_workers=2)
+            self.assertEqual([r['path'] for r in results], ['/a.json', '/b.json', '/c.json'])
+
+            with self.assertRaises(NotCached):
+                client.fetch('a.json', cache_only=True)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class DownHttp(FakeHttp):
+    "A FakeHttp that fails every network request while ``down`` is set"
+
+    down = False
+
+    def request(self, url, headers=None):
+        headers = headers or {}
+        if self.down and headers.get('cache-control') != 'only-if-cached':
+            raise socket.error('Connection refused')
+        return super(DownHttp, self).request(url, headers)
+
+
+class OfflineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base = "https://api.propublica.org/congress/v1/"
+        self.http = DownHttp({
+            self.base + "members/P000197.json": {'status': 'OK', 'results': [{'id': 'P000197'}]},
+            self.base + "115/bills/hr21.json": {'status': 'OK', 'results': [{'bill_id': 'hr21-115'}]},
+        }, cached=[self.base + "members/P000197.json"])
+
+    def test_offline(self):
+        congress = Congress(API_KEY, http=self.http, offline=True)
+        self.assertEqual(congress.members.get('P000197')['id'], 'P000197')
+        with self.assertRaises(NotCached):
+            congress.bills.get('hr21', 115)
+        self.assertEqual(self.http.requests, [])
+
+    def test_fallback_to_http_cache(self):
+        from congress import is_stale
+        congress = Congress(API_KEY, http=self.http, fallback=True)
+        self.http.down = True
+
+        logging.disable(logging.CRITICAL)
+        try:
+            pelosi = congress.members.get('P000197')
+        finally:
+            logging.disable(logging.NOTSET)
+
+        self.assertEqual(pelosi['id'], 'P000197')
+        self.assertTrue(is_stale(pelosi))
+
+        with self.assertRaises(socket.error):
+            congress.bills.get('hr21', 115)
+
+    def test_fallback_after_server_error(self):
+        # httplib2 deletes a cached response when revalidating it fails
+        import shutil
+        import tempfile
+        from congress import is_stale
+        from congress.testing import Cassette, StandInServer
+
+        cassette = Cassette({'members/P000197.json': (200, b'{"status": "OK", "results": [{"id": "P000197"}]}')})
+        tmp = tempfile.mkdtemp()
+        logging.disable(logging.CRITICAL)
+        try:
+            with StandInServer(cassette, max_age=0, error_statuses=(500,)) as server:
+                congress = Congress(API_KEY, http=httplib2.Http(tmp), base_uri=server.base_uri,
+                                    fallback=True)
+                self.assertFalse(is_stale(congress.members.get('P000197')))
+
+                server.error_rate = 1
+                pelosi = congress.members.get('P000197')
+                close_connections(congress.http)
+        finally:
+            logging.disable(logging.NOTSET)
+            shutil.rmtree(tmp)
+
+        self.assertEqual(server.stats['errors'], 1)
+        self.assertEqual(pelosi['id'], 'P000197')
+        self.assertTrue(is_stale(pelosi))
+
+    def test_fallback_to_result_cache(self):
+        from congress import is_stale
+        from congress.cache import ResultCache
+
+        now = [0]
+        congress = Congress(API_KEY, http=self.http, fallback=True,
+                            result_cache=ResultCache(ttl=60, clock=lambda: now[0]))
+        hr21 = congress.bills.get('hr21', 115)
+        self.assertFalse(is_stale(hr21))
+
+        now[0] = 61
+        self.http.down = True
+        logging.disable(logging.CRITICAL)
+        try:
+            hr21 = congress.bills.get('hr21', 115)
+        finally:
+            logging.disable(logging.NOTSET)
+
+        self.assertEqual(hr21['bill_id'], 'hr21-115')
+        self.assertTrue(is_stale(hr21))
+
+    def test_fallback_models(self):
+        from congress import is_stale
+        from congress.cache import ResultCache
+        from congress.models import Member
+
+        for result_cache in (None, ResultCache(ttl=0, copy=False)):
+            self.http.down = False
+            congress = Congress(API_KEY, http=self.http, fallback=True, models=True,
+                                result_cache=result_cache)
+            self.assertFalse(is_stale(congress.members.get('P000197')))
+
+            self.http.down = True
+            logging.disable(logging.CRITICAL)
+            try:
+                pelosi = congress.members.get('P000197')
+            finally:
+                logging.disable(logging.NOTSET)
+
+            self.assertIsInstance(pelosi, Member)
+            self.assertTrue(is_stale(pelosi))
+
+        # read-only results from the result cache are flagged too
+        congress = Congress(API_KEY, http=self.http, fallback=True,
+                            result_cache=ResultCache(ttl=0, copy=False))
+        self.http.down = False
+        congress.members.get('P000197')
+        self.http.down = True
+        logging.disable(logging.CRITICAL)
+        try:
+            self.assertTrue(is_stale(congress.members.get('P000197')))
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def test_not_found_is_not_masked(self):
+        congress = Congress(API_KEY, http=self.http, fallback=True)
+        with self.assertRaises(NotFound):
+            congress.members.get('notamember')
+
+
+class StartupTest(unittest.TestCase):
+
+    def test_lazy_subclients(self):
+        congress = Congress(API_KEY, http=FakeHttp({}))
+        self.assertNotIn('members', congress.__dict__)
+        self.assertIs(congress.members, congress.members)
+        self.assertIs(congress.members.transport, congress.transport)
+
+    def test_no_heavy_imports(self):
+        import subprocess
+        import sys
+        script = ("import sys, congress; congress.Congress('key').members; "
+                  "print(' '.join(m for m in ('httplib2', 'six') if m in sys.modules))")
+        output = subprocess.check_output([sys.executable, '-c', script])
+        self.assertEqual(output.strip(), b'')
+
+
+class StandInTest(unittest.TestCase):
+
+    def setUp(self):
+        from congress.testing import Cassette
+        self.cassette = Cassette({
+            'members/P000197.json': (200, b'{"status": "OK", "results": [{"id": "P000197"}]}'),
+            '115/house/bills/introduced.json?offset=0': (200, b'{"status": "OK", "results": [{"bills": []}]}'),
+        })
+
+    def test_record_and_replay(self):
+        from congress.testing import Cassette, RecordingTransport, ReplayTransport
+        from congress.transport import FakeTransport
+
+        base = "https://api.propublica.org/congress/v1/"
+        cassette = Cassette()
+        live = FakeTransport({base + "members/P000197.json": {'status': 'OK', 'results': [{'id': 'P000197'}]}})
+        congress = Congress(API_KEY, transport=RecordingTransport(live, cassette))
+        congress.members.get('P000197')
+        with self.assertRaises(NotFound):
+            congress.members.get('notamember')
+        self.assertEqual(list(cassette.responses), ['members/P000197.json'])
+
+        import tempfile
+        with tempfile.NamedTemporaryFile(suffix='.json') as f:
+            cassette.save(f.name)
+            cassette = Cassette.load(f.name)
+
+        replay = Congress(API_KEY, transport=ReplayTransport(cassette))
+        self.assertEqual(replay.members.get('P000197')['id'], 'P000197')
+        with self.assertRaises(NotFound):
+            replay.members.get('notamember')
+
+    def test_replay_pages(self):
+        from congress.testing import Cassette, ReplayTransport
+
+        page = {'status': 'OK', 'results': [{'bills': [{'bill_id': 'hr%d-115' % n} for n in range(20)]}]}
+        cassette = Cassette({'115/house/bills/introduced.json?offset=0': (200, json.dumps(page).encode('utf-8'))})
+        congress = Congress(API_KEY, transport=ReplayTransport(cassette))
+
+        # the next page wasn't recorded, so it isn't found, rather than
+        # being answered with the first page again
+        bills = congress.bills.iter_recent('house', 115)
+        with self.assertRaises(NotFound):
+            for i, bill in enumerate(bills):
+                self.assertLess(i, 20)
+        self.assertEqual(len(congress.transport.requests), 2)
+
+    def test_server(self):
+        from congress.testing import StandInServer
+
+        with StandInServer(self.cassette) as server:
+            congress = Congress(API_KEY, http=httplib2.Http(), base_uri=server.base_uri)
+            self.assertEqual(congress.members.get('P000197')['id'], 'P000197')
+
+            bills = list(congress.bills.iter_recent('house', 115))
+            self.assertEqual(bills, [])
+
+            with self.assertRaises(NotFound):
+                congress.members.get('notamember')
+            close_connections(congress.http)
+
+        self.assertEqual(server.stats['ok'], 2)
+        self.assertEqual(server.stats['not_found'], 1)
+
+    def test_revalidate(self):
+        import tempfile
+        from congress.cache import SQLiteCache
+        from congress.metrics import Metrics
+        from congress.scheduler import Quota
+        from congress.testing import StandInServer
+
+        metrics = Metrics()
+        with tempfile.NamedTemporaryFile(suffix='.sqlite') as f, \
+                StandInServer(self.cassette, max_age=0) as server:
+            congress = Congress(API_KEY, cache=SQLiteCache(f.name), base_uri=server.base_uri,
+                                hooks=[metrics], quota=Quota(100))
+            congress.members.get('P000197')
+            congress.members.get('P000197')
+            close_connections(congress.http)
+
+        self.assertEqual(server.stats['not_modified'], 1)
+        # the 304 still counts against the quota
+        self.assertEqual(congress.quota.used, 2)
+        self.assertEqual(metrics.snapshot()['members/{member_id}.json']['cache'],
+                         {'miss': 1, 'revalidated': 1})
+
+    def test_faults(self):
+        from congress.ratelimit import Retry
+        from congress.testing import StandInServer
+
+        logging.disable(logging.CRITICAL)
+        try:
+            with StandInServer(self.cassette, throttle_rate=1, retry_after=0) as server:
+                congress = Congress(API_KEY, http=httplib2.Http(), base_uri=server.base_uri,
+                                    retry=Retry(total=2, backoff=0))
+                with self.assertRaises(CongressError):
+                    congress.members.get('P000197')
+                close_connections(congress.http)
+            self.assertEqual(server.stats['throttled'], 3)
+
+            with StandInServer(self.cassette, error_rate=1, seed=1) as server:
+                congress = Congress(API_KEY, http=httplib2.Http(), base_uri=server.base_uri)
+                with self.assertRaises(CongressError):
+                    congress.members.get('P000197')
+                close_connections(congress.http)
+            self.assertEqual(server.stats['errors'], 1)
+        finally:
+            logging.disable(logging.NOTSET)
+
+
+class StreamTest(StreamFixtures, unittest.TestCase):
+
+    def test_array_parser(self):
+        from congress.stream import ArrayParser, chunked, items
+
+        body = json.dumps(self.rollcall, indent=2).encode('utf-8')
+        keys = ('results', 'votes', 'vote', 'positions')
+        for size in (1, 7, 1000):
+            self.assertEqual(list(items(chunked(body, size), keys)),
+                             self.rollcall['results']['votes']['vote']['positions'])
+
+        # numbers split across chunks, and multi-byte characters
+        body = u'{"a": [12345, -6.5e3, "caf\u00e9 \u2603", null]}'.encode('utf-8')
+        self.assertEqual(list(items(chunked(body, 1), ('a',))), [12345, -6.5e3, u'caf\u00e9 \u2603', None])
+
+        parser = ArrayParser(('results', 0, 'members'))
+        self.assertEqual(parser.feed(b'{"status": "ERROR", "errors": [{"error": "bad"}]}'), [])
+        self.assertTrue(parser.done)
+        self.assertFalse(parser.found)
+        self.assertEqual(parser.header['status'], 'ERROR')
+
+        parser = ArrayParser(('a',))
+        self.assertEqual(parser.feed(b'{"a": [1, 2'), [1])
+        with self.assertRaises(ValueError):
+            parser.close()
+
+    def test_stream(self):
+        from congress.models import Member
+        from congress.testing import ReplayTransport
+
+        congress = Congress(API_KEY, transport=ReplayTransport(self.cassette))
+        positions = congress.votes.iter_positions('house', 1, 1, 115)
+        self.assertEqual(next(positions)['member_id'], 'A000000')
+        self.assertEqual(len(list(positions)), 299)
+
+        members = list(congress.members.iter_chamber('house', 115))
+        self.assertEqual([m['id'] for m in members], ['P000197', 'R000570'])
+
+        congress = Congress(API_KEY, transport=ReplayTransport(self.cassette), models=True)
+        self.assertIsInstance(next(congress.members.iter_chamber('house', 115)), Member)
+
+        with self.assertRaises(NotFound):
+            list(congress.members.iter_chamber('senate', 115))
+
+        with self.assertRaises(CongressError):
+            list(congress.stream('115/house/members.json', ('results', 0, 'bills')))
+
+    @unittest.skipUnless(urllib3, 'needs urllib3')
+    def test_urllib3_stream(self):
+        from congress.metrics import Metrics
+        from congress.testing import StandInServer
+        from congress.transport import Urllib3Transport
+
+        metrics = Metrics()
+        with StandInServer(self.cassette) as server:
+            transport = Urllib3Transport(pool_size=1, gzip=False)
+            congress = Congress(API_KEY, transport=transport, base_uri=server.base_uri,
+                                hooks=[metrics])
+
+            # stopping early doesn't leave a half-read connection in the pool
+            positions = congress.votes.iter_positions('house', 1, 1, 115)
+            next(positions)
+            positions.close()
+
+            positions = list(congress.votes.iter_positions('house', 1, 1, 115))
+            self.assertEqual(len(positions), 300)
+            transport.close()
+
+        stats = metrics.snapshot()['{congress}/{chamber}/sessions/{session}/votes/{roll_call}.json']
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['bytes']['sum'], len(self.cassette.get('115/house/sessions/1/votes/1.json')[1]))
+
+
+class ExportTest(unittest.TestCase):
+
+    def setUp(self):
+        from congress.testing import Cassette, ReplayTransport
+        cassette = Cassette()
+        for n in (1, 2):
+            positions = [{'member_id': 'A%06d' % i, 'vote_position': 'Yes'} for i in range(5)]
+            if n == 2:
+                positions[0]['dw_nominate'] = 0.5
+            body = {'status': 'OK', 'results': {'votes': {'vote': {'positions': positions}}}}
+            cassette.add('115/house/sessions/1/votes/%d.json' % n, 200, json.dumps(body).encode('utf-8'))
+
+        members = {'status': 'OK', 'results': [{'members': [
+            {'id': 'P000197', 'roles': [{'congress': '115'}], 'office': {'room': 'H-204'}},
+            {'id': 'R000570'}]}]}
+        cassette.add('115/house/members.json', 200, json.dumps(members).encode('utf-8'))
+        self.congress = Congress(API_KEY, transport=ReplayTransport(cassette))
+
+    def test_flatten(self):
+        from congress.export import flatten
+        from congress.models import Member
+
+        row = flatten({'id': 'P000197', 'office': {'room': 'H-204'}, 'roles': [{'congress': '115'}]})
+        self.assertEqual(row, {'id': 'P000197', 'office_room': 'H-204', 'roles': '[{"congress": "115"}]'})
+        self.assertEqual(flatten(Member({'id': 'P000197'})), {'id': 'P000197'})
+
+    def test_ndjson(self):
+        import io
+        from congress.export import NDJSONWriter, export
+
+        out = io.StringIO()
+        with NDJSONWriter(out) as writer:
+            count = export(self.congress.members.iter_chamber('house', 115), writer, batch_size=1)
+
+        self.assertEqual(count, 2)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(rows[0]['office_room'], 'H-204')
+        self.assertEqual(rows[1], {'id': 'R000570'})
+
+    def test_sqlite(self):
+        import sqlite3
+        import tempfile
+        from congress.export import export, open_writer, sqlite_value, vote_positions
+
+        with tempfile.NamedTemporaryFile(suffix='.sqlite') as f:
+            for _ in range(2):
+                rows = vote_positions(self.congress.votes, 'house', [1, 2], 1, 115)
+                with open_writer(f.name, 'positions', key=('roll_call', 'member_id')) as writer:
+                    self.assertEqual(export(rows, writer, batch_size=3), 10)
+
+            db = sqlite3.connect(f.name)
+            self.assertEqual(db.execute('SELECT count(*) FROM positions').fetchone(), (10,))
+            self.assertEqual(db.execute('SELECT member_id FROM positions WHERE dw_nominate = 0.5 '
+                                        'AND roll_call = 2').fetchall(), [('A000000',)])
+            db.close()
+
+        self.assertEqual(sqlite_value(u'Jos\xe9'), u'Jos\xe9')
+        self.assertEqual(sqlite_value(datetime.date(2017, 1, 3)), '2017-01-03')
+
+        with self.assertRaises(ValueError):
+            open_writer('positions.sqlite')
+        with self.assertRaises(ValueError):
+            open_writer('positions.csv')
+
+    def test_parquet(self):
+        import tempfile
+        from congress.export import ParquetWriter, export, vote_positions
+
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            # no pyarrow, so nothing to test
+            return
+
+        with tempfile.NamedTemporaryFile(suffix='.parquet') as f:
+            with ParquetWriter(f.name) as writer:
+                export(vote_positions(self.congress.votes, 'house', [1, 2], 1, 115), writer, batch_size=5)
+
+            table = pyarrow.parquet.read_table(f.name)
+            self.assertEqual(table.num_rows, 10)
+            self.assertEqual(pyarrow.parquet.ParquetFile(f.name).num_row_groups, 2)
+
+
 class DjangoTest(unittest.TestCase):
     
     def test_django_cache(self):
@@ -267,5 +1620,10 @@ class DjangoTest(unittest.TestCase):
             self.fail(e)
         
 
+if sys.version_info >= (3, 6):
+    # async generators and comprehensions don't compile on older Pythons
+    from async_test import *  # noqa
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,109 @@
+"""
+Fixtures shared by test.py and async_test.py, kept in their own module so
+neither test module has to import the other.
+"""
+import json
+import os
+
+import httplib2
+
+from congress import Congress
+
+API_KEY = os.environ.get('PROPUBLICA_API_KEY', 'test-key')
+
+
+class FakeHttp(httplib2.Http):
+    "Stand-in for httplib2.Http, serving canned JSON bodies by URL"
+
+    def __init__(self, responses, cached=()):
+        super(FakeHttp, self).__init__()
+        self.responses = responses
+        self.cached = set(cached)
+        self.requests = []
+
+    def request(self, url, headers=None):
+        headers = headers or {}
+        if url in self.cached:
+            resp = httplib2.Response({'status': 200})
+            resp.fromcache = True
+        elif headers.get('cache-control') == 'only-if-cached':
+            return httplib2.Response({'status': 504}), b''
+        else:
+            self.requests.append(url)
+            resp = httplib2.Response({'status': 200})
+
+        body = self.responses.get(url, {'status': 'ERROR', 'errors': [{'error': 'Record not found'}]})
+        return resp, json.dumps(body).encode('utf-8')
+
+
+class SlowHttp(FakeHttp):
+    "A FakeHttp that holds every request until ``release`` is set"
+
+    def __init__(self, *args, **kwargs):
+        import threading
+        super(SlowHttp, self).__init__(*args, **kwargs)
+        self.release = threading.Event()
+
+    def request(self, url, headers=None):
+        self.release.wait(5)
+        return super(SlowHttp, self).request(url, headers)
+
+
+class PaginationFixtures(object):
+    "Three pages of introduced bills, 45 in all"
+
+    def setUp(self):
+        url = "https://api.propublica.org/congress/v1/115/house/bills/introduced.json?offset={0}"
+        bills = [{'bill_id': 'hr%d-115' % n} for n in range(1, 46)]
+        self.http = FakeHttp(dict(
+            (url.format(offset), {'status': 'OK', 'results': [
+                {'num_results': 20, 'offset': offset, 'bills': bills[offset:offset + 20]}]})
+            for offset in (0, 20, 40)))
+        self.congress = Congress(API_KEY, http=self.http)
+
+
+class VoteRangeFixtures(object):
+    "House votes by date, over three monthly windows"
+
+    def setUp(self):
+        url = "https://api.propublica.org/congress/v1/house/votes/{0}/{1}.json"
+
+        def vote(n, date):
+            return {'congress': 115, 'session': 1, 'roll_call': n, 'date': date, 'time': '12:00:00'}
+
+        # newest first, as the API returns them, with one vote repeated across windows
+        self.http = FakeHttp({
+            url.format('2017-01-15', '2017-01-31'): {'status': 'OK', 'results': {'votes': [
+                vote(2, '2017-01-31'), vote(1, '2017-01-20')]}},
+            url.format('2017-02-01', '2017-02-28'): {'status': 'OK', 'results': {'votes': [
+                vote(3, '2017-02-10'), vote(2, '2017-01-31')]}},
+            url.format('2017-03-01', '2017-03-05'): {'status': 'OK', 'results': {'votes': [
+                vote(4, '2017-03-02')]}},
+        })
+        self.congress = Congress(API_KEY, http=self.http)
+
+
+class SingleFlightFixtures(object):
+    "A SlowHttp serving one member"
+
+    def setUp(self):
+        self.http = SlowHttp({
+            "https://api.propublica.org/congress/v1/members/P000197.json":
+                {'status': 'OK', 'results': [{'id': 'P000197', 'roles': []}]},
+        })
+
+
+class StreamFixtures(object):
+    "A cassette with a 300-member roll call and a House member list"
+
+    def setUp(self):
+        from congress.testing import Cassette
+        positions = [{'member_id': 'A%06d' % i, 'vote_position': 'Yes'} for i in range(300)]
+        self.rollcall = {'status': 'OK', 'results': {'votes': {'vote': {
+            'roll_call': 1, 'positions': positions}}}}
+        self.members = {'status': 'OK', 'results': [{'congress': '115', 'members': [
+            {'id': 'P000197', 'first_name': 'Nancy'}, {'id': 'R000570', 'first_name': 'Paul'}]}]}
+        self.cassette = Cassette({
+            '115/house/sessions/1/votes/1.json': (200, json.dumps(self.rollcall).encode('utf-8')),
+            '115/house/members.json': (200, json.dumps(self.members).encode('utf-8')),
+        })